@@ -0,0 +1,185 @@
+# backtest/engine.py
+# Vectorized backtest core: entries, stop-loss detection, exits, costs and the equity curve
+# are all array operations, for any number of symbols and any holding period.
+# Nothing here prints or plots: reports are rendered from a BacktestResult by backtest/report.py.
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from backtest.metrics import replay
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+INITIAL_CAPITAL = 100000    # ₹1 Lakh
+BROKERAGE_PCT = 0.0005      # 0.05% per trade (roughly Brokerage + STT)
+
+REASON_SL = "SL HIT 🛑"
+REASON_CLOSE = "CLOSE 🟢"
+REASON_NO_TRADE = "NO TRADE"
+
+
+def simulate(orders_df, market_df, initial_capital=INITIAL_CAPITAL, brokerage_pct=BROKERAGE_PCT, holding_days=1):
+    """
+    Replays an order book against market bars.
+
+    orders_df: date, signal, qty, stop_loss (+ symbol for several instruments)
+    market_df: date, open, high, low, close (+ symbol)
+
+    A BUY enters at the open of its date and is held for `holding_days` bars. It exits at the
+    stop loss on the first bar whose low touches it, otherwise at the close of the last bar.
+    PnL (net of brokerage on entry + exit turnover) is booked on the exit date.
+
+    Returns (trades_df, equity_df):
+      trades_df - one row per order: entry, exit, reason, pnl, exit_date
+      equity_df - one row per date: pnl, balance
+    """
+    multi = "symbol" in orders_df.columns and "symbol" in market_df.columns
+    keys = ["symbol", "date"] if multi else ["date"]
+
+    market = market_df.sort_values(keys).reset_index(drop=True)
+    market["_bar"] = np.arange(len(market))
+    # Align Plan with Reality (orders on dates without a bar are dropped)
+    trades = pd.merge(orders_df, market[keys + ["open", "high", "low", "close", "_bar"]], on=keys, how="inner")
+    trades = trades.sort_values(keys, kind="stable").reset_index(drop=True)
+
+    opens = market["open"].to_numpy(float)
+    lows = market["low"].to_numpy(float)
+    closes = market["close"].to_numpy(float)
+
+    # Last bar index of each trade's symbol, so a holding window never runs into the next symbol
+    if multi:
+        sym_codes = pd.factorize(market["symbol"])[0]
+        sym_last = np.r_[np.flatnonzero(np.diff(sym_codes)), len(market) - 1]
+        sym_end = sym_last[sym_codes]
+    else:
+        sym_end = np.full(len(market), len(market) - 1)
+
+    bar = trades["_bar"].to_numpy()
+    qty = trades["qty"].to_numpy(float)
+    stop = trades["stop_loss"].to_numpy(float)
+    is_trade = (trades["signal"].to_numpy() == "BUY") & (qty > 0)
+
+    # Holding window: bars [bar, bar + holding_days - 1], clipped to the symbol's last bar
+    window = np.minimum(bar[:, None] + np.arange(holding_days)[None, :], sym_end[bar][:, None])
+    hit = lows[window] <= stop[:, None]
+    sl_hit = hit.any(axis=1)
+    exit_bar = np.where(sl_hit, window[np.arange(len(bar)), hit.argmax(axis=1)], window[:, -1])
+
+    entry_price = opens[bar]
+    exit_price = np.where(sl_hit, stop, closes[exit_bar])
+
+    # Gross PnL and Transaction Costs (Entry + Exit)
+    gross_pnl = (exit_price - entry_price) * qty
+    turnover = (entry_price * qty) + (exit_price * qty)
+    costs = turnover * brokerage_pct
+    pnl = np.where(is_trade, gross_pnl - costs, 0.0)
+
+    trades["entry"] = entry_price
+    trades["exit"] = np.where(is_trade, exit_price, 0.0)
+    trades["exit_date"] = market["date"].to_numpy()[exit_bar]
+    trades["reason"] = np.where(~is_trade, REASON_NO_TRADE, np.where(sl_hit, REASON_SL, REASON_CLOSE))
+    trades["pnl"] = pnl
+    trades = trades.drop(columns=["_bar"])
+
+    # Equity curve: realized PnL summed per exit date across all symbols
+    booked = pd.Series(pnl, index=np.where(is_trade, trades["exit_date"], trades["date"]))
+    daily_pnl = booked.groupby(level=0, sort=True).sum()
+    equity = pd.DataFrame({"date": daily_pnl.index, "pnl": daily_pnl.to_numpy()})
+    # Accumulate starting from the capital itself: bit-identical to `balance += pnl` day by day
+    equity["balance"] = np.cumsum(np.r_[float(initial_capital), equity["pnl"].to_numpy()])[1:]
+    return trades, equity
+
+
+def compute_metrics(equity_df, initial_capital=INITIAL_CAPITAL):
+    """Final capital, net PnL, ROI %, annualized daily Sharpe and max drawdown of an equity curve."""
+    final_capital = equity_df["balance"].iloc[-1] if len(equity_df) else initial_capital
+    net_pnl = final_capital - initial_capital
+    roi = (net_pnl / initial_capital) * 100
+
+    # Sharpe Ratio (Daily), annualized
+    daily_returns = equity_df["pnl"] / initial_capital
+    mean_return = daily_returns.mean()
+    std_return = daily_returns.std()
+    if std_return == 0 or np.isnan(std_return):
+        sharpe = 0
+    else:
+        sharpe = (mean_return / std_return) * np.sqrt(252)
+
+    # Max Drawdown (the curve starts at the initial capital)
+    equity_curve = np.r_[initial_capital, equity_df["balance"].to_numpy(float)]
+    peak = np.maximum.accumulate(equity_curve)
+    drawdown = (equity_curve - peak) / peak
+    max_drawdown = drawdown.min()
+
+    return {"final_capital": final_capital, "net_pnl": net_pnl, "roi": roi,
+            "sharpe": sharpe, "max_drawdown": max_drawdown}
+
+
+class BacktestResult:
+    """
+    What one backtest produced: the trade log, the equity curve as arrays and its metrics.
+    Small and picklable, so it can be saved, or handed to a report worker, as it is.
+    """
+
+    def __init__(self, symbol, trades, dates, pnl, balance, metrics, initial_capital=INITIAL_CAPITAL, label=None):
+        self.symbol = symbol
+        self.trades = trades            # DataFrame, one row per order (see simulate)
+        self.dates = dates              # datetime64 per equity point
+        self.pnl = pnl                  # float64 PnL booked on each date
+        self.balance = balance          # float64 account value after each date
+        self.metrics = metrics          # compute_metrics(...) (+ n_trades, + streaming metrics from backtest())
+        self.initial_capital = initial_capital
+        self.label = label              # e.g. the sweep run it came from
+
+    @classmethod
+    def from_simulation(cls, symbol, trades_df, equity_df, initial_capital=INITIAL_CAPITAL, label=None):
+        metrics = compute_metrics(equity_df, initial_capital)
+        metrics["n_trades"] = int((trades_df["reason"] != REASON_NO_TRADE).sum())
+        return cls(symbol, trades_df, equity_df["date"].to_numpy(), equity_df["pnl"].to_numpy(float),
+                   equity_df["balance"].to_numpy(float), metrics, initial_capital, label)
+
+    def equity_frame(self):
+        return pd.DataFrame({"date": self.dates, "pnl": self.pnl, "balance": self.balance})
+
+    def save(self, path):
+        with open(path + ".tmp", "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+        return path
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def backtest(orders_df, market_df, symbol=None, initial_capital=INITIAL_CAPITAL, brokerage_pct=BROKERAGE_PCT,
+             holding_days=1, label=None, kill_switch=None):
+    """
+    simulate() + metrics as a BacktestResult (None when no order has a market bar).
+
+    The trade log is also replayed through backtest.metrics.StreamingMetrics, as live trading
+    would see it (hit rate, turnover, cost drag, rolling Sharpe, exposure). With a KillSwitch the
+    entries it rejects become NO TRADE rows and the book is simulated again without them.
+    """
+    trades_df, equity_df = simulate(orders_df, market_df, initial_capital, brokerage_pct, holding_days)
+    if trades_df.empty:
+        return None
+    stream, halted = replay(trades_df, initial_capital, brokerage_pct, kill_switch)
+    if halted:
+        keys = [k for k in ("symbol", "date") if k in orders_df.columns and k in trades_df.columns]
+        blocked = pd.MultiIndex.from_frame(trades_df.loc[halted, keys])
+        orders_df = orders_df.copy()
+        orders_df.loc[pd.MultiIndex.from_frame(orders_df[keys]).isin(blocked), "qty"] = 0
+        trades_df, equity_df = simulate(orders_df, market_df, initial_capital, brokerage_pct, holding_days)
+        stream, _ = replay(trades_df, initial_capital, brokerage_pct)
+
+    result = BacktestResult.from_simulation(symbol, trades_df, equity_df, initial_capital, label)
+    snapshot = stream.snapshot()
+    result.metrics.update({k: snapshot[k] for k in ("hit_rate", "turnover", "costs", "cost_drag",
+                                                    "rolling_sharpe", "max_gross_exposure")})
+    result.metrics["halted"] = len(halted)
+    return result
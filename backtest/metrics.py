@@ -0,0 +1,324 @@
+# backtest/metrics.py
+# Streaming risk / performance metrics: O(1) work per fill, price mark or closed period.
+#
+# StreamingMetrics keeps running sums instead of the history: equity, running peak and drawdown,
+# annualized Sharpe (Welford mean / variance of the period returns) and a rolling Sharpe over the
+# last ROLLING_WINDOW periods, hit rate, turnover, costs and gross exposure. The same object is fed
+# by the backtest (replay() walks a simulate() trade log in date order) and by live execution
+# (fyers/orders.py records broker fills, its state persists between runs in artifacts/live_metrics.json).
+#
+# KillSwitch turns the metrics into a go / no-go for NEW entries (stops and exits are never blocked):
+#   python backtest/metrics.py                    # state of the live account + kill switch verdict
+#   python backtest/metrics.py --reset
+#
+# Stdlib only: fyers/orders.py imports this at the open without pandas / numpy.
+import argparse
+import json
+import math
+import os
+import sys
+from collections import deque
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.instrumentation import get_logger
+
+log = get_logger("metrics")
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+ROLLING_WINDOW = 20         # periods (trading days) in the rolling Sharpe
+PERIODS_PER_YEAR = 252
+LIVE_STATE_PATH = os.path.join("artifacts", "live_metrics.json")
+
+# Kill switch: None disables a check
+MAX_DRAWDOWN = 0.10         # halt new entries 10% below the equity peak
+MAX_PERIOD_LOSS = 0.03      # ... or after losing 3% of capital within the current period (day)
+MIN_ROLLING_SHARPE = None   # e.g. -1.0, once a full window of periods has been seen
+MAX_GROSS_EXPOSURE = 1.0    # ... or when open positions are worth more than 1x equity
+
+
+class StreamingMetrics:
+    """
+    Incremental metrics of one account. Per period (bar / day) returns are pnl / initial_capital,
+    Sharpe uses the sample std and max drawdown the closed-period equity, as in
+    backtest/engine.compute_metrics: a replayed day-trade backtest reports the same numbers. (Costs
+    are paid on the fill, so with multi-day holds the entry cost lands on the entry day.)
+    """
+
+    def __init__(self, initial_capital, window=ROLLING_WINDOW, periods_per_year=PERIODS_PER_YEAR):
+        self.initial_capital = float(initial_capital)
+        self.window = window
+        self.periods_per_year = periods_per_year
+
+        self.realized = 0.0         # net of costs
+        self.unrealized = 0.0       # open positions at their last mark
+        self.costs = 0.0
+        self.turnover = 0.0
+        self.trades = 0
+        self.wins = 0
+        self.positions = {}         # key -> [qty, avg_price, mark, trade pnl so far]
+        self.gross_exposure = 0.0
+        self.max_gross_exposure = 0.0
+        self.seen = set()           # fill ids already recorded (broker order ids live)
+
+        # Closed periods
+        self.periods = 0
+        self.last_period = None
+        self.period_start_equity = self.initial_capital
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.rolling = deque()
+        self.rolling_sum = 0.0
+        self.rolling_sumsq = 0.0
+        self.peak = self.initial_capital
+        self.max_drawdown = 0.0
+
+    # ---- state ----
+    @property
+    def equity(self):
+        return self.initial_capital + self.realized + self.unrealized
+
+    @property
+    def drawdown(self):
+        """Current drawdown (<= 0) of the live equity against the closed-period peak."""
+        return min(0.0, (self.equity - self.peak) / self.peak)
+
+    @property
+    def period_pnl(self):
+        return self.equity - self.period_start_equity
+
+    @property
+    def sharpe(self):
+        if self.periods < 2:
+            return 0.0
+        std = math.sqrt(self.m2 / (self.periods - 1))
+        return self.mean / std * math.sqrt(self.periods_per_year) if std > 0 else 0.0
+
+    @property
+    def rolling_sharpe(self):
+        n = len(self.rolling)
+        if n < 2:
+            return 0.0
+        mean = self.rolling_sum / n
+        var = max(0.0, (self.rolling_sumsq - n * mean * mean) / (n - 1))
+        return mean / math.sqrt(var) * math.sqrt(self.periods_per_year) if var > 0 else 0.0
+
+    @property
+    def hit_rate(self):
+        return self.wins / self.trades if self.trades else 0.0
+
+    @property
+    def cost_drag(self):
+        """Costs paid, as a fraction of the initial capital."""
+        return self.costs / self.initial_capital
+
+    # ---- updates ----
+    def on_fill(self, key, side, qty, price, cost=0.0, fill_id=None):
+        """
+        One fill: side 1 = buy, -1 = sell. A fill that flattens the position closes a trade.
+        Returns False for a fill_id that was already recorded.
+        """
+        if fill_id is not None:
+            if fill_id in self.seen:
+                return False
+            self.seen.add(fill_id)
+        qty, price = float(qty), float(price)
+        self.turnover += qty * price
+        self.costs += cost
+        self.realized -= cost
+
+        held, avg, mark, trade_pnl = self.positions.get(key, (0.0, 0.0, price, 0.0))
+        # Re-mark what is already held at the fill price
+        self._revalue(held, mark, price)
+        trade_pnl -= cost
+        if held == 0 or (held > 0) == (side > 0):
+            avg = (abs(held) * avg + qty * price) / (abs(held) + qty)
+            new_held = held + side * qty
+        else:
+            closed = min(qty, abs(held))
+            gain = closed * (price - avg) * (1 if held > 0 else -1)
+            self.realized += gain
+            self.unrealized -= gain
+            trade_pnl += gain
+            new_held = held + side * qty
+            if abs(new_held) < 1e-9 or (new_held > 0) != (held > 0):
+                # Flat (or flipped through zero: the rest opens at this price)
+                self.on_trade(trade_pnl)
+                avg, trade_pnl = price, 0.0
+
+        self._exposure((abs(new_held) - abs(held)) * price)
+        if abs(new_held) < 1e-9:
+            self.positions.pop(key, None)
+        else:
+            self.positions[key] = [new_held, avg, price, trade_pnl]
+        return True
+
+    def mark(self, key, price):
+        """Revalues an open position at a new price (unrealized PnL and exposure)."""
+        pos = self.positions.get(key)
+        if pos is None:
+            return
+        self._revalue(pos[0], pos[2], float(price))
+        pos[2] = float(price)
+
+    def on_trade(self, pnl):
+        self.trades += 1
+        self.wins += pnl > 0
+
+    def close_period(self, label=None):
+        """
+        Ends a period (bar / trading day) at the current equity. A label that was already closed
+        is ignored, so a job that runs twice a day does not count the day twice.
+        """
+        if label is not None and label == self.last_period:
+            return False
+        r = self.period_pnl / self.initial_capital
+        self.periods += 1
+        delta = r - self.mean
+        self.mean += delta / self.periods
+        self.m2 += delta * (r - self.mean)
+
+        self.rolling.append(r)
+        self.rolling_sum += r
+        self.rolling_sumsq += r * r
+        if len(self.rolling) > self.window:
+            old = self.rolling.popleft()
+            self.rolling_sum -= old
+            self.rolling_sumsq -= old * old
+
+        equity = self.equity
+        self.peak = max(self.peak, equity)
+        self.max_drawdown = min(self.max_drawdown, (equity - self.peak) / self.peak)
+        self.period_start_equity = equity
+        self.last_period = label
+        return True
+
+    def _revalue(self, held, old_price, price):
+        self.unrealized += held * (price - old_price)
+        self._exposure(abs(held) * (price - old_price))
+
+    def _exposure(self, change):
+        self.gross_exposure = max(0.0, self.gross_exposure + change)
+        self.max_gross_exposure = max(self.max_gross_exposure, self.gross_exposure)
+
+    def snapshot(self):
+        return {"equity": self.equity, "realized": self.realized, "unrealized": self.unrealized,
+                "drawdown": self.drawdown, "max_drawdown": self.max_drawdown, "sharpe": self.sharpe,
+                "rolling_sharpe": self.rolling_sharpe, "hit_rate": self.hit_rate, "trades": self.trades,
+                "turnover": self.turnover, "costs": self.costs, "cost_drag": self.cost_drag,
+                "gross_exposure": self.gross_exposure, "max_gross_exposure": self.max_gross_exposure,
+                "periods": self.periods, "open_positions": len(self.positions)}
+
+    # ---- persistence (live runs are separate processes) ----
+    def to_dict(self):
+        state = {k: v for k, v in vars(self).items() if k not in ("rolling", "seen")}
+        state.update(rolling=list(self.rolling), seen=sorted(self.seen))
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        metrics = cls(state["initial_capital"], state["window"], state["periods_per_year"])
+        for k, v in state.items():
+            setattr(metrics, k, v)
+        metrics.rolling = deque(state["rolling"])
+        metrics.seen = set(state["seen"])
+        return metrics
+
+    def save(self, path=LIVE_STATE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, initial_capital, path=LIVE_STATE_PATH):
+        """The saved state, or a fresh account when there is none yet."""
+        if not os.path.exists(path):
+            return cls(initial_capital)
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+class KillSwitch:
+    """Thresholds that halt new entries. check() returns the reason, or None to keep trading."""
+
+    def __init__(self, max_drawdown=MAX_DRAWDOWN, max_period_loss=MAX_PERIOD_LOSS,
+                 min_rolling_sharpe=MIN_ROLLING_SHARPE, max_gross_exposure=MAX_GROSS_EXPOSURE):
+        self.max_drawdown = max_drawdown
+        self.max_period_loss = max_period_loss
+        self.min_rolling_sharpe = min_rolling_sharpe
+        self.max_gross_exposure = max_gross_exposure
+
+    def check(self, metrics, new_exposure=0.0):
+        """new_exposure: value of the entry about to be sent, counted against the exposure cap."""
+        if self.max_drawdown is not None and -metrics.drawdown >= self.max_drawdown:
+            return f"drawdown {metrics.drawdown:.2%} (limit -{self.max_drawdown:.0%})"
+        if self.max_period_loss is not None and -metrics.period_pnl >= self.max_period_loss * metrics.initial_capital:
+            return f"loss today ₹{-metrics.period_pnl:,.2f} (limit {self.max_period_loss:.0%} of capital)"
+        if (self.min_rolling_sharpe is not None and len(metrics.rolling) >= metrics.window
+                and metrics.rolling_sharpe < self.min_rolling_sharpe):
+            return f"rolling Sharpe {metrics.rolling_sharpe:.2f} (limit {self.min_rolling_sharpe:.2f})"
+        if (self.max_gross_exposure is not None
+                and metrics.gross_exposure + new_exposure > self.max_gross_exposure * metrics.equity):
+            return f"gross exposure {(metrics.gross_exposure + new_exposure) / metrics.equity:.0%} (limit {self.max_gross_exposure:.0%})"
+        return None
+
+
+def replay(trades_df, initial_capital, brokerage_pct, kill_switch=None, window=ROLLING_WINDOW):
+    """
+    Feeds a simulate() trade log through StreamingMetrics in date order, the way live trading sees
+    it: each day's entries, then the exits booked that day, then the period close.
+
+    With a kill switch, entries it rejects are left out. Returns (metrics, halted), halted being the
+    trades_df index of every rejected entry.
+    """
+    metrics = StreamingMetrics(initial_capital, window)
+    traded = (trades_df["signal"].to_numpy() == "BUY") & (trades_df["qty"].to_numpy() > 0)
+    rows = list(zip(trades_df.index, trades_df["date"], trades_df["exit_date"], traded,
+                    trades_df["qty"], trades_df["entry"], trades_df["exit"]))
+
+    entries, exits, booked = {}, {}, set()
+    for row in rows:
+        entries.setdefault(row[1], []).append(row)
+    halted = []
+    for date in sorted(set(trades_df["date"]) | set(trades_df["exit_date"][traded])):
+        for idx, _, exit_date, is_trade, qty, entry, exit_price in entries.get(date, []):
+            if not is_trade:
+                booked.add(date)
+                continue
+            if kill_switch is not None and kill_switch.check(metrics, qty * entry) is not None:
+                halted.append(idx)
+                booked.add(date)
+                continue
+            metrics.on_fill(idx, 1, qty, entry, entry * qty * brokerage_pct)
+            exits.setdefault(exit_date, []).append((idx, qty, exit_price))
+        for idx, qty, price in exits.pop(date, []):
+            metrics.on_fill(idx, -1, qty, price, price * qty * brokerage_pct)
+            booked.add(date)
+        if date in booked:
+            metrics.close_period(date)
+    return metrics, halted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Live account metrics and the kill switch verdict")
+    parser.add_argument("--state", default=LIVE_STATE_PATH)
+    parser.add_argument("--reset", action="store_true", help="Forget the live state (e.g. a new account)")
+    args = parser.parse_args()
+
+    if args.reset:
+        if os.path.exists(args.state):
+            os.remove(args.state)
+        log.info(f"🧹 Live metrics reset: {args.state}")
+        sys.exit(0)
+    if not os.path.exists(args.state):
+        log.warning(f"⚠️ No live metrics yet ({args.state}). They start with the first orders.py run.")
+        sys.exit(0)
+
+    metrics = StreamingMetrics.load(0, args.state)
+    for key, value in metrics.snapshot().items():
+        print(f"{key:<20} {value:,.4f}" if isinstance(value, float) else f"{key:<20} {value}")
+    reason = KillSwitch().check(metrics)
+    print(f"🛑 Kill switch: {reason}" if reason else "✅ Kill switch: clear to trade")
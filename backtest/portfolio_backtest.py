@@ -0,0 +1,88 @@
+# backtest/portfolio_backtest.py
+# Joint backtest of the whole book: every symbol's orders (from strategy/portfolio.py) are
+# simulated against their own bars in one vectorized pass, and the PnL of all positions open
+# on a day lands in a single equity curve, so the capital really is shared.
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest.engine import BROKERAGE_PCT, INITIAL_CAPITAL, REASON_NO_TRADE, backtest
+from backtest.report import REPORT_KINDS, ReportPool
+from pipeline.universe import load_universe, symbol_slug
+from utils.instrumentation import get_logger, instrument_stage
+from utils.store import has_table, read_table
+
+log = get_logger("portfolio_backtest")
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+HOLDING_DAYS = 1
+REPORT_DIR = "artifacts"    # -> artifacts/portfolio_performance_chart.png (+ _trades.csv, _report.html)
+
+
+def load_book(symbols):
+    """Order books and market bars of all symbols (the 'symbol' column holds the slug)."""
+    slugs = [symbol_slug(s) for s in symbols if has_table("order_book", s) and has_table("ohlcv", s)]
+    orders_df = read_table("order_book")
+    orders_df = orders_df[orders_df["symbol"].isin(slugs)]
+    market_df = read_table("ohlcv", start=orders_df["date"].min())
+    market_df = market_df[market_df["symbol"].isin(slugs)]
+    return orders_df.reset_index(drop=True), market_df.reset_index(drop=True)
+
+
+@instrument_stage("portfolio_backtest")
+def run_portfolio_backtest(symbols=None, holding_days=HOLDING_DAYS, initial_capital=INITIAL_CAPITAL,
+                           brokerage_pct=BROKERAGE_PCT, verbose=True):
+    symbols = symbols or [row["symbol"] for row in load_universe()]
+    orders_df, market_df = load_book(symbols)
+    if orders_df.empty:
+        log.error("❌ Error: Missing input data. Run strategy/portfolio.py first.")
+        return None
+
+    if verbose:
+        log.info(f"⏳ Joint backtest of {orders_df['symbol'].nunique()} symbols over {orders_df['date'].nunique()} days...")
+    result = backtest(orders_df, market_df, None, initial_capital, brokerage_pct, holding_days)
+    if result is None:
+        log.warning("⚠️ No overlapping dates found between Orders and Market Data.")
+        return None
+    trades_df, equity_df, metrics = result.trades, result.equity_frame(), result.metrics
+
+    traded = trades_df[trades_df["reason"] != REASON_NO_TRADE]
+    exposure = (traded["entry"] * traded["qty"]).groupby(traded["date"]).sum() / initial_capital
+    by_symbol = traded.groupby("symbol").agg(trades=("pnl", "size"), pnl=("pnl", "sum"),
+                                             hit_rate=("pnl", lambda p: (p > 0).mean()))
+
+    if verbose:
+        print("\n🏆 PORTFOLIO PERFORMANCE REPORT")
+        print("-" * 30)
+        print(f"💰 Final Capital:    ₹{metrics['final_capital']:,.2f}")
+        print(f"💵 Net Profit:       ₹{metrics['net_pnl']:,.2f} ({metrics['roi']:.2f}%)")
+        print(f"📉 Max Drawdown:     {metrics['max_drawdown']:.2%}")
+        print(f"⚡ Sharpe Ratio:     {metrics['sharpe']:.2f} (Target > 1.5)")
+        if len(exposure):
+            print(f"📦 Gross Exposure:   avg {exposure.mean():.1%} | max {exposure.max():.1%} of capital")
+        print("-" * 30)
+        if len(by_symbol):
+            print(by_symbol.sort_values("pnl", ascending=False).to_string(float_format=lambda v: f"{v:,.2f}"))
+
+    # No chart here: reports are rendered from "result" by backtest/report.py, on request
+    return {**metrics, "avg_gross": float(exposure.mean()) if len(exposure) else 0.0,
+            "trades": trades_df, "equity": equity_df, "result": result}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the joint multi-symbol book")
+    parser.add_argument("--symbols", nargs="+", help="Default: every symbol in config/universe.csv")
+    parser.add_argument("--holding-days", type=int, default=HOLDING_DAYS)
+    parser.add_argument("--report", nargs="*", choices=REPORT_KINDS, default=["chart"],
+                        help="Reports to render (default: chart; none with --report)")
+    args = parser.parse_args()
+
+    reports = ReportPool(max_workers=1)
+    book = run_portfolio_backtest(args.symbols, args.holding_days)
+    if book:
+        reports.submit(book["result"], args.report, out_dir=REPORT_DIR)
+    for path in reports.close():
+        log.info(f"📈 Report saved to: {path}")
@@ -0,0 +1,231 @@
+# backtest/report.py
+# Reports of backtest results, kept out of the simulation.
+#
+# A backtest returns a BacktestResult (backtest/engine.py) and prints / plots nothing. Reports
+# are made from results, and only when asked for:
+#   console  the per-day table + final report (in the calling process)
+#   chart    equity curve PNG
+#   csv      trade log + equity curve
+#   html     metrics, trade log and the chart on one page
+# chart / csv / html are rendered by a ReportPool: submit() returns at once, results are sent to
+# background worker processes in batches (matplotlib is imported once per worker, never in the
+# process running the backtests), and close() waits for the files.
+#
+#   python backtest/report.py --symbols NSE:RITES-EQ --kinds chart html csv   # from the saved results
+import argparse
+import html
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import DEFAULT_SYMBOL, symbol_paths, symbol_slug
+from utils.instrumentation import get_logger
+
+log = get_logger("report")
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+REPORT_KINDS = ("chart", "csv", "html")
+REPORT_DIR = os.path.join("artifacts", "reports")   # reports of labelled results (e.g. sweep runs)
+MAX_WORKERS = 2
+BATCH_SIZE = 16             # results per worker task
+
+
+def print_report(result):
+    """The classic console report: one line per simulated day, then the final metrics."""
+    trades_df, metrics = result.trades, result.metrics
+    print(f"📊 Simulating {len(trades_df)} trading days...")
+    print("="*100)
+    print(f"{'DATE':<12} | {'SIGNAL':<6} | {'ENTRY':<8} | {'STOP LOSS':<9} | {'EXIT':<8} | {'REASON':<10} | {'PnL (₹)':<10} | {'BALANCE'}")
+    print("="*100)
+
+    # Account balance as of each order date
+    equity = result.equity_frame().set_index("date")["balance"]
+    balance = equity.reindex(trades_df["date"], method="ffill").fillna(result.initial_capital)
+
+    for row, bal in zip(trades_df.itertuples(), balance.to_numpy()):
+        print(f"{row.date.date()} | {row.signal:<6} | {row.open:<8.2f} | {row.stop_loss:<9.2f} | {row.exit:<8.2f} | {row.reason:<10} | {row.pnl:<10.2f} | {bal:,.2f}")
+
+    print("="*100)
+    print("\n🏆 FINAL PERFORMANCE REPORT")
+    print("-" * 30)
+    print(f"💰 Final Capital:    ₹{metrics['final_capital']:,.2f}")
+    print(f"💵 Net Profit:       ₹{metrics['net_pnl']:,.2f} ({metrics['roi']:.2f}%)")
+    print(f"📉 Max Drawdown:     {metrics['max_drawdown']:.2%}")
+    print(f"⚡ Sharpe Ratio:     {metrics['sharpe']:.2f} (Target > 1.5)")
+    if "hit_rate" in metrics:
+        print(f"🎯 Hit Rate:         {metrics['hit_rate']:.1%} of {metrics['n_trades']} trades")
+        print(f"🔁 Turnover:         ₹{metrics['turnover']:,.2f} (costs ₹{metrics['costs']:,.2f}, "
+              f"{metrics['cost_drag']:.2%} of capital)")
+    if metrics.get("halted"):
+        print(f"🛑 Kill Switch:      {metrics['halted']} entries halted")
+    print("-" * 30)
+
+
+def report_paths(result, out_dir=None):
+    """Where each report kind of a result goes. An unlabelled result's chart keeps its usual path."""
+    if result.label is None and out_dir is None and result.symbol:
+        chart = symbol_paths(result.symbol)["chart"]
+        base = os.path.join(os.path.dirname(chart), symbol_slug(result.symbol))
+    else:
+        name = "_".join(str(p) for p in (symbol_slug(result.symbol) if result.symbol else "portfolio",
+                                         result.label) if p is not None)
+        base = os.path.join(out_dir or REPORT_DIR, name)
+        chart = base + "_performance_chart.png"
+    return {"chart": chart, "csv": base + "_trades.csv", "equity_csv": base + "_equity.csv",
+            "html": base + "_report.html"}
+
+
+def render_chart(result, path, title=None):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import pandas as pd
+
+    # Start point: the day before the first trade, at the initial capital
+    dates = [pd.Timestamp(result.dates[0]) - pd.Timedelta(days=1)] + list(pd.to_datetime(result.dates))
+    plt.figure(figsize=(10, 5))
+    plt.plot(dates, [result.initial_capital] + list(result.balance), marker='o', linestyle='-', color='green', linewidth=2)
+    plt.title(title or f"Equity Curve: {result.metrics['roi']:.2f}% Return")
+    plt.xlabel("Date")
+    plt.ylabel("Account Value (₹)")
+    plt.grid(True)
+    plt.axhline(y=result.initial_capital, color='r', linestyle='--', label="Initial Capital")
+    plt.legend()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    plt.savefig(path)
+    plt.close()
+    return path
+
+
+def render_csv(result, paths):
+    os.makedirs(os.path.dirname(paths["csv"]) or ".", exist_ok=True)
+    result.trades.to_csv(paths["csv"], index=False)
+    result.equity_frame().to_csv(paths["equity_csv"], index=False)
+    return [paths["csv"], paths["equity_csv"]]
+
+
+def render_html(result, paths):
+    metrics = "".join(f"<tr><th>{html.escape(k)}</th><td>{v:,.4f}</td></tr>" if isinstance(v, float)
+                      else f"<tr><th>{html.escape(k)}</th><td>{v}</td></tr>" for k, v in result.metrics.items())
+    chart = os.path.relpath(paths["chart"], os.path.dirname(paths["html"]) or ".")
+    title = html.escape(f"{result.symbol or 'Portfolio'} {result.label or ''}".strip())
+    page = (f"<html><head><meta charset='utf-8'><title>{title}</title></head><body>"
+            f"<h1>{title}</h1><table>{metrics}</table>"
+            + (f"<img src='{html.escape(chart)}'>" if os.path.exists(paths["chart"]) else "")
+            + result.trades.to_html(index=False, float_format=lambda v: f"{v:,.2f}") + "</body></html>")
+    os.makedirs(os.path.dirname(paths["html"]) or ".", exist_ok=True)
+    with open(paths["html"], "w") as f:
+        f.write(page)
+    return paths["html"]
+
+
+def render(result, kinds=("chart",), out_dir=None):
+    """Writes the requested reports of one result. Returns the written paths."""
+    paths, written = report_paths(result, out_dir), []
+    if not len(result.dates):
+        return written
+    # The chart first: the HTML page links it
+    if "chart" in kinds:
+        written.append(render_chart(result, paths["chart"]))
+    if "csv" in kinds:
+        written += render_csv(result, paths)
+    if "html" in kinds:
+        written.append(render_html(result, paths))
+    return written
+
+
+def _render_batch(batch):
+    return [path for result, kinds, out_dir in batch for path in render(result, kinds, out_dir)]
+
+
+class ReportPool:
+    """
+    Background report rendering. submit() only queues the result; full batches are handed to the
+    worker processes as they fill up, and close() sends the rest and waits for every file.
+
+        with ReportPool() as reports:
+            for result in results:
+                reports.submit(result, ("chart", "html"))
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, batch_size=BATCH_SIZE):
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.pending = []
+        self.futures = []
+        self.executor = None
+
+    def submit(self, result, kinds=("chart",), out_dir=None):
+        if result is None or not kinds:
+            return
+        self.pending.append((result, tuple(kinds), out_dir))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self.futures.append(self.executor.submit(_render_batch, self.pending))
+        self.pending = []
+
+    def close(self):
+        """Waits for every queued report. Returns the written paths."""
+        self.flush()
+        written = []
+        try:
+            for future in self.futures:
+                written += future.result()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+                self.executor = None
+            self.futures = []
+        return written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def report_symbols(symbols, kinds=("chart",), max_workers=MAX_WORKERS):
+    """Renders the reports of every symbol's saved backtest result (the DAG's report stage)."""
+    from backtest.engine import BacktestResult
+
+    reports = ReportPool(max_workers)
+    for symbol in symbols:
+        path = symbol_paths(symbol)["backtest"]
+        if not os.path.exists(path):
+            log.warning(f"⚠️ {symbol}: no backtest result. Run walk_forward.py first.")
+            continue
+        reports.submit(BacktestResult.load(path), kinds)
+    written = reports.close()
+    for path in written:
+        log.info(f"📈 Report saved to: {path}")
+    return written
+
+
+def report_symbol(symbol=DEFAULT_SYMBOL):
+    """One symbol's chart (the report stage of pipeline/dag.py)."""
+    from backtest.engine import BacktestResult
+
+    path = symbol_paths(symbol)["backtest"]
+    if not os.path.exists(path):
+        log.error(f"❌ Error: no backtest result for {symbol}. Run walk_forward.py first.")
+        return None
+    return render(BacktestResult.load(path), ("chart",))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render reports of saved backtest results in the background")
+    parser.add_argument("--symbols", nargs="+", default=[DEFAULT_SYMBOL])
+    parser.add_argument("--kinds", nargs="+", choices=REPORT_KINDS, default=["chart"])
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+    report_symbols(args.symbols, args.kinds, args.workers)
@@ -0,0 +1,180 @@
+# backtest/rolling_retrain.py
+# Genuine walk-forward evaluation: the model is retrained for every fold on a rolling (or
+# expanding) window that ends before the fold starts, and only predicts the fold's dates.
+# The out-of-sample predictions of all folds are stitched into one series in the
+# "predictions" table, so strategy/main.py and walk_forward.py consume them unchanged.
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features.feature_lib import FEATURE_COLS, compute_features
+from model.train import make_pipeline
+from pipeline.universe import DEFAULT_SYMBOL
+from utils.instrumentation import get_logger
+from utils.store import read_table, write_table
+
+log = get_logger("rolling_retrain")
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+TRAIN_WINDOW = 250      # bars (~1 year of daily data)
+TEST_WINDOW = 21        # bars (~1 month) predicted by each fold
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+WARM_START_TREES = 25   # trees added per fold in warm-start mode
+WARM_START_MAX_TREES = 200
+
+# Read-only feature matrix, set once per worker process by _init_worker
+_SHARED = {}
+
+
+def prepare_matrix(ohlcv_df):
+    """
+    Computes features ONCE for the whole history. Every fold slices these arrays, so
+    overlapping windows never recompute anything.
+
+    Row r holds the features of bar r and target = 1 if close[r + 1] > close[r]
+    (NaN for the last bar, whose next close is unknown).
+    """
+    df = compute_features(ohlcv_df.sort_values("date").reset_index(drop=True))
+    close = df["close"].to_numpy(float)
+    y = np.full(len(df), np.nan)
+    y[:-1] = (close[1:] > close[:-1]).astype(float)
+
+    X = df[FEATURE_COLS].to_numpy(float)
+    return {
+        "dates": df["date"].to_numpy(),
+        "X": X,
+        "X_input": np.nan_to_num(X, nan=0.0),   # inference fills warm-up NaNs like predict.py
+        "y": y,
+        "trainable": ~np.isnan(X).any(axis=1) & ~np.isnan(y),
+    }
+
+
+def make_folds(n_bars, train_window=TRAIN_WINDOW, test_window=TEST_WINDOW, first_test=None, expanding=False):
+    """
+    Fold k predicts bars [test_start, test_end). Predicting bar j uses the features of bar j - 1,
+    and training row r needs close[r + 1], so training rows end at test_start - 1 (exclusive):
+    every label is known before the first prediction of the fold is made.
+    """
+    first_test = first_test if first_test is not None else train_window + 1
+    folds = []
+    for test_start in range(first_test, n_bars, test_window):
+        train_end = test_start - 1
+        train_start = 0 if expanding else max(0, train_end - train_window)
+        folds.append({"fold": len(folds), "train": (train_start, train_end),
+                      "test": (test_start, min(test_start + test_window, n_bars))})
+    return folds
+
+
+def _init_worker(shared):
+    _SHARED.update(shared)
+
+
+def _predict_fold(pipeline, fold):
+    test_start, test_end = fold["test"]
+    inputs = _SHARED["X_input"][test_start - 1:test_end - 1]
+    # One predict_proba call gives both the signal and its confidence
+    proba = pipeline.predict_proba(inputs)
+    return pd.DataFrame({
+        "date": _SHARED["dates"][test_start:test_end],
+        "prediction": pipeline.classes_[proba.argmax(axis=1)].astype(int),
+        "confidence": proba.max(axis=1),
+        "fold": fold["fold"],
+    })
+
+
+def fit_fold(fold):
+    """Trains a fresh pipeline on the fold's window and predicts its test dates."""
+    train_start, train_end = fold["train"]
+    rows = np.arange(train_start, train_end)
+    rows = rows[_SHARED["trainable"][rows]]
+    pipeline = make_pipeline()
+    pipeline.fit(_SHARED["X"][rows], _SHARED["y"][rows].astype(int))
+    return _predict_fold(pipeline, fold)
+
+
+def run_warm_started(folds):
+    """
+    Sequential variant: each fold keeps the previous fold's trees and only grows
+    WARM_START_TREES new ones on its own window (oldest trees retire past WARM_START_MAX_TREES).
+    Trees are invariant to the per-feature scaling, so the scaler is fitted once on the first window.
+    """
+    pipeline = make_pipeline(n_estimators=WARM_START_TREES, warm_start=True)
+    scaler, forest = pipeline.named_steps["scaler"], pipeline.named_steps["model"]
+    outputs = []
+    for fold in folds:
+        train_start, train_end = fold["train"]
+        rows = np.arange(train_start, train_end)
+        rows = rows[_SHARED["trainable"][rows]]
+        X, y = _SHARED["X"][rows], _SHARED["y"][rows].astype(int)
+
+        if fold["fold"] == 0:
+            scaler.fit(X)
+        else:
+            if len(forest.estimators_) + WARM_START_TREES > WARM_START_MAX_TREES:
+                forest.estimators_ = forest.estimators_[WARM_START_TREES:]
+            forest.n_estimators = len(forest.estimators_) + WARM_START_TREES
+        forest.fit(scaler.transform(X), y)
+        outputs.append(_predict_fold(pipeline, fold))
+    return outputs
+
+
+def run_rolling_walk_forward(symbol=DEFAULT_SYMBOL, train_window=TRAIN_WINDOW, test_window=TEST_WINDOW,
+                             expanding=False, warm_start=False, max_workers=MAX_WORKERS, save=True):
+    start = time.perf_counter()
+    ohlcv_df = read_table("ohlcv", symbol, columns=["open", "high", "low", "close"])
+    shared = prepare_matrix(ohlcv_df)
+    folds = make_folds(len(ohlcv_df), train_window, test_window, expanding=expanding)
+    if not folds:
+        log.error(f"❌ Not enough history: {len(ohlcv_df)} bars for a {train_window}-bar training window.")
+        return None
+
+    mode = "expanding" if expanding else "rolling"
+    log.info(f"🔁 Walk-forward ({mode}, {'warm-started' if warm_start else f'{max_workers} workers'}): "
+             f"{len(folds)} folds x {test_window} bars, training window {train_window} bars")
+
+    if warm_start or max_workers <= 1:
+        _init_worker(shared)
+        outputs = run_warm_started(folds) if warm_start else [fit_fold(f) for f in folds]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(shared,)) as pool:
+            outputs = list(pool.map(fit_fold, folds))
+
+    # Stitch the out-of-sample predictions into one series
+    oos_df = pd.concat(outputs, ignore_index=True).sort_values("date").reset_index(drop=True)
+
+    # Out-of-sample hit rate (dates whose next close is known)
+    actual = pd.Series(shared["y"], index=pd.to_datetime(shared["dates"])).shift(1)
+    known = actual.reindex(oos_df["date"]).to_numpy()
+    mask = ~np.isnan(known)
+    hit_rate = (oos_df["prediction"].to_numpy()[mask] == known[mask]).mean() if mask.any() else float("nan")
+
+    log.info(f"🎯 Out-of-sample accuracy: {hit_rate:.2%} over {mask.sum()} days "
+             f"({oos_df['date'].min().date()} -> {oos_df['date'].max().date()}) in {time.perf_counter() - start:.1f}s")
+
+    if save:
+        write_table("predictions", symbol, oos_df)
+        log.info(f"✅ Stitched predictions saved to the store for {symbol} (run strategy/main.py then walk_forward.py)")
+    return oos_df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rolling / expanding walk-forward retraining")
+    parser.add_argument("--symbol", default=DEFAULT_SYMBOL)
+    parser.add_argument("--train-window", type=int, default=TRAIN_WINDOW)
+    parser.add_argument("--test-window", type=int, default=TEST_WINDOW)
+    parser.add_argument("--expanding", action="store_true", help="Train on all history up to each fold")
+    parser.add_argument("--warm-start", action="store_true", help="Grow the previous fold's forest (sequential)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    run_rolling_walk_forward(args.symbol, args.train_window, args.test_window, args.expanding,
+                             args.warm_start, args.workers, save=not args.no_save)
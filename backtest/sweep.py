@@ -0,0 +1,140 @@
+# backtest/sweep.py
+# Parallel parameter sweep over strategy + backtest knobs.
+#
+# Predictions and market data are loaded once, ATR is precomputed once per period, and the
+# result is handed to every worker process a single time (pool initializer) and treated as
+# read-only. Each task then only builds an order book and runs the vectorized backtest.
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backtest.engine import INITIAL_CAPITAL, BacktestResult, simulate
+from backtest.report import REPORT_KINDS, ReportPool
+from pipeline.universe import DEFAULT_SYMBOL, symbol_slug
+from strategy.main import ATR_METHOD, CAPITAL, atr_values, build_order_book
+from utils.instrumentation import get_logger
+from utils.store import read_table
+
+log = get_logger("sweep")
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+DEFAULT_GRID = {
+    "atr_period": [7, 14, 21],
+    "atr_multiplier": [1.0, 1.5, 2.0, 2.5],
+    "risk_per_trade": [0.01, 0.02, 0.03],
+    "min_confidence": [0.0, 0.55, 0.6, 0.7],
+    "brokerage_pct": [0.0003, 0.0005, 0.001],
+}
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+RANK_BY = ["sharpe", "roi"]
+
+# Read-only inputs, set once per worker process by _init_worker
+_SHARED = {}
+
+
+def expand_grid(grid):
+    """{"a": [1, 2], "b": [3]} -> [{"a": 1, "b": 3}, {"a": 2, "b": 3}]"""
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def load_inputs(symbol, atr_periods, atr_methods=(ATR_METHOD,)):
+    """Predictions, the market bars they trade on, and one ATR column per (period, method)."""
+    preds_df = read_table("predictions", symbol)
+    raw_df = read_table("ohlcv", symbol, end=preds_df["date"].max())
+    atr_by_period = {(p, m): atr_values(raw_df["high"], raw_df["low"], raw_df["close"], p, m)
+                     for p in atr_periods for m in atr_methods}
+    market_df = raw_df[raw_df["date"] >= preds_df["date"].min()].reset_index(drop=True)
+    return {"preds": preds_df, "raw": raw_df[["date", "close"]], "market": market_df, "atr": atr_by_period}
+
+
+def _init_worker(shared):
+    _SHARED.update(shared)
+
+
+def backtest_params(params, shared, symbol=None, label=None):
+    """Builds the order book for one parameter set and backtests it. Returns a BacktestResult."""
+    raw_df = shared["raw"].assign(atr=shared["atr"][params["atr_period"], params.get("atr_method", ATR_METHOD)])
+    order_df = build_order_book(
+        shared["preds"], raw_df,
+        capital=params.get("capital", CAPITAL),
+        risk_per_trade=params["risk_per_trade"],
+        atr_multiplier=params["atr_multiplier"],
+        min_confidence=params.get("min_confidence", 0.0),
+    )
+    initial_capital = params.get("capital", INITIAL_CAPITAL)
+    trades_df, equity_df = simulate(order_df, shared["market"], initial_capital, params["brokerage_pct"],
+                                    params.get("holding_days", 1))
+    return BacktestResult.from_simulation(symbol, trades_df, equity_df, initial_capital, label)
+
+
+def evaluate(params):
+    """One sweep run: params + metrics (no report is made here)."""
+    metrics = backtest_params(params, _SHARED).metrics
+    return {**params, **{k: float(v) if k != "n_trades" else v for k, v in metrics.items()}}
+
+
+def run_sweep(symbol=DEFAULT_SYMBOL, grid=None, max_workers=MAX_WORKERS, output_path=None,
+              report_top=0, report_kinds=("chart",)):
+    grid = grid or DEFAULT_GRID
+    combos = expand_grid(grid)
+    log.info(f"🧪 Sweeping {len(combos)} combinations for {symbol} on {max_workers} workers...")
+
+    start = time.perf_counter()
+    shared = load_inputs(symbol, sorted(set(grid["atr_period"])), sorted(set(grid.get("atr_method", [ATR_METHOD]))))
+
+    if max_workers <= 1:
+        _init_worker(shared)
+        rows = [evaluate(p) for p in combos]
+    else:
+        chunksize = max(1, len(combos) // (max_workers * 4))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(shared,)) as pool:
+            rows = list(pool.map(evaluate, combos, chunksize=chunksize))
+
+    results = pd.DataFrame(rows).sort_values(RANK_BY, ascending=False).reset_index(drop=True)
+    results.index.name = "rank"
+    results.index += 1
+
+    output_path = output_path or os.path.join(os.getcwd(), "artifacts", f"{symbol_slug(symbol)}_sweep_results.csv")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    results.to_csv(output_path)
+
+    log.info(f"✅ {len(results)} runs in {time.perf_counter() - start:.1f}s -> {output_path}")
+    print(results.head(10)[list(grid) + ["sharpe", "roi", "max_drawdown", "n_trades"]].to_string())
+
+    if report_top:
+        # Reports only for the best runs, rebuilt here (cheap) and rendered by background workers in batches
+        reports = ReportPool()
+        for rank, row in results.head(report_top).iterrows():
+            reports.submit(backtest_params({k: row[k] for k in grid}, shared, symbol, f"sweep_rank{rank}"),
+                           report_kinds)
+        written = reports.close()
+        log.info(f"📈 {len(written)} report file(s) for the top {report_top} runs in {os.path.dirname(written[0])}"
+                 if written else "⚠️ No reports written (no equity curve)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grid-search strategy and backtest parameters")
+    parser.add_argument("--symbol", default=DEFAULT_SYMBOL)
+    parser.add_argument("--grid", help='JSON file like {"atr_period": [14], "atr_method": ["sma", "wilder"], ...}')
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--output", help="CSV path (default: artifacts/<symbol>_sweep_results.csv)")
+    parser.add_argument("--report-top", type=int, default=0, help="Render reports of the N best runs")
+    parser.add_argument("--report-kinds", nargs="+", choices=REPORT_KINDS, default=["chart"])
+    args = parser.parse_args()
+
+    grid = dict(DEFAULT_GRID)
+    if args.grid:
+        with open(args.grid) as f:
+            grid.update(json.load(f))
+    run_sweep(args.symbol, grid, args.workers, args.output, args.report_top, args.report_kinds)
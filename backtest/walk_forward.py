@@ -1,156 +1,82 @@
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import DEFAULT_SYMBOL, symbol_paths
+from utils.instrumentation import get_logger, instrument_stage
+from utils.store import has_table, read_table
+from backtest.engine import BROKERAGE_PCT, INITIAL_CAPITAL, backtest
+from backtest.metrics import KillSwitch
+from backtest.report import REPORT_KINDS, ReportPool, print_report
+
+log = get_logger("backtest")
 
 # =========================
 # 🔹 CONFIGURATION
 # =========================
-INITIAL_CAPITAL = 100000    # ₹1 Lakh
-BROKERAGE_PCT = 0.0005      # 0.05% per trade (roughly Brokerage + STT)
-
-BASE_DIR = os.getcwd()
-ORDER_BOOK_PATH = os.path.join(BASE_DIR, "data", "processed", "final_order_book.csv")
-RAW_DATA_PATH = os.path.join(BASE_DIR, "data", "raw", "rites_daily.csv")
-ARTIFACTS_DIR = os.path.join(BASE_DIR, "artifacts")
-
-def run_backtest():
-    print("⏳ Starting Chronological Walk-Forward Backtest...")
+# INITIAL_CAPITAL / BROKERAGE_PCT live in backtest/engine.py
+HOLDING_DAYS = 1            # 1 = Day Trade: enter at the open, exit at the close
+
+@instrument_stage("backtest")
+def run_backtest(symbol=DEFAULT_SYMBOL, holding_days=HOLDING_DAYS, verbose=True, save=True, kill_switch=None):
+    """
+    Backtests the symbol's order book and returns a BacktestResult (trade log, equity curve,
+    metrics), also saved for the report stage. verbose=False logs nothing at all; charts
+    and other reports are made from the result by backtest/report.py, only on request.
+    kill_switch: a backtest.metrics.KillSwitch, to skip the entries live trading would have halted.
+    """
+    quiet = lambda *args, **kwargs: None
+    say, warn, fail = (log.info, log.warning, log.error) if verbose else (quiet, quiet, quiet)
+    say("⏳ Starting Chronological Walk-Forward Backtest...")
     
     # 1. LOAD DATA
-    if not os.path.exists(ORDER_BOOK_PATH) or not os.path.exists(RAW_DATA_PATH):
-        print("❌ Error: Missing input files. Run main.py first.")
+    if not has_table("order_book", symbol) or not has_table("ohlcv", symbol):
+        fail("❌ Error: Missing input data. Run main.py first.")
         return
 
     # Load planned trades
-    orders_df = pd.read_csv(ORDER_BOOK_PATH)
-    orders_df["date"] = pd.to_datetime(orders_df["date"])
+    orders_df = read_table("order_book", symbol)
 
-    # Load actual market history (The "Answer Key")
-    market_df = pd.read_csv(RAW_DATA_PATH)
-    market_df["date"] = pd.to_datetime(market_df["date"])
+    # Load actual market history (The "Answer Key"), only over the traded window
+    market_df = read_table("ohlcv", symbol, start=orders_df["date"].min(), end=orders_df["date"].max())
 
-    # Merge to align Plan with Reality
-    backtest_df = pd.merge(orders_df, market_df, on="date", how="inner")
+    # 2. SIMULATION (vectorized, see backtest/engine.py)
+    # With multi-day holding, PnL is booked on the exit date, so load a few bars past the last order
+    if holding_days > 1:
+        market_df = read_table("ohlcv", symbol, start=orders_df["date"].min())
+    result = backtest(orders_df, market_df, symbol, INITIAL_CAPITAL, BROKERAGE_PCT, holding_days,
+                      kill_switch=kill_switch)
     
-    if backtest_df.empty:
-        print("⚠️ No overlapping dates found between Orders and Market Data.")
-        print("   (Check if your rites_daily.csv actually contains Jan 2026 data)")
+    if result is None:
+        warn("⚠️ No overlapping dates found between Orders and Market Data.")
+        warn(f"   (Check if the OHLCV data for {symbol} actually contains Jan 2026 data)")
         return
 
-    print(f"📊 Simulating {len(backtest_df)} trading days...")
-    print("="*100)
-    print(f"{'DATE':<12} | {'SIGNAL':<6} | {'ENTRY':<8} | {'STOP LOSS':<9} | {'EXIT':<8} | {'REASON':<10} | {'PnL (₹)':<10} | {'BALANCE'}")
-    print("="*100)
-
-    # 2. SIMULATION LOOP
-    current_capital = INITIAL_CAPITAL
-    capital_history = [INITIAL_CAPITAL]
-    dates = [backtest_df.iloc[0]["date"] - pd.Timedelta(days=1)] # Start point for chart
-
-    results = []
-
-    for i, row in backtest_df.iterrows():
-        signal = row["signal"]
-        qty = row["qty"]
-        planned_sl = row["stop_loss"]
-        
-        # Market Data for the day
-        open_price = row["open"]
-        high_price = row["high"]
-        low_price = row["low"]
-        close_price = row["close"]
-
-        pnl = 0
-        exit_price = 0
-        reason = "-"
-        
-        if signal == "BUY" and qty > 0:
-            # Entry assumption: We enter at the OPEN price
-            entry_price = open_price 
-            
-            # --- CHECK STOP LOSS ---
-            # Did the stock dip below our SL during the day?
-            if low_price <= planned_sl:
-                exit_price = planned_sl
-                reason = "SL HIT 🛑"
-            else:
-                # If SL not hit, we exit at Market Close (Day Trade)
-                exit_price = close_price
-                reason = "CLOSE 🟢"
-
-            # Gross PnL
-            gross_pnl = (exit_price - entry_price) * qty
-            
-            # Transaction Costs (Entry + Exit)
-            turnover = (entry_price * qty) + (exit_price * qty)
-            costs = turnover * BROKERAGE_PCT
-            
-            pnl = gross_pnl - costs
-        
-        else:
-            reason = "NO TRADE"
-
-        # Update Balance
-        current_capital += pnl
-        capital_history.append(current_capital)
-        dates.append(row["date"])
-
-        print(f"{row['date'].date()} | {signal:<6} | {open_price:<8.2f} | {planned_sl:<9.2f} | {exit_price:<8.2f} | {reason:<10} | {pnl:<10.2f} | {current_capital:,.2f}")
-
-        results.append({
-            "date": row["date"],
-            "daily_return": pnl
-        })
-
-    # 3. CALCULATE METRICS
-    results_df = pd.DataFrame(results)
-    
-    # Net PnL
-    net_pnl = current_capital - INITIAL_CAPITAL
-    roi = (net_pnl / INITIAL_CAPITAL) * 100
-    
-    # Sharpe Ratio (Daily)
-    # Note: For short periods (8 days), Sharpe is volatile. We annualize it.
-    daily_returns = results_df["daily_return"] / INITIAL_CAPITAL
-    mean_return = daily_returns.mean()
-    std_return = daily_returns.std()
-    
-    if std_return == 0:
-        sharpe = 0
-    else:
-        sharpe = (mean_return / std_return) * np.sqrt(252)
-
-    # Max Drawdown
-    equity_curve = np.array(capital_history)
-    peak = np.maximum.accumulate(equity_curve)
-    drawdown = (equity_curve - peak) / peak
-    max_drawdown = drawdown.min()
-
-    print("="*100)
-    print("\n🏆 FINAL PERFORMANCE REPORT")
-    print("-" * 30)
-    print(f"💰 Final Capital:    ₹{current_capital:,.2f}")
-    print(f"💵 Net Profit:       ₹{net_pnl:,.2f} ({roi:.2f}%)")
-    print(f"📉 Max Drawdown:     {max_drawdown:.2%}")
-    print(f"⚡ Sharpe Ratio:     {sharpe:.2f} (Target > 1.5)")
-    print("-" * 30)
-
-    # 4. PLOT & SAVE CHART
-    plt.figure(figsize=(10, 5))
-    plt.plot(dates, capital_history, marker='o', linestyle='-', color='green', linewidth=2)
-    plt.title(f"Equity Curve: {roi:.2f}% Return")
-    plt.xlabel("Date")
-    plt.ylabel("Account Value (₹)")
-    plt.grid(True)
-    plt.axhline(y=INITIAL_CAPITAL, color='r', linestyle='--', label="Initial Capital")
-    plt.legend()
-    
-    chart_path = os.path.join(ARTIFACTS_DIR, "performance_chart.png")
-    os.makedirs(ARTIFACTS_DIR, exist_ok=True)
-    plt.savefig(chart_path)
-    print(f"📈 Performance Chart saved to: {chart_path}")
-    # plt.show() # Uncomment if you want to see the popup
+    # 3. REPORT (metrics are in the result; Sharpe is annualized, volatile over a few days)
+    if verbose:
+        print_report(result)
+    if save:
+        path = symbol_paths(symbol)["backtest"]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        result.save(path)
+    return result
 
 if __name__ == "__main__":
-    run_backtest()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of one symbol's order book")
+    parser.add_argument("--symbol", default=DEFAULT_SYMBOL)
+    parser.add_argument("--holding-days", type=int, default=HOLDING_DAYS)
+    parser.add_argument("--report", nargs="*", choices=REPORT_KINDS, default=["chart"],
+                        help="Reports rendered in the background (default: chart; none with --report)")
+    parser.add_argument("--quiet", action="store_true", help="No console report")
+    parser.add_argument("--kill-switch", action="store_true",
+                        help="Halt new entries at the live thresholds of backtest/metrics.py")
+    args = parser.parse_args()
+
+    result = run_backtest(args.symbol, args.holding_days, verbose=not args.quiet,
+                          kill_switch=KillSwitch() if args.kill_switch else None)
+    reports = ReportPool()
+    reports.submit(result, args.report)
+    for path in reports.close():
+        log.info(f"📈 Report saved to: {path}")
@@ -0,0 +1,271 @@
+# bench/pipeline_bench.py
+# Benchmark suite for the pipeline stages.
+#
+# Generates deterministic synthetic OHLCV (symbols x years x resolution) into a throwaway store,
+# then times and memory-profiles every stage on it separately: build_features, train_model,
+# run_predictions, execute_strategy and run_backtest. Results (seconds, peak memory and
+# a hash of every stage's output) are written as JSON; comparing with a stored baseline flags
+# stages that got slower / hungrier beyond a threshold, and any stage whose output changed.
+#
+#   python bench/pipeline_bench.py --scale medium --save-baseline
+#   python bench/pipeline_bench.py --scale medium --compare          # exit code 1 on regression
+import argparse
+import contextlib
+import datetime
+import gc
+import hashlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from fyers.mock_client import synthetic_bars
+from utils.cache import hash_frame
+from utils.store import read_table, resolution_table, write_table
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+SCALES = {
+    "small": {"symbols": 2, "years": 1, "resolution": "D"},
+    "medium": {"symbols": 8, "years": 5, "resolution": "D"},
+    "large": {"symbols": 50, "years": 10, "resolution": "D"},
+    "intraday": {"symbols": 4, "years": 1, "resolution": "5"},
+}
+# Bars end here: training stops at the model's cutoff and the quarter after it is predicted / traded
+DATA_END = "2026-03-31"
+REPEATS = 3
+THRESHOLD = 0.20            # flag a stage 20% slower (or 20% more memory) than the baseline
+MIN_SECONDS = 0.05          # ignore timing noise on stages faster than this
+RESULTS_DIR = os.path.join(ROOT, "bench", "results")
+BASELINE_DIR = os.path.join(ROOT, "bench", "baselines")
+
+STAGES = ["features", "train", "predict", "strategy", "backtest"]
+DAILY_ONLY = {"train", "predict", "strategy", "backtest"}
+
+
+def bench_symbols(n):
+    return [f"NSE:BENCH{i:03d}-EQ" for i in range(n)]
+
+
+def generate_data(symbols, years, resolution="D"):
+    """Deterministic bars for every symbol (same symbol + dates -> same numbers on every machine)."""
+    start = (pd.Timestamp(DATA_END) - pd.DateOffset(years=years)).strftime("%Y-%m-%d")
+    rows = 0
+    for i, symbol in enumerate(symbols):
+        bars = synthetic_bars(symbol, start, DATA_END, resolution, start_price=100.0 + 10 * i)
+        rows += write_table(resolution_table("ohlcv", resolution), symbol, bars)
+    return rows
+
+
+def stage_runner(stage, resolution):
+    """(function(symbol), output reader(symbol) -> DataFrame / dict used for the output hash)."""
+    if stage == "features":
+        from features.build_features import build_features
+        return (lambda s: build_features(s, use_cache=False, resolution=resolution),
+                lambda s: read_table(resolution_table("features", resolution), s))
+    if stage == "train":
+        from model.train import train_model
+        return lambda s: train_model(s, use_cache=False), _model_output
+    if stage == "predict":
+        from model.predict import run_predictions
+        return run_predictions, lambda s: read_table("predictions", s)
+    if stage == "strategy":
+        from strategy.main import execute_strategy
+        return execute_strategy, lambda s: read_table("order_book", s)
+    if stage == "backtest":
+        from backtest.walk_forward import run_backtest
+        # Headless: simulation + metrics only (reports are a separate, on-request step)
+        return lambda s: run_backtest(s, verbose=False).metrics, None
+    raise ValueError(f"Unknown stage '{stage}'")
+
+
+def _model_output(symbol):
+    """A fitted model is compared by what it predicts on its own training features."""
+    import joblib
+    from features.feature_lib import FEATURE_COLS
+    from pipeline.universe import symbol_paths
+
+    model = joblib.load(symbol_paths(symbol)["model"])
+    return pd.DataFrame(model.predict_proba(read_table("features", symbol)[FEATURE_COLS]))
+
+
+def output_hash(values):
+    """One hash over every symbol's output of a stage (frames by content, dicts by their numbers)."""
+    h = hashlib.sha256()
+    for value in values:
+        if isinstance(value, pd.DataFrame):
+            h.update(hash_frame(value.reset_index(drop=True)).encode())
+        elif isinstance(value, dict):
+            clean = {k: round(float(v), 10) for k, v in value.items() if isinstance(v, (int, float, np.number))}
+            h.update(json.dumps(clean, sort_keys=True).encode())
+        else:
+            h.update(repr(value).encode())
+    return h.hexdigest()[:16]
+
+
+def run_stage(stage, symbols, resolution, repeats=REPEATS, profile_memory=True):
+    func, reader = stage_runner(stage, resolution)
+
+    def run_all():
+        results = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for symbol in symbols:
+                results.append(func(symbol))
+        return results
+
+    timings = []
+    for _ in range(repeats):
+        gc.collect()
+        started = time.perf_counter()
+        results = run_all()
+        timings.append(time.perf_counter() - started)
+
+    peak_mb = None
+    if profile_memory:
+        # Separate run: tracemalloc slows Python code down, so it never overlaps a timed run
+        gc.collect()
+        tracemalloc.start()
+        run_all()
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024**2
+        tracemalloc.stop()
+
+    failed = [s for s, r in zip(symbols, results) if r is None]
+    outputs = [reader(s) for s in symbols] if reader else results
+    return {
+        "seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "peak_mb": peak_mb,
+        "failed": failed,
+        "hash": output_hash(outputs) if not failed else None,
+    }
+
+
+def environment():
+    import sklearn
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "sklearn": sklearn.__version__, "platform": platform.platform(), "cpus": os.cpu_count(),
+            "commit": commit}
+
+
+def run_benchmark(scale="small", stages=STAGES, repeats=REPEATS, profile_memory=True, **overrides):
+    config = {**SCALES[scale], **{k: v for k, v in overrides.items() if v is not None}}
+    symbols = bench_symbols(config["symbols"])
+    resolution = str(config["resolution"])
+    if resolution != "D":
+        skipped = [s for s in stages if s in DAILY_ONLY]
+        stages = [s for s in stages if s not in DAILY_ONLY]
+        if skipped:
+            print(f"⚠️ {', '.join(skipped)} only run on daily bars: skipped at resolution {resolution}")
+
+    workdir = tempfile.mkdtemp(prefix="finstreet_bench_")
+    old_cwd, old_store = os.getcwd(), os.environ.get("FINSTREET_STORE_DIR")
+    try:
+        # Stages write data/store and artifacts/ under the cwd: keep the real project untouched
+        os.chdir(workdir)
+        os.environ["FINSTREET_STORE_DIR"] = os.path.join(workdir, "data", "store")
+
+        started = time.perf_counter()
+        rows = generate_data(symbols, config["years"], resolution)
+        print(f"🧪 {scale}: {len(symbols)} symbols x {config['years']}y @ {resolution} -> {rows:,} bars "
+              f"generated in {time.perf_counter() - started:.1f}s")
+
+        results = {}
+        for stage in stages:
+            results[stage] = run_stage(stage, symbols, resolution, repeats, profile_memory)
+            r = results[stage]
+            mem = f"{r['peak_mb']:8.1f} MB" if r["peak_mb"] is not None else "       -   "
+            status = f"❌ failed for {len(r['failed'])} symbols" if r["failed"] else r["hash"]
+            print(f"   {stage:<9} {r['seconds']:8.3f}s  (min {r['min_seconds']:.3f}s)  peak {mem}  {status}")
+    finally:
+        os.chdir(old_cwd)
+        if old_store is None:
+            os.environ.pop("FINSTREET_STORE_DIR", None)
+        else:
+            os.environ["FINSTREET_STORE_DIR"] = old_store
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {"scale": scale, "config": config, "bars": rows, "repeats": repeats,
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "environment": environment(), "stages": results}
+
+
+def compare(result, baseline, threshold=THRESHOLD):
+    """Regressions of `result` vs `baseline`: slower / more memory beyond threshold, or changed outputs."""
+    problems = []
+    for stage, new in result["stages"].items():
+        old = baseline["stages"].get(stage)
+        if old is None:
+            continue
+        if old["hash"] and new["hash"] and old["hash"] != new["hash"]:
+            problems.append(f"{stage}: OUTPUT CHANGED ({old['hash']} -> {new['hash']})")
+        if new["failed"]:
+            problems.append(f"{stage}: failed for {', '.join(new['failed'])}")
+        if max(old["seconds"], new["seconds"]) >= MIN_SECONDS and new["seconds"] > old["seconds"] * (1 + threshold):
+            problems.append(f"{stage}: {old['seconds']:.3f}s -> {new['seconds']:.3f}s "
+                            f"(+{new['seconds'] / old['seconds'] - 1:.0%})")
+        if old.get("peak_mb") and new.get("peak_mb") and new["peak_mb"] > old["peak_mb"] * (1 + threshold):
+            problems.append(f"{stage}: peak {old['peak_mb']:.1f} MB -> {new['peak_mb']:.1f} MB")
+    return problems
+
+
+def save_json(data, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile every pipeline stage")
+    parser.add_argument("--scale", choices=list(SCALES), default="small")
+    parser.add_argument("--symbols", type=int, help="Override the scale's number of symbols")
+    parser.add_argument("--years", type=int, help="Override the scale's years of history")
+    parser.add_argument("--resolution", help="Override the scale's bar resolution (D, 5, 15, 60)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--output", help="Results JSON (default: bench/results/<timestamp>_<scale>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the scale's baseline")
+    parser.add_argument("--compare", nargs="?", const="", metavar="BASELINE_JSON",
+                        help="Compare with a baseline (default: bench/baselines/<scale>.json)")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    result = run_benchmark(args.scale, args.stages, args.repeats, not args.no_memory,
+                           symbols=args.symbols, years=args.years, resolution=args.resolution)
+
+    stamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    path = save_json(result, args.output or os.path.join(RESULTS_DIR, f"{stamp}_{args.scale}.json"))
+    print(f"📄 Results written to {path}")
+    if args.save_baseline:
+        print(f"📌 Baseline saved to {save_json(result, os.path.join(BASELINE_DIR, f'{args.scale}.json'))}")
+
+    if args.compare is not None:
+        baseline_path = args.compare or os.path.join(BASELINE_DIR, f"{args.scale}.json")
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        problems = compare(result, baseline, args.threshold)
+        if problems:
+            print(f"🚨 {len(problems)} regression(s) vs {baseline_path}:")
+            for problem in problems:
+                print(f"   - {problem}")
+            sys.exit(1)
+        print(f"✅ No regressions vs {baseline_path} (threshold {args.threshold:.0%})")
@@ -0,0 +1,174 @@
+# cli.py
+# One entry point for the daily jobs:  python cli.py <command> [options]
+#
+# Nothing heavy is imported at start-up: each command imports only the stage it runs, when it
+# runs. `orders` never loads pandas / pyarrow / sklearn (it reads the order book's JSON copy,
+# see utils/order_plan.py), so a pre-open cron job starts in tens of milliseconds.
+#
+#   python cli.py orders --date 2026-01-02 --mock
+#   python cli.py run                                   # minimum rebuild up to the backtest
+#   python cli.py pipeline --symbols NSE:RITES-EQ --stages features train predict strategy
+#   python cli.py backtest --symbol NSE:RITES-EQ
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from pipeline.universe import DEFAULT_SYMBOL
+
+
+def cmd_fetch(args):
+    from fyers.fyers_fetch_rites import RANGE_FROM, RANGE_TO, fetch_data
+    return fetch_data(args.symbol, args.range_from or RANGE_FROM, args.range_to or RANGE_TO, args.resolution)
+
+
+def cmd_features(args):
+    from features.build_features import build_features
+    return build_features(args.symbol, use_cache=not args.no_cache, resolution=args.resolution,
+                          chunk_rows=args.chunk_rows)
+
+
+def cmd_train(args):
+    from model.train import train_model
+    return train_model(args.symbol, use_cache=not args.no_cache)
+
+
+def cmd_tune(args):
+    from model.tune import tune_models
+    return tune_models(args.symbols)
+
+
+def cmd_predict(args):
+    from model.predict import run_predictions
+    return run_predictions(args.symbol)
+
+
+def cmd_strategy(args):
+    from strategy.main import execute_strategy
+    return execute_strategy(args.symbol)
+
+
+def cmd_backtest(args):
+    from backtest.metrics import KillSwitch
+    from backtest.report import ReportPool
+    from backtest.walk_forward import HOLDING_DAYS, run_backtest
+
+    result = run_backtest(args.symbol, args.holding_days or HOLDING_DAYS, verbose=not args.quiet,
+                          kill_switch=KillSwitch() if args.kill_switch else None)
+    reports = ReportPool()
+    reports.submit(result, args.report)
+    for path in reports.close():
+        print(f"📈 Report saved to: {path}")
+    return result
+
+
+def cmd_orders(args):
+    from fyers.orders import LIVE_STATE_PATH, MOCK_STATE_PATH, close_day, place_orders
+    from pipeline.universe import load_universe, table_dir
+
+    client = None
+    if args.mock:
+        from fyers.mock_client import MockFyersModel
+        client = MockFyersModel()
+    state_path = MOCK_STATE_PATH if args.mock else LIVE_STATE_PATH
+    if args.close_day:
+        return close_day(client, args.date, state_path)
+    symbols = args.symbols or [row["symbol"] for row in load_universe()
+                               if os.path.isdir(table_dir("order_book", row["symbol"]))]
+    return place_orders(symbols, client, date=args.date, state_path=state_path)
+
+
+def cmd_pipeline(args):
+    from pipeline.run_universe import MAX_WORKERS, STAGES, run_universe
+    from pipeline.universe import load_universe
+
+    symbols = args.symbols or [row["symbol"] for row in load_universe()]
+    return run_universe(symbols, stages=args.stages or STAGES, max_workers=args.workers or MAX_WORKERS)
+
+
+def cmd_run(args):
+    from pipeline.dag import DEFAULT_TARGETS, MAX_WORKERS, run_dag
+    from pipeline.universe import load_universe
+
+    symbols = args.symbols or [row["symbol"] for row in load_universe()]
+    results = run_dag(symbols, args.targets or DEFAULT_TARGETS, args.refresh, args.force, args.dry_run,
+                      args.workers or MAX_WORKERS)
+    return results if all(r["status"] == "ok" for r in results) else None
+
+
+def cmd_serve(args):
+    from model.server import HOST, PORT, serve
+    return serve(HOST, args.port or PORT, args.unix, args.symbols)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="FinStreet daily pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def command(name, func, help, symbol=True):
+        sub = commands.add_parser(name, help=help)
+        if symbol:
+            sub.add_argument("--symbol", default=DEFAULT_SYMBOL)
+        sub.set_defaults(func=func)
+        return sub
+
+    sub = command("fetch", cmd_fetch, "Bring the symbol's daily bars up to date")
+    sub.add_argument("--from", dest="range_from")
+    sub.add_argument("--to", dest="range_to")
+    sub.add_argument("--resolution", default="D")
+
+    sub = command("features", cmd_features, "Build the features table")
+    sub.add_argument("--resolution", default="D")
+    sub.add_argument("--chunk-rows", type=int, help="Out-of-core build, this many bars at a time")
+    sub.add_argument("--no-cache", action="store_true")
+
+    sub = command("train", cmd_train, "Train the symbol's model")
+    sub.add_argument("--no-cache", action="store_true")
+
+    sub = command("tune", cmd_tune, "Purged time-series CV model search", symbol=False)
+    sub.add_argument("--symbols", nargs="+", default=[DEFAULT_SYMBOL])
+
+    command("predict", cmd_predict, "Predict the days after the training cutoff")
+    command("strategy", cmd_strategy, "Turn predictions into the order book")
+
+    sub = command("backtest", cmd_backtest, "Walk-forward backtest of the order book")
+    sub.add_argument("--holding-days", type=int)
+    sub.add_argument("--report", nargs="*", default=["chart"], help="chart / csv / html (none with --report)")
+    sub.add_argument("--quiet", action="store_true", help="No console report")
+    sub.add_argument("--kill-switch", action="store_true", help="Halt entries at the live thresholds")
+
+    sub = command("orders", cmd_orders, "Place today's orders (lean: no pandas)", symbol=False)
+    sub.add_argument("--symbols", nargs="+", help="Default: every universe symbol with an order book")
+    sub.add_argument("--date", help="Force the trade date (YYYY-MM-DD)")
+    sub.add_argument("--mock", action="store_true", help="Send orders to the offline MockFyersModel")
+    sub.add_argument("--close-day", action="store_true", help="After the close: record fills, close the day")
+
+    sub = command("pipeline", cmd_pipeline, "Run the stages for the universe in parallel", symbol=False)
+    sub.add_argument("--symbols", nargs="+")
+    sub.add_argument("--stages", nargs="+")
+    sub.add_argument("--workers", type=int)
+
+    sub = command("run", cmd_run, "Run only the stale stages up to the targets (pipeline/dag.py)", symbol=False)
+    sub.add_argument("--symbols", nargs="+")
+    sub.add_argument("--targets", nargs="+")
+    sub.add_argument("--refresh", action="store_true", help="Fetch new bars first")
+    sub.add_argument("--force", nargs="+", default=[])
+    sub.add_argument("--dry-run", action="store_true")
+    sub.add_argument("--workers", type=int)
+
+    sub = command("serve", cmd_serve, "Persistent local inference server", symbol=False)
+    sub.add_argument("--port", type=int)
+    sub.add_argument("--unix")
+    sub.add_argument("--symbols", nargs="*", default=[])
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    result = args.func(args)
+    # Stages return None on failure: make that visible to cron
+    return 1 if result is None else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
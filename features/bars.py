@@ -0,0 +1,208 @@
+# features/bars.py
+# Streaming bar aggregation: 1-minute bars -> 5m / 15m / 1h / D in a single pass.
+#
+# Buckets are anchored at the NSE session open (09:15), so a 1h bar covers 09:15-10:14 and the
+# last bar of the day is the 15:15-15:29 stub. Minute history is streamed from the store in
+# chunks (utils/store.iter_table), each chunk is reduced with NumPy, and only the unfinished
+# last bucket is carried over to the next chunk, so memory does not grow with the history.
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import DEFAULT_SYMBOL
+from utils.store import BATCH_ROWS, has_table, iter_table, resolution_table, write_table
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+SESSION_OPEN = 9 * 60 + 15      # minutes after midnight (09:15)
+SESSION_CLOSE = 15 * 60 + 30    # 15:30, the last 1-minute bar starts at 15:29
+RESOLUTION_MINUTES = {"1": 1, "5": 5, "15": 15, "60": 60, "D": SESSION_CLOSE - SESSION_OPEN}
+FLUSH_ROWS = 50_000             # aggregated bars buffered before they are written to the store
+
+OHLCV_COLS = ["date", "open", "high", "low", "close", "volume"]
+
+
+def bucket_starts(dates, resolution):
+    """Start of the bar each timestamp falls in (midnight of the day for resolution 'D')."""
+    minutes = np.asarray(dates).astype("datetime64[m]")
+    days = minutes.astype("datetime64[D]")
+    if str(resolution) == "D":
+        return days.astype("datetime64[ns]")
+    step = RESOLUTION_MINUTES[str(resolution)]
+    offset = (minutes - days).astype("int64") - SESSION_OPEN
+    start = SESSION_OPEN + (offset // step) * step
+    return (days + start.astype("timedelta64[m]")).astype("datetime64[ns]")
+
+
+def bucket_end(bucket, resolution):
+    """Exclusive end of a bar: start + bar length, cut at the session close."""
+    day = np.datetime64(bucket, "D")
+    if str(resolution) == "D":
+        end = SESSION_CLOSE
+    else:
+        end = min((np.datetime64(bucket, "m") - day).astype("int64") + RESOLUTION_MINUTES[str(resolution)],
+                  SESSION_CLOSE)
+    return day + np.timedelta64(end, "m")
+
+
+def bucket_complete(bucket, last_minute, resolution):
+    """True when `last_minute` is the final 1-minute bar of `bucket` (no need to wait for the next one)."""
+    return np.datetime64(last_minute, "m") + np.timedelta64(1, "m") >= bucket_end(bucket, resolution)
+
+
+def aggregate(df, resolution):
+    """Vectorized OHLCV aggregation of date-sorted bars (open/close of the first/last bar in each bucket)."""
+    if df.empty:
+        return pd.DataFrame(columns=OHLCV_COLS)
+    keys = bucket_starts(df["date"].to_numpy(), resolution)
+    starts = np.r_[0, np.flatnonzero(keys[1:] != keys[:-1]) + 1]
+    ends = np.r_[starts[1:], len(keys)] - 1
+    return pd.DataFrame({
+        "date": keys[starts],
+        "open": df["open"].to_numpy(float)[starts],
+        "high": np.maximum.reduceat(df["high"].to_numpy(float), starts),
+        "low": np.minimum.reduceat(df["low"].to_numpy(float), starts),
+        "close": df["close"].to_numpy(float)[ends],
+        "volume": np.add.reduceat(df["volume"].to_numpy("int64"), starts),
+    })
+
+
+class BarAggregator:
+    """
+    Incremental aggregator for one symbol and one target resolution.
+
+    feed(chunk) takes a DataFrame of minute bars (historical ingestion), update(...) a single
+    bar (live mode). Both return only bars that are complete; the bar still being built is
+    kept in `partial` until its last minute arrives, a later bucket starts, or flush() is called.
+
+    from_ticks=True aggregates raw ticks (update(ts, ltp, ltp, ltp, ltp, qty)): a tick inside the
+    last minute does not close the bar, close_due(now) does once the clock passes the bar's end.
+    """
+
+    def __init__(self, resolution, from_ticks=False):
+        self.resolution = str(resolution)
+        self.from_ticks = from_ticks
+        self.partial = None     # [bucket, open, high, low, close, volume, last_minute]
+
+    def update(self, date, open_, high, low, close, volume=0):
+        """Pushes one minute bar (or tick). Returns the completed bar as a dict, or None."""
+        bucket = bucket_starts(np.array([np.datetime64(pd.Timestamp(date), "ns")]), self.resolution)[0]
+        done = None
+        if self.partial is not None and self.partial[0] != bucket:
+            done = self._emit()
+        if self.partial is None:
+            self.partial = [bucket, open_, high, low, close, volume, date]
+        else:
+            p = self.partial
+            p[2], p[3], p[4], p[5], p[6] = max(p[2], high), min(p[3], low), close, p[5] + volume, date
+        if done is None and not self.from_ticks and bucket_complete(bucket, date, self.resolution):
+            done = self._emit()
+        return done
+
+    def close_due(self, now):
+        """Emits the bar in progress if `now` is past its end (the next bucket may never trade)."""
+        if self.partial is None:
+            return None
+        if np.datetime64(pd.Timestamp(now), "ns") >= bucket_end(self.partial[0], self.resolution):
+            return self._emit()
+        return None
+
+    def feed(self, chunk):
+        """Pushes a date-sorted chunk of minute bars. Returns the completed bars as a DataFrame."""
+        if chunk.empty:
+            return pd.DataFrame(columns=OHLCV_COLS)
+        bars = aggregate(chunk, self.resolution)
+
+        if self.partial is not None:
+            if bars["date"].iloc[0] == self.partial[0]:
+                # The carried bucket continues in this chunk: merge it into the first bar
+                p = self.partial
+                bars.loc[0, ["open", "high", "low", "volume"]] = [
+                    p[1], max(p[2], bars.at[0, "high"]), min(p[3], bars.at[0, "low"]), p[5] + bars.at[0, "volume"]]
+            else:
+                bars = pd.concat([pd.DataFrame([self._emit()]), bars], ignore_index=True)
+
+        # The last bucket may continue in the next chunk unless its final minute is already here
+        last = bars.iloc[-1]
+        last_minute = chunk["date"].iloc[-1]
+        if bucket_complete(last["date"], last_minute.to_datetime64(), self.resolution):
+            self.partial = None
+            return bars
+        self.partial = [last["date"].to_datetime64(), last["open"], last["high"], last["low"], last["close"],
+                        int(last["volume"]), last_minute]
+        return bars.iloc[:-1].reset_index(drop=True)
+
+    def flush(self):
+        """Emits the bar in progress (end of data / end of session). Returns a DataFrame."""
+        if self.partial is None:
+            return pd.DataFrame(columns=OHLCV_COLS)
+        return pd.DataFrame([self._emit()], columns=OHLCV_COLS)
+
+    def _emit(self):
+        bucket, open_, high, low, close, volume, _ = self.partial
+        self.partial = None
+        return {"date": pd.Timestamp(bucket), "open": float(open_), "high": float(high), "low": float(low),
+                "close": float(close), "volume": int(volume)}
+
+
+def resample_history(symbol=DEFAULT_SYMBOL, resolutions=("5", "15", "60"), source_resolution="1",
+                     start=None, end=None, batch_rows=BATCH_ROWS):
+    """
+    Builds the higher-resolution tables (ohlcv_5m, ohlcv_15m, ohlcv_60m, ohlcv for 'D') from the
+    stored minute bars in ONE streaming pass: every chunk is read once and fed to all aggregators.
+    Returns {resolution: bars written}.
+    """
+    source = resolution_table("ohlcv", source_resolution)
+    if not has_table(source, symbol):
+        print(f"❌ Error: no {source} data for {symbol} in the store. Run fyers/downloader.py --resolution 1 first.")
+        return None
+
+    started = time.perf_counter()
+    aggregators = {str(r): BarAggregator(r) for r in resolutions}
+    buffers = {r: [] for r in aggregators}
+    written = {r: 0 for r in aggregators}
+    # A full rebuild replaces each target table; a ranged one merges into it
+    mode = {r: "overwrite" if start is None else "append" for r in aggregators}
+
+    def flush(res, bars_list):
+        bars = pd.concat(bars_list, ignore_index=True) if bars_list else None
+        if bars is not None and len(bars):
+            write_table(resolution_table("ohlcv", res), symbol, bars, mode=mode[res])
+            mode[res] = "append"
+            written[res] += len(bars)
+
+    n_minutes = 0
+    for chunk in iter_table(source, symbol, columns=OHLCV_COLS, start=start, end=end, batch_rows=batch_rows):
+        n_minutes += len(chunk)
+        for res, agg in aggregators.items():
+            bars = agg.feed(chunk)
+            if len(bars):
+                buffers[res].append(bars)
+            if sum(len(b) for b in buffers[res]) >= FLUSH_ROWS:
+                flush(res, buffers[res])
+                buffers[res] = []
+
+    for res, agg in aggregators.items():
+        flush(res, buffers[res] + [agg.flush()])
+
+    summary = ", ".join(f"{resolution_table('ohlcv', r)}: {n}" for r, n in written.items())
+    print(f"✅ {symbol}: {n_minutes} minute bars -> {summary} in {time.perf_counter() - started:.1f}s")
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate stored 1-minute bars into higher resolutions")
+    parser.add_argument("--symbols", nargs="+", default=[DEFAULT_SYMBOL])
+    parser.add_argument("--resolutions", nargs="+", default=["5", "15", "60"], help="5, 15, 60, D ...")
+    parser.add_argument("--from", dest="start", help="YYYY-MM-DD (default: the whole history)")
+    parser.add_argument("--to", dest="end", help="YYYY-MM-DD")
+    args = parser.parse_args()
+
+    for symbol in args.symbols:
+        resample_history(symbol, args.resolutions, start=args.start, end=args.end)
@@ -1,65 +1,98 @@
 # features/build_features.py
-import pandas as pd
-import numpy as np
 import os
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features import feature_lib
+from features.feature_lib import FEATURE_COLS, compute_features, compute_features_chunked
+from pipeline.universe import DEFAULT_SYMBOL
+from utils.cache import ArtifactCache, hash_frame, hash_source, make_key
+from utils.instrumentation import count, get_logger, instrument_stage
+from utils.store import TableWriter, has_table, iter_table, read_table, resolution_table, write_table
+
+log = get_logger("features")
 
-def compute_clv(df):
-    denom = (df["high"] - df["low"]).replace(0, np.nan)
-    clv = ((df["close"] - df["low"]) - (df["high"] - df["close"])) / denom
-    return clv.fillna(0)
+def add_target(df):
+    # Target: 1 if the NEXT bar (next day for daily bars) is Up, 0 if Down
+    return df.assign(target=(df["close"].shift(-1) > df["close"]).astype(int))
 
-def compute_streaks(df):
-    close_diff = df["close"].diff()
-    up = (close_diff > 0).astype(int)
-    down = (close_diff < 0).astype(int)
-    up_streak, down_streak = [], []
-    u, d = 0, 0
-    for i in range(len(df)):
-        u = u + 1 if up.iloc[i] == 1 else 0
-        d = d + 1 if down.iloc[i] == 1 else 0
-        up_streak.append(u)
-        down_streak.append(d)
-    return pd.Series(up_streak, index=df.index), pd.Series(down_streak, index=df.index)
+def stream_features(chunks):
+    """Training rows (features + target) chunk by chunk; each chunk's last bar waits for the next close."""
+    pending = None
+    for df in compute_features_chunked(chunks):
+        if pending is not None:
+            df = pd.concat([pending, df], ignore_index=True)
+        pending = df.iloc[-1:]
+        yield add_target(df).iloc[:-1].dropna()
+    if pending is not None:
+        # The very last bar has no next close: target 0, as in the in-memory path
+        yield add_target(pending).dropna()
 
-def build_features():
-    # PATH SETUP
-    # Assuming this script is inside a folder (e.g., 'features/' or root)
-    # We use relative paths to be safe.
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # If this script is in 'features/', go up one level. If in root, stay there.
-    # Adjust this logic if your folder structure changes. 
-    # Here we assume running from ROOT.
-    input_path = "data/raw/rites_daily.csv"
-    output_path = "data/processed/rites_features.csv"
-    
-    if not os.path.exists(input_path):
-        print(f"❌ Error: {input_path} not found. Run fyers_fetch_rites.py first.")
+@instrument_stage("features")
+def build_features(symbol=DEFAULT_SYMBOL, use_cache=True, resolution="D", chunk_rows=None):
+    # Here we assume running from ROOT (the store lives in data/store).
+    # Features are per bar of `resolution`: daily bars -> "features", 5-minute bars -> "features_5m"...
+    bars_table = resolution_table("ohlcv", resolution)
+    features_table = resolution_table("features", resolution)
+    if not has_table(bars_table, symbol):
+        log.error(f"❌ Error: no {bars_table} data for {symbol} in the store. Run fyers_fetch_rites.py first.")
         return
 
-    print("📖 Loading Data...")
-    df = pd.read_csv(input_path)
-    df["date"] = pd.to_datetime(df["date"])
-    df = df.sort_values("date").reset_index(drop=True)
+    if chunk_rows:
+        # OUT-OF-CORE: stream the bars and the features, only one chunk in memory (no cache)
+        log.info(f"⚙️ Engineering Features in chunks of {chunk_rows:,} bars...")
+        with TableWriter(features_table, symbol) as writer:
+            for df in stream_features(iter_table(bars_table, symbol, batch_rows=chunk_rows)):
+                writer.write(df)
+        log.info(f"✅ Features saved to the store for {symbol} ({writer.rows} rows for training)")
+        return writer.rows
 
-    print("⚙️ Engineering Features...")
-    df["return_1d"] = df["close"].pct_change(1)
-    df["return_3d"] = df["close"].pct_change(3)
-    df["return_5d"] = df["close"].pct_change(5)
-    df["clv"] = compute_clv(df)
-    df["up_streak"], df["down_streak"] = compute_streaks(df)
-    df["accel"] = df["return_1d"] - df["return_1d"].shift(1)
-    
-    # Target: 1 if NEXT day is Up, 0 if Down
-    df["target"] = (df["close"].shift(-1) > df["close"]).astype(int)
+    log.info("📖 Loading Data...")
+    df = read_table(bars_table, symbol)
 
-    # Clean NaNs (removes the last row because target is NaN)
+    # CACHE: same raw rows + same feature code -> same features
+    cache = ArtifactCache() if use_cache else None
+    key = make_key("features", data=hash_frame(df), code=hash_source(feature_lib, build_features),
+                   feature_cols=FEATURE_COLS, resolution=str(resolution))
+    cached_path = cache.get(key) if cache else None
+    if cached_path:
+        count("cache_hits", stage="features")
+        final_df = pd.read_parquet(cached_path)
+        write_table(features_table, symbol, final_df)
+        log.info(f"♻️ Inputs unchanged: reused cached features for {symbol} ({len(final_df)} rows)")
+        return final_df
+
+    log.info("⚙️ Engineering Features...")
+    # Same registered features that predict.py uses at inference time
+    df = add_target(compute_features(df))
+
+    # Clean NaNs (the first bars, before every lookback is filled)
     final_df = df.dropna().reset_index(drop=True)
 
     # SAVE
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    final_df.to_csv(output_path, index=False)
-    print(f"✅ Features saved to {output_path} ({len(final_df)} rows for training)")
+    write_table(features_table, symbol, final_df)
+    log.info(f"✅ Features saved to the store for {symbol} ({len(final_df)} rows for training)")
+
+    if cache:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = os.path.join(tmp, "features.parquet")
+            final_df.to_parquet(tmp_path, index=False)
+            cache.put(key, tmp_path, "features", symbol, {
+                "rows": len(df), "first_bar": df["date"].min(), "last_bar": df["date"].max(),
+            })
+    return final_df
 
 if __name__ == "__main__":
-    build_features()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the feature table for one symbol")
+    parser.add_argument("--symbol", default=DEFAULT_SYMBOL)
+    parser.add_argument("--resolution", default="D", help="D, 5, 15, 60 ... (see features/bars.py)")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--chunk-rows", type=int, help="Stream the bars in chunks of this many rows "
+                                                        "(constant memory for histories larger than RAM)")
+    args = parser.parse_args()
+    build_features(args.symbol, use_cache=not args.no_cache, resolution=args.resolution, chunk_rows=args.chunk_rows)
@@ -0,0 +1,83 @@
+# features/feature_engine.py
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from features.feature_lib import BAR_COLS, FEATURE_COLS, FEATURE_META, FEATURE_REGISTRY, MAX_LOOKBACK, compute_features
+
+
+def point_in_time_features(df, target_dates):
+    """
+    Batch mode: returns the input vector for every target date in one vectorized pass.
+
+    Every feature only looks backwards, so the row for the last bar strictly before
+    a target date is exactly what compute_features would give on that truncated history.
+    """
+    df = df.sort_values("date").reset_index(drop=True)
+    feats = compute_features(df)
+
+    target_dates = pd.to_datetime(pd.Series(target_dates)).to_numpy()
+    # Index of the last bar strictly BEFORE each target date
+    pos = np.searchsorted(df["date"].to_numpy(), target_dates, side="left") - 1
+
+    out = feats.iloc[np.clip(pos, 0, None)][FEATURE_COLS].fillna(0).reset_index(drop=True)
+    out.insert(0, "input_date", df["date"].iloc[np.clip(pos, 0, None)].to_numpy())
+    out.insert(0, "date", target_dates)
+    # Target dates with no history before them get no input vector
+    return out[pos >= 0].reset_index(drop=True)
+
+
+class IncrementalFeatureEngine:
+    """
+    Emits FEATURE_COLS for one new bar from the feature registry itself: every kernel runs over
+    the last MAX_LOOKBACK + 1 bars, and run counters carry on from the previous bar. O(1) per bar,
+    and a newly registered feature is served without touching this class.
+    """
+
+    def __init__(self):
+        self.bars = {col: deque(maxlen=MAX_LOOKBACK + 1) for col in BAR_COLS}
+        self.runs = {name: 0 for name, meta in FEATURE_META.items() if meta["run"]}
+        self.last = None
+
+    def update(self, high, low, close):
+        """Pushes one closed bar and returns its feature vector (dict in FEATURE_COLS order)."""
+        bar = {"high": high, "low": low, "close": close}
+        for col in BAR_COLS:
+            self.bars[col].append(float(bar[col]))
+        window = {col: np.array(values) for col, values in self.bars.items()}
+
+        values = {}
+        for name, func in FEATURE_REGISTRY.items():
+            window[name] = func(window)
+            value = window[name][-1]
+            if name in self.runs:
+                # The window only sees the end of the run: count on from the previous bar
+                value = self.runs[name] = self.runs[name] + 1 if value > 0 else 0
+            values[name] = value
+        self.last = {col: (0 if _isnan(values[col]) else float(values[col])) for col in FEATURE_COLS}
+        return self.last
+
+    def warm_up(self, df):
+        """Takes over the state at the last bar of a history, so the next update() continues from it."""
+        if df.empty:
+            return self.last
+        feats = compute_features(df[list(BAR_COLS)].reset_index(drop=True))
+        tail = feats.tail(MAX_LOOKBACK + 1)
+        for col in BAR_COLS:
+            self.bars[col].clear()
+            self.bars[col].extend(tail[col].astype(float))
+        for name in self.runs:
+            self.runs[name] = int(feats[name].iloc[-1])
+        last = feats.iloc[-1]
+        self.last = {col: (0 if _isnan(float(last[col])) else float(last[col])) for col in FEATURE_COLS}
+        return self.last
+
+    def vector(self):
+        """Latest feature vector as a list in FEATURE_COLS order."""
+        return [self.last[col] for col in FEATURE_COLS] if self.last else None
+
+
+def _isnan(value):
+    return isinstance(value, float) and math.isnan(value)
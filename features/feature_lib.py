@@ -0,0 +1,154 @@
+# features/feature_lib.py
+# Shared feature definitions: build_features.py (training) and predict.py (inference)
+# both import from here so the model always sees the same numbers.
+import numpy as np
+import pandas as pd
+
+# =========================
+# 🔹 FEATURE REGISTRY
+# =========================
+# name -> function(df) returning a 1-D array aligned with df.
+# Functions run in registration order, so a feature may use any column registered before it.
+# Kernels only read df[col] as arrays (BAR_COLS + earlier features): training passes a DataFrame,
+# the live engine (features/feature_engine.py) a dict of NumPy arrays over its last bars.
+FEATURE_REGISTRY = {}
+FEATURE_META = {}           # name -> {"lookback": bars back, "run": run counter?}
+BAR_COLS = ("high", "low", "close")
+
+
+def register_feature(name, lookback, run=False):
+    """
+    Decorator that adds a feature kernel to the registry under `name`.
+
+    lookback: how many bars before the current one its value depends on (return_5d: 5).
+    run: a run counter (+1 per bar while a condition holds, 0 when it breaks). Its value depends on
+    the whole run, so chunked and live computation carry it on instead of using the lookback alone.
+    """
+    def wrapper(func):
+        FEATURE_REGISTRY[name] = func
+        FEATURE_META[name] = {"lookback": lookback, "run": run}
+        return func
+    return wrapper
+
+
+# =========================
+# 🔹 VECTORIZED KERNELS
+# =========================
+def pct_change(close, n):
+    """Same numbers as pandas Series.pct_change(n), on a NumPy array."""
+    close = np.asarray(close, dtype=float)
+    out = np.full(close.shape, np.nan)
+    if len(close) > n:
+        out[n:] = close[n:] / close[:-n] - 1
+    return out
+
+
+def run_length(mask):
+    """Length of the current run of True values at every position (resets to 0 on False)."""
+    mask = np.asarray(mask, dtype=bool)
+    counts = np.cumsum(mask)
+    # Count reached at the most recent False, carried forward
+    resets = np.maximum.accumulate(np.where(mask, 0, counts))
+    return counts - resets
+
+
+def clv(high, low, close):
+    """Close Location Value in [-1, 1]; 0 when the bar has no range."""
+    high, low, close = (np.asarray(a, dtype=float) for a in (high, low, close))
+    denom = high - low
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = ((close - low) - (high - close)) / denom
+    return np.where(denom == 0, 0.0, out)
+
+
+def close_diff(close):
+    close = np.asarray(close, dtype=float)
+    out = np.full(close.shape, np.nan)
+    out[1:] = close[1:] - close[:-1]
+    return out
+
+
+def accel(return_1d):
+    """Change in the 1-day return versus the previous bar."""
+    return_1d = np.asarray(return_1d, dtype=float)
+    out = np.full(return_1d.shape, np.nan)
+    out[1:] = return_1d[1:] - return_1d[:-1]
+    return out
+
+
+# =========================
+# 🔹 FEATURES
+# =========================
+@register_feature("return_1d", lookback=1)
+def _return_1d(df):
+    return pct_change(df["close"], 1)
+
+
+@register_feature("return_3d", lookback=3)
+def _return_3d(df):
+    return pct_change(df["close"], 3)
+
+
+@register_feature("return_5d", lookback=5)
+def _return_5d(df):
+    return pct_change(df["close"], 5)
+
+
+@register_feature("clv", lookback=0)
+def _clv(df):
+    return clv(df["high"], df["low"], df["close"])
+
+
+@register_feature("up_streak", lookback=1, run=True)
+def _up_streak(df):
+    return run_length(close_diff(df["close"]) > 0)
+
+
+@register_feature("down_streak", lookback=1, run=True)
+def _down_streak(df):
+    return run_length(close_diff(df["close"]) < 0)
+
+
+@register_feature("accel", lookback=2)
+def _accel(df):
+    return accel(df["return_1d"])
+
+
+FEATURE_COLS = list(FEATURE_REGISTRY)
+
+# Longest lookback used by any feature (return_5d needs the close 5 bars back)
+MAX_LOOKBACK = max(meta["lookback"] for meta in FEATURE_META.values())
+# Run counters: their value depends on the whole run, however far back it started
+RUN_FEATURES = tuple(name for name, meta in FEATURE_META.items() if meta["run"])
+
+
+def compute_features(df):
+    """Calculates every registered feature for the entire dataset."""
+    df = df.copy()
+    for name, func in FEATURE_REGISTRY.items():
+        df[name] = func(df)
+    return df
+
+
+def compute_features_chunked(chunks, lookback=MAX_LOOKBACK):
+    """
+    compute_features over consecutive chunks of one series, yielding one chunk at a time.
+    Every chunk is computed with the previous `lookback` bars prepended, and the run counters
+    carry on from the last bar before it, so the numbers are identical to one big compute_features.
+    """
+    if lookback < MAX_LOOKBACK:
+        raise ValueError(f"lookback={lookback} is shorter than the registered features need ({MAX_LOOKBACK})")
+    context = None
+    for chunk in chunks:
+        if context is None:
+            out = compute_features(chunk)
+        else:
+            out = compute_features(pd.concat([context[chunk.columns], chunk], ignore_index=True))
+            steps = np.arange(len(out))
+            for name in RUN_FEATURES:
+                run = out[name].to_numpy()
+                # A run unbroken since the first context bar continues the one counted before it
+                out[name] = np.where(run == steps, run + context[name].iloc[0], run)
+            out = out.iloc[len(context):].reset_index(drop=True)
+        context = (out if context is None else pd.concat([context, out], ignore_index=True)).tail(lookback)
+        yield out
@@ -0,0 +1,180 @@
+# features/labels.py
+# Labels for several horizons and a point-in-time training-set builder.
+#
+# One pass over a symbol's bars gives the features of every bar and all of its labels:
+#   up_<h>d      1 if close[t + h] > close[t] (h = 1 is build_features.py's target)
+#   ret_<h>d     close[t + h] / close[t] - 1
+#   barrier      triple barrier on the strategy's own levels: the ATR stop of strategy/main.py
+#                below the close, a profit target PROFIT_TAKE x that distance above it, and
+#                BARRIER_HOLDING bars. 1 = target hit first, -1 = stop hit first (also when both
+#                are touched on the same bar, like the backtest assumes), 0 = neither in time.
+#
+# Every row carries its as-of time (the bar whose close its features use) and, per label, the
+# time the label became known. Bars after the cutoff are never read, so a label that would
+# need them is missing (NaN) instead of leaking: nothing in a row is from after the cutoff.
+# Labels are kept per row (no frame-wide dropna), so every horizon trains on all its known rows
+# of the SAME float32 feature matrix.
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features.feature_lib import FEATURE_COLS, compute_features
+from pipeline.universe import DEFAULT_SYMBOL
+from strategy.main import ATR_METHOD, ATR_MULTIPLIER, ATR_PERIOD, atr_values
+from utils.store import has_table, read_table, resolution_table
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+HORIZONS = (1, 3, 5)
+BARRIER_HOLDING = 5         # vertical barrier, in bars
+PROFIT_TAKE = 1.0           # profit target at PROFIT_TAKE x the stop distance
+
+
+def _ahead(values, h, fill):
+    """values[t + h] for every t (fill past the end)."""
+    out = np.full(len(values), fill, dtype=values.dtype)
+    if len(values) > h:
+        out[:-h] = values[h:]
+    return out
+
+
+def horizon_labels(dates, close, horizons=HORIZONS):
+    """{name: (values, known_at)} for up_<h>d and ret_<h>d of every horizon."""
+    labels = {}
+    for h in horizons:
+        future = _ahead(close, h, np.nan)
+        known_at = _ahead(dates, h, np.datetime64("NaT"))
+        with np.errstate(invalid="ignore"):
+            up = np.where(np.isnan(future), np.nan, (future > close).astype(float))
+        labels[f"up_{h}d"] = (up, known_at)
+        labels[f"ret_{h}d"] = (future / close - 1, known_at)
+    return labels
+
+
+def triple_barrier_labels(dates, high, low, close, atr, holding=BARRIER_HOLDING,
+                          atr_multiplier=ATR_MULTIPLIER, profit_take=PROFIT_TAKE):
+    """{"barrier": (label, known_at), "barrier_ret": (return at the exit, known_at)} for bars t+1..t+holding."""
+    n = len(close)
+    stop = close - atr * atr_multiplier             # size_position's stop, entry ~ this close
+    target = close + atr * atr_multiplier * profit_take
+
+    # (n, holding) windows of the next bars, NaN past the end (a NaN never touches a barrier)
+    pad = np.full(holding, np.nan)
+    highs = sliding_window_view(np.concatenate([high[1:], pad]), holding)[:n]
+    lows = sliding_window_view(np.concatenate([low[1:], pad]), holding)[:n]
+    closes = sliding_window_view(np.concatenate([close[1:], pad]), holding)[:n]
+
+    up_hit = highs >= target[:, None]
+    down_hit = lows <= stop[:, None]
+    first_up = np.where(up_hit.any(axis=1), up_hit.argmax(axis=1), holding)
+    first_down = np.where(down_hit.any(axis=1), down_hit.argmax(axis=1), holding)
+
+    label = np.where(first_down < holding, np.where(first_down <= first_up, -1.0, 1.0),
+                     np.where(first_up < holding, 1.0, 0.0))
+    exit_step = np.minimum(np.minimum(first_up, first_down), holding - 1)
+    exit_price = np.where(label == -1, stop, np.where(label == 1, target, closes[np.arange(n), exit_step]))
+
+    # Known once a barrier is touched, or once all `holding` bars exist; unknown before the ATR exists
+    rows = np.arange(n)
+    known = ((label != 0) | (rows + holding <= n - 1)) & (atr > 0)
+    exit_bar = np.minimum(rows + 1 + exit_step, n - 1)
+    known_at = np.where(known, dates[exit_bar], np.datetime64("NaT"))
+    label = np.where(known, label, np.nan)
+    barrier_ret = np.where(known, exit_price / close - 1, np.nan)
+    return {"barrier": (label, known_at), "barrier_ret": (barrier_ret, known_at)}
+
+
+class TrainingSet:
+    """
+    Dense float32 features of every bar with a full lookback, and all labels aligned to them.
+    One instance feeds any number of models / horizons: matrix(label) only selects rows.
+    """
+
+    def __init__(self, symbol, as_of, X, labels, known_at, feature_cols=FEATURE_COLS):
+        self.symbol = symbol
+        self.as_of = as_of              # datetime64: bar whose close the row's features use
+        self.X = X                      # float32 (rows, features), C-contiguous
+        self.labels = labels            # name -> float32 (rows,), NaN where not known
+        self.known_at = known_at        # name -> datetime64 (rows,): when the label was known
+        self.feature_cols = list(feature_cols)
+
+    @property
+    def label_names(self):
+        return list(self.labels)
+
+    def mask(self, label, known_by=None):
+        """Rows whose `label` is known (by `known_by`, if given: e.g. a fold's start)."""
+        mask = ~np.isnan(self.labels[label])
+        if known_by is not None:
+            mask &= self.known_at[label] <= np.datetime64(pd.Timestamp(known_by))
+        return mask
+
+    def matrix(self, label, known_by=None):
+        """(X, y) for one label: float32 features, y as int8 classes (or float32 for returns)."""
+        mask = self.mask(label, known_by)
+        y = self.labels[label][mask]
+        return self.X[mask], (y.astype(np.int8) if not label.startswith(("ret_", "barrier_ret")) else y)
+
+    def frame(self):
+        """The whole set as a DataFrame (as_of, features, labels, known_at_<label>) for inspection."""
+        df = pd.DataFrame(self.X, columns=self.feature_cols)
+        df.insert(0, "as_of", self.as_of)
+        for name, values in self.labels.items():
+            df[name] = values
+            df[f"known_at_{name}"] = self.known_at[name]
+        return df
+
+
+def build_training_set(symbol=DEFAULT_SYMBOL, horizons=HORIZONS, cutoff=None, resolution="D",
+                       holding=BARRIER_HOLDING, profit_take=PROFIT_TAKE, atr_period=ATR_PERIOD,
+                       atr_method=ATR_METHOD, atr_multiplier=ATR_MULTIPLIER):
+    """Features + every label of one symbol from its bars up to `cutoff` (inclusive), in one pass."""
+    bars = read_table(resolution_table("ohlcv", resolution), symbol,
+                      columns=["open", "high", "low", "close"], end=cutoff)
+    feats = compute_features(bars)
+    dates = bars["date"].to_numpy()
+    high, low, close = (bars[c].to_numpy(float) for c in ("high", "low", "close"))
+    atr = atr_values(bars["high"], bars["low"], bars["close"], atr_period, atr_method)
+
+    labels = horizon_labels(dates, close, horizons)
+    labels.update(triple_barrier_labels(dates, high, low, close, atr, holding, atr_multiplier, profit_take))
+
+    # Rows whose features have a full lookback (the warm-up bars have NaN features)
+    X = feats[FEATURE_COLS].to_numpy(np.float64)
+    valid = ~np.isnan(X).any(axis=1)
+    return TrainingSet(
+        symbol, dates[valid], np.ascontiguousarray(X[valid], dtype=np.float32),
+        {name: values[valid].astype(np.float32) for name, (values, _) in labels.items()},
+        {name: known_at[valid] for name, (_, known_at) in labels.items()},
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-horizon / triple-barrier labels of one symbol")
+    parser.add_argument("--symbol", default=DEFAULT_SYMBOL)
+    parser.add_argument("--horizons", nargs="+", type=int, default=list(HORIZONS))
+    parser.add_argument("--holding", type=int, default=BARRIER_HOLDING, help="Triple barrier: max bars held")
+    parser.add_argument("--profit-take", type=float, default=PROFIT_TAKE)
+    parser.add_argument("--cutoff", help="Only bars up to this date (YYYY-MM-DD)")
+    parser.add_argument("--resolution", default="D")
+    args = parser.parse_args()
+
+    if not has_table(resolution_table("ohlcv", args.resolution), args.symbol):
+        print(f"❌ Error: no bars for {args.symbol} in the store.")
+        sys.exit(1)
+    ts = build_training_set(args.symbol, args.horizons, args.cutoff, args.resolution, args.holding, args.profit_take)
+    print(f"🏷️ {args.symbol}: {len(ts.X)} rows x {ts.X.shape[1]} features (float32, "
+          f"{ts.X.nbytes / 1024:.0f} KB) as of {pd.Timestamp(ts.as_of[0]).date()} -> {pd.Timestamp(ts.as_of[-1]).date()}")
+    for name in ts.label_names:
+        values = ts.labels[name][ts.mask(name)]
+        if name.startswith(("ret_", "barrier_ret")):
+            print(f"   {name:<12} {len(values):>6} known | mean {values.mean():+.4f} | std {values.std():.4f}")
+        else:
+            classes = ", ".join(f"{int(c):+d}: {(values == c).mean():.0%}" for c in np.unique(values))
+            print(f"   {name:<12} {len(values):>6} known | {classes}")
@@ -0,0 +1,265 @@
+# fyers/downloader.py
+# Chunked, resumable, concurrent history downloader for the FYERS history API.
+#
+# A long range is split into API-sized windows that are fetched by a small thread pool,
+# throttled by a shared token bucket and retried with exponential backoff. Only days outside the
+# range already covered are requested: the stored bars, plus the days a completed download found
+# empty (weekends, holidays, before the listing), recorded per symbol in
+# data/store/coverage/<table>/<slug>.json. An interrupted backfill resumes where it stopped and a
+# daily refresh is a single small request.
+import datetime
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.instrumentation import api_timer, instrument_stage
+from utils.rate_limit import TokenBucket
+from pipeline.universe import symbol_slug, table_dir
+from utils.store import has_table, read_table, resolution_table, write_table
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+# FYERS caps a single history request at 366 days for daily candles, 100 days for minute candles
+MAX_DAYS_PER_REQUEST = {"D": 366, "1D": 366}
+MAX_DAYS_PER_REQUEST_INTRADAY = 100
+
+# FYERS allows 10 requests/s and 200/min per app: stay under the per-minute limit with small bursts
+REQUESTS_PER_SECOND = 3
+BURST = 5
+MAX_WORKERS = 4
+MAX_RETRIES = 5
+MARKET_TZ = "Asia/Kolkata"   # intraday bars are stored on the exchange wall clock (session 09:15-15:30)
+BACKOFF_BASE = 1.0    # seconds, doubled after every failed attempt
+COVERAGE_TABLE = "coverage"   # outside the Parquet tables, like utils/order_plan.py
+
+
+class HistoryFetchError(Exception):
+    pass
+
+
+def ohlcv_table(resolution):
+    """Store table for a resolution: daily bars in 'ohlcv', intraday in e.g. 'ohlcv_1m'."""
+    return resolution_table("ohlcv", resolution)
+
+
+def date_windows(range_from, range_to, resolution="D"):
+    """Splits [range_from, range_to] (inclusive dates) into API-sized windows."""
+    max_days = MAX_DAYS_PER_REQUEST.get(str(resolution), MAX_DAYS_PER_REQUEST_INTRADAY)
+    start = pd.Timestamp(range_from).normalize()
+    end = pd.Timestamp(range_to).normalize()
+    windows = []
+    while start <= end:
+        window_end = min(start + pd.Timedelta(days=max_days - 1), end)
+        windows.append((start.strftime("%Y-%m-%d"), window_end.strftime("%Y-%m-%d")))
+        start = window_end + pd.Timedelta(days=1)
+    return windows
+
+
+def candles_to_df(candles, resolution="D"):
+    cols = ["timestamp", "open", "high", "low", "close", "volume"]
+    df = pd.DataFrame(candles, columns=cols)
+    df["date"] = pd.to_datetime(df["timestamp"], unit="s")
+    if str(resolution) not in ("D", "1D"):
+        # Epoch seconds -> IST wall clock, so minute bars line up with the 09:15 session open
+        df["date"] = df["date"].dt.tz_localize("UTC").dt.tz_convert(MARKET_TZ).dt.tz_localize(None)
+    return df[["date", "open", "high", "low", "close", "volume"]]
+
+
+def fetch_window(client, symbol, resolution, range_from, range_to, bucket=None,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE):
+    """One history request with throttling and exponential backoff (+ jitter) on failure."""
+    data_params = {
+        "symbol": symbol,
+        "resolution": str(resolution),
+        "date_format": "1",
+        "range_from": range_from,
+        "range_to": range_to,
+        "cont_flag": "1"
+    }
+    last_error = None
+    for attempt in range(max_retries + 1):
+        if bucket:
+            bucket.acquire()
+        try:
+            with api_timer("history") as call:
+                response = client.history(data=data_params)
+                call["ok"] = response.get("s") in ("ok", "no_data")
+        except Exception as e:   # network errors, timeouts
+            response = {"s": "error", "message": f"{type(e).__name__}: {e}"}
+
+        if response.get("s") == "ok" and "candles" in response:
+            return candles_to_df(response["candles"], resolution)
+        if response.get("s") == "no_data":
+            return candles_to_df([], resolution)
+
+        last_error = response.get("message", response)
+        if attempt < max_retries:
+            time.sleep(backoff_base * (2 ** attempt) * (1 + random.random() * 0.25))
+
+    raise HistoryFetchError(f"{symbol} {range_from}..{range_to}: {last_error}")
+
+
+def coverage_path(symbol, resolution="D"):
+    return os.path.join(table_dir(COVERAGE_TABLE), ohlcv_table(resolution), f"{symbol_slug(symbol)}.json")
+
+
+def read_coverage(symbol, resolution="D"):
+    """(first, last) day already requested in full for the symbol, or None."""
+    path = coverage_path(symbol, resolution)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        covered = json.load(f)
+    return pd.Timestamp(covered["from"]), pd.Timestamp(covered["to"])
+
+
+def write_coverage(symbol, resolution, first, last):
+    path = coverage_path(symbol, resolution)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"from": first.strftime("%Y-%m-%d"), "to": last.strftime("%Y-%m-%d")}, f)
+    os.replace(path + ".tmp", path)
+
+
+def covered_range(symbol, resolution="D"):
+    """
+    (first, last, last_bar) of what is covered: the stored bars' days joined with the recorded
+    coverage, and the day of the last stored bar. None when nothing is covered yet.
+    """
+    table = ohlcv_table(resolution)
+    dates = read_table(table, symbol, columns=["date"])["date"] if has_table(table, symbol) else None
+    bars = (dates.min().normalize(), dates.max().normalize()) if dates is not None and not dates.empty else None
+    covered = read_coverage(symbol, resolution)
+    if bars is None and covered is None:
+        return None
+    spans = [r for r in (bars, covered) if r is not None]
+    return min(r[0] for r in spans), max(r[1] for r in spans), bars[1] if bars else None
+
+
+def missing_ranges(symbol, range_from, range_to, resolution="D"):
+    """
+    Parts of [range_from, range_to] not covered yet, as (head, tail): the days before the covered
+    range and the days after it. Either is None when there is nothing to fetch.
+    """
+    start, end = pd.Timestamp(range_from).normalize(), pd.Timestamp(range_to).normalize()
+    covered = covered_range(symbol, resolution)
+    if covered is None:
+        return None, (range_from, range_to)
+
+    first, last, last_bar = covered
+    head = tail = None
+    if start < first:
+        head_to = min(end, first - pd.Timedelta(days=1))
+        head = (start.strftime("%Y-%m-%d"), head_to.strftime("%Y-%m-%d"))
+    tail_from = last + pd.Timedelta(days=1)
+    if str(resolution) not in ("D", "1D") and last_bar == last:
+        # Re-request the last stored day: an intraday session may have been cut short
+        tail_from = last
+    tail_from = max(start, tail_from)
+    if tail_from <= end:
+        tail = (tail_from.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+    return head, tail
+
+
+@instrument_stage("fetch")
+def download_history(client, symbol, range_from, range_to=None, resolution="D",
+                     max_workers=MAX_WORKERS, bucket=None, resume=True):
+    """
+    Downloads [range_from, range_to] for one symbol into the store and returns the new bars.
+
+    Windows are fetched concurrently but committed to the store in order: forwards after the
+    stored bars, backwards (newest first) before them, so whatever is on disk after an
+    interruption is one gap-free block to resume from. Once every window has come back, the
+    requested days count as covered, bars or not (days before today only: today's bar may
+    still be on its way).
+    """
+    range_to = range_to or datetime.date.today().strftime("%Y-%m-%d")
+    bucket = bucket or TokenBucket(REQUESTS_PER_SECOND, BURST)
+    table = ohlcv_table(resolution)
+
+    head, tail = missing_ranges(symbol, range_from, range_to, resolution) if resume else (None, (range_from, range_to))
+    if head is None and tail is None:
+        print(f"✅ {symbol}: already up to date")
+        return candles_to_df([])
+
+    windows = []
+    for todo, backwards in ((head, True), (tail, False)):
+        if todo is not None:
+            part = date_windows(*todo, resolution)
+            windows += part[::-1] if backwards else part
+            print(f"⏳ {symbol}: fetching {todo[0]} -> {todo[1]} in {len(part)} request(s)...")
+
+    fetched = []
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [pool.submit(fetch_window, client, symbol, resolution, start, end, bucket)
+                   for start, end in windows]
+        # Results come back in submission (= commit) order
+        for future in futures:
+            df = future.result()
+            if not df.empty:
+                write_table(table, symbol, df, mode="append")
+                fetched.append(df)
+    finally:
+        # On failure, don't keep fetching windows that would leave a gap after the stored prefix
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    if resume:
+        covered = covered_range(symbol, resolution)
+        requested = [pd.Timestamp(day) for todo in (head, tail) if todo is not None for day in todo]
+        yesterday = pd.Timestamp(datetime.date.today()) - pd.Timedelta(days=1)
+        first = min(requested + ([covered[0]] if covered else []))
+        last = max([min(max(requested), yesterday)] + ([covered[1]] if covered else []))
+        if first <= last:
+            write_coverage(symbol, resolution, first, last)
+
+    new_bars = (pd.concat(fetched, ignore_index=True).sort_values("date", ignore_index=True) if fetched
+                else candles_to_df([]))
+    print(f"✅ {symbol}: {len(new_bars)} new bars saved to the store")
+    return new_bars
+
+
+def backfill_universe(client, symbols, range_from, range_to=None, resolution="D", max_workers=MAX_WORKERS):
+    """Backfills many symbols through one shared rate limiter. Failures are reported, not raised."""
+    bucket = TokenBucket(REQUESTS_PER_SECOND, BURST)
+    failed = {}
+    for symbol in symbols:
+        try:
+            download_history(client, symbol, range_from, range_to, resolution, max_workers, bucket)
+        except HistoryFetchError as e:
+            print(f"❌ {e}")
+            failed[symbol] = str(e)
+    return failed
+
+
+if __name__ == "__main__":
+    import argparse
+    from pipeline.universe import load_universe
+
+    parser = argparse.ArgumentParser(description="Backfill / refresh OHLCV history into the store")
+    parser.add_argument("--from", dest="range_from", required=True, help="YYYY-MM-DD")
+    parser.add_argument("--to", dest="range_to", help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--resolution", default="D", help="D, 1, 5, 15, 60 ...")
+    parser.add_argument("--symbols", nargs="+", help="Default: every symbol in config/universe.csv")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--mock", action="store_true", help="Use the offline MockFyersModel")
+    args = parser.parse_args()
+
+    if args.mock:
+        from fyers.mock_client import MockFyersModel
+        client = MockFyersModel()
+    else:
+        from fyers_apiv3 import fyersModel
+        from fyers.fyers_fetch_rites import BASE_DIR, CLIENT_ID, get_access_token
+        client = fyersModel.FyersModel(client_id=CLIENT_ID, token=get_access_token(), log_path=BASE_DIR)
+
+    symbols = args.symbols or [row["symbol"] for row in load_universe()]
+    failed = backfill_universe(client, symbols, args.range_from, args.range_to, args.resolution, args.workers)
+    print(f"🏁 Done: {len(symbols) - len(failed)} ok, {len(failed)} failed")
@@ -1,48 +1,52 @@
 # fyers_fetch_rites.py
+# Importing this module does no auth or network work: the FYERS SDK is only imported (and the
+# login only run) when a token or a client is actually needed.
 
-from fyers_apiv3 import fyersModel
-import pandas as pd
-import webbrowser
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import DEFAULT_SYMBOL
+from fyers.downloader import HistoryFetchError, download_history
 
 # =========================
 # 🔹 CONFIGURATION
 # =========================
-CLIENT_ID = "6N3D2EQCU5-100" 
+CLIENT_ID = "6N3D2EQCU5-100"
 SECRET_KEY = "JVU3RW4QQY"
 REDIRECT_URI = "https://www.google.com/"
 
-# 📂 STRICT PATH SETUP
-# This gets the folder where THIS script is currently living.
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-
-# We force the data folder to be created inside this same folder
-DATA_RAW_DIR = os.path.join(BASE_DIR, "data", "raw")
+# 📂 PATH SETUP
+# Run from the project root, same as every other stage (orders.py reads the token from here too)
+BASE_DIR = os.getcwd()
 TOKEN_PATH = os.path.join(BASE_DIR, "access_token.txt")
 
-# Create the folder if it doesn't exist
-os.makedirs(DATA_RAW_DIR, exist_ok=True)
-
-print(f"📂 Working Directory: {BASE_DIR}")
-print(f"📂 Saving Data to:    {DATA_RAW_DIR}")
+# Default range: Nov 1 - Jan 8 (includes the prediction week)
+RANGE_FROM = "2025-11-01"
+RANGE_TO = "2026-01-08"
 
 # =========================
 # 🔹 AUTHENTICATION
 # =========================
-session = fyersModel.SessionModel(
-    client_id=CLIENT_ID,
-    secret_key=SECRET_KEY,
-    redirect_uri=REDIRECT_URI,
-    response_type="code",
-    grant_type="authorization_code"
-)
-
-# Check if we already have a token
-if os.path.exists(TOKEN_PATH):
-    with open(TOKEN_PATH, "r") as f:
-        access_token = f.read().strip()
-    print("✅ Found existing access token.")
-else:
+def get_access_token():
+    """Reads the saved token, or runs the interactive login once and saves it."""
+    if os.path.exists(TOKEN_PATH):
+        with open(TOKEN_PATH, "r") as f:
+            access_token = f.read().strip()
+        print("✅ Found existing access token.")
+        return access_token
+
+    import webbrowser
+    from fyers_apiv3 import fyersModel
+
+    session = fyersModel.SessionModel(
+        client_id=CLIENT_ID,
+        secret_key=SECRET_KEY,
+        redirect_uri=REDIRECT_URI,
+        response_type="code",
+        grant_type="authorization_code"
+    )
+
     auth_url = session.generate_authcode()
     print(f"🌍 Opening Login: {auth_url}")
     webbrowser.open(auth_url)
@@ -56,38 +60,33 @@ else:
         with open(TOKEN_PATH, "w") as f:
             f.write(access_token)
         print("✅ New token generated and saved!")
+        return access_token
     else:
         raise Exception(f"Auth Failed: {response}")
 
 # =========================
-# 🔹 FETCH DATA (Correct Range: Nov 1 - Jan 8)
+# 🔹 FETCH DATA
 # =========================
-fyers = fyersModel.FyersModel(client_id=CLIENT_ID, token=access_token, log_path=BASE_DIR)
-
-data_params = {
-    "symbol": "NSE:RITES-EQ",
-    "resolution": "D",
-    "date_format": "1",
-    "range_from": "2025-11-01", 
-    "range_to": "2026-01-08",    # <--- Includes the prediction week
-    "cont_flag": "1"
-}
-
-print("⏳ Fetching OHLCV data...")
-response = fyers.history(data=data_params)
-
-if "candles" in response:
-    cols = ["timestamp", "open", "high", "low", "close", "volume"]
-    df = pd.DataFrame(response["candles"], columns=cols)
-    
-    df["date"] = pd.to_datetime(df["timestamp"], unit="s")
-    df = df[["date", "open", "high", "low", "close", "volume"]]
-
-    # Save exactly inside the project folder
-    output_file = os.path.join(DATA_RAW_DIR, "rites_daily.csv")
-    df.to_csv(output_file, index=False)
-
-    print(f"✅ Data successfully saved to:\n{output_file}")
-    print(f"📅 Data Range: {df['date'].min().date()} to {df['date'].max().date()}")
-else:
-    print("❌ Error fetching data:", response)
+def fetch_data(symbol=DEFAULT_SYMBOL, range_from=RANGE_FROM, range_to=RANGE_TO, resolution="D", client=None):
+    """
+    Brings the store up to date for one symbol. Only bars before the first / after the last
+    stored one are requested (see fyers/downloader.py). Pass `client` to use an existing / mock client.
+    """
+    if client is None:
+        from fyers_apiv3 import fyersModel
+
+        access_token = get_access_token()
+        client = fyersModel.FyersModel(client_id=CLIENT_ID, token=access_token, log_path=BASE_DIR)
+
+    try:
+        new_bars = download_history(client, symbol, range_from, range_to, resolution=resolution)
+    except HistoryFetchError as e:
+        print("❌ Error fetching data:", e)
+        return None
+
+    if not new_bars.empty:
+        print(f"📅 New Data Range: {new_bars['date'].min().date()} to {new_bars['date'].max().date()}")
+    return new_bars
+
+if __name__ == "__main__":
+    fetch_data()
@@ -0,0 +1,155 @@
+# fyers/live_feed.py
+# Tick sources for the live mode (strategy/live.py). Every source is an async iterator of
+# the same tick dicts:
+#   {"symbol": "NSE:RITES-EQ", "ts": Timestamp (IST wall clock), "ltp": 251.3, "qty": 120, "recv_ns": ...}
+# recv_ns is time.perf_counter_ns() when the tick reached this process (the latency clock starts there).
+#
+# FyersTickSource wraps the FYERS data websocket; ReplaySource replays a recorded tick tape
+# offline, so the whole live path runs without a broker connection.
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fyers.downloader import MARKET_TZ
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+TICK_COLS = ["ts", "symbol", "ltp", "qty"]
+YIELD_EVERY = 256       # replay at full speed still hands control back to the event loop this often
+
+
+def ticks_from_bars(bars_df, symbol):
+    """
+    Tick tape from 1-minute bars: 4 ticks per bar at :00 (open), :20 / :40 (low and high, in the
+    order the bar's direction implies) and :59 (close). Aggregating it gives back the same bars.
+    """
+    n = len(bars_df)
+    up = bars_df["close"].to_numpy(float) >= bars_df["open"].to_numpy(float)
+    first = np.where(up, bars_df["low"].to_numpy(float), bars_df["high"].to_numpy(float))
+    second = np.where(up, bars_df["high"].to_numpy(float), bars_df["low"].to_numpy(float))
+    prices = np.column_stack([bars_df["open"].to_numpy(float), first, second, bars_df["close"].to_numpy(float)])
+
+    volume = bars_df["volume"].to_numpy("int64")
+    qty = np.column_stack([volume // 4] * 3 + [volume - 3 * (volume // 4)])
+    offsets = np.array([0, 20, 40, 59], dtype="timedelta64[s]")
+    stamps = bars_df["date"].to_numpy().astype("datetime64[ns]")[:, None] + offsets[None, :]
+
+    return pd.DataFrame({"ts": stamps.ravel(), "symbol": np.repeat(symbol, 4 * n),
+                         "ltp": prices.ravel(), "qty": qty.ravel()})
+
+
+class ReplaySource:
+    """
+    Replays recorded ticks in timestamp order. speed=0 replays as fast as possible (tests,
+    latency measurement); speed=1 in real time; speed=60 one minute per second.
+    """
+
+    realtime = False
+
+    def __init__(self, ticks_df, speed=0.0):
+        self.ticks = ticks_df.sort_values("ts", kind="stable").reset_index(drop=True)
+        self.speed = speed
+        self.clock = None
+
+    @classmethod
+    def from_file(cls, path, speed=0.0):
+        ticks = pd.read_parquet(path) if path.endswith(".parquet") else pd.read_csv(path, parse_dates=["ts"])
+        return cls(ticks[TICK_COLS], speed)
+
+    def now(self):
+        """Market time of the replay: the timestamp of the last tick handed out."""
+        return self.clock
+
+    async def __aiter__(self):
+        stamps = self.ticks["ts"].to_numpy()
+        symbols = self.ticks["symbol"].to_numpy()
+        prices = self.ticks["ltp"].to_numpy(float)
+        qtys = self.ticks["qty"].to_numpy("int64")
+
+        started, first = time.monotonic(), stamps[0] if len(stamps) else None
+        for i in range(len(stamps)):
+            if self.speed:
+                due = (stamps[i] - first) / np.timedelta64(1, "s") / self.speed
+                delay = due - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif i % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+            self.clock = pd.Timestamp(stamps[i])
+            yield {"symbol": symbols[i], "ts": self.clock, "ltp": float(prices[i]), "qty": int(qtys[i]),
+                   "recv_ns": time.perf_counter_ns()}
+
+
+class FyersTickSource:
+    """
+    Live ticks from the FYERS data websocket (SymbolUpdate messages). The socket runs in the
+    SDK's own thread; messages are handed to the event loop with call_soon_threadsafe.
+    Pass record_path to keep the tape (parquet) for later replay.
+    """
+
+    realtime = True
+
+    def __init__(self, access_token, symbols, record_path=None):
+        from fyers.fyers_fetch_rites import CLIENT_ID
+        self.access_token = f"{CLIENT_ID}:{access_token}"
+        self.symbols = list(symbols)
+        self.record_path = record_path
+        self.recorded = []
+        self.cum_volume = {}
+
+    def now(self):
+        return pd.Timestamp.now(tz=MARKET_TZ).tz_localize(None)
+
+    def _to_tick(self, msg):
+        symbol = msg["symbol"]
+        # SymbolUpdate carries the day's cumulative volume: the traded qty is the increment
+        cum = int(msg.get("vol_traded_today", 0))
+        qty = max(0, cum - self.cum_volume.get(symbol, cum))
+        self.cum_volume[symbol] = cum
+        epoch = msg.get("exch_feed_time") or msg.get("last_traded_time") or time.time()
+        ts = pd.Timestamp(epoch, unit="s", tz="UTC").tz_convert(MARKET_TZ).tz_localize(None)
+        return {"symbol": symbol, "ts": ts, "ltp": float(msg["ltp"]), "qty": qty, "recv_ns": time.perf_counter_ns()}
+
+    async def __aiter__(self):
+        from fyers_apiv3.FyersWebsocket import data_ws
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        def on_message(msg):
+            if isinstance(msg, dict) and "ltp" in msg and "symbol" in msg:
+                loop.call_soon_threadsafe(queue.put_nowait, self._to_tick(msg))
+
+        def on_connect():
+            socket.subscribe(symbols=self.symbols, data_type="SymbolUpdate")
+            socket.keep_running()
+
+        socket = data_ws.FyersDataSocket(
+            access_token=self.access_token, log_path=os.getcwd(), litemode=False, write_to_file=False,
+            reconnect=True, on_connect=on_connect, on_message=on_message,
+            on_error=lambda msg: print(f"⚠️ Feed error: {msg}"),
+            on_close=lambda msg: print(f"🔌 Feed closed: {msg}"),
+        )
+        socket.connect()
+        print(f"📡 Subscribed to {len(self.symbols)} symbols")
+        try:
+            while True:
+                tick = await queue.get()
+                if self.record_path:
+                    self.recorded.append({k: tick[k] for k in TICK_COLS})
+                yield tick
+        finally:
+            socket.close_connection()
+            self.save_recording()
+
+    def save_recording(self):
+        if self.record_path and self.recorded:
+            os.makedirs(os.path.dirname(self.record_path) or ".", exist_ok=True)
+            pd.DataFrame(self.recorded, columns=TICK_COLS).to_parquet(self.record_path, index=False)
+            print(f"💾 {len(self.recorded)} ticks recorded to {self.record_path}")
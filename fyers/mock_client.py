@@ -0,0 +1,183 @@
+# fyers/mock_client.py
+# Local stand-in for fyersModel.FyersModel: same method names and response shapes, no network.
+# Use it to exercise the downloader (and anything else that talks to the broker) offline.
+import itertools
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+RESOLUTION_MINUTES = {"1": 1, "5": 5, "15": 15, "60": 60}
+
+# FYERS order status codes
+STATUS_CANCELLED, STATUS_FILLED, STATUS_TRANSIT, STATUS_REJECTED, STATUS_PENDING = 1, 2, 4, 5, 6
+ORDER_MARKET, ORDER_SLM = 2, 3
+
+
+class MockFyersModel:
+    """
+    Fake broker client.
+
+    history() serves deterministic synthetic candles for any symbol and range (NSE session,
+    weekdays only). fail_every=N makes every Nth call return a rate-limit error, to exercise
+    retry logic. Every request is recorded in `calls`.
+
+    Orders: market orders fill at once at the symbol's current price (set_price), SL-M orders
+    rest until set_price() crosses their trigger. timeout_every=N accepts every Nth order but
+    raises instead of answering (a lost response), and latency adds a delay to every order call.
+    Order requests are recorded in `order_calls`.
+    """
+
+    def __init__(self, seed=7, start_price=250.0, fail_every=0, timeout_every=0, latency=0.0):
+        self.seed = seed
+        self.start_price = start_price
+        self.fail_every = fail_every
+        self.timeout_every = timeout_every
+        self.latency = latency
+        self.calls = []
+        self.order_calls = []
+        self.orders = {}
+        self.prices = {}
+        self.order_ids = itertools.count(26010000001)
+        self.lock = threading.Lock()
+
+    def get_profile(self):
+        return {"s": "ok", "code": 200, "data": {"fy_id": "MOCK01", "name": "Mock Account"}}
+
+    def place_order(self, data):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            self.order_calls.append(dict(data))
+            n_calls = len(self.order_calls)
+            error = _validate_order(data)
+            if error:
+                return {"s": "error", "code": -50, "message": error}
+
+            order_id = str(next(self.order_ids))
+            price = self.prices.get(data["symbol"], self.start_price)
+            order = {
+                "id": order_id, "symbol": data["symbol"], "qty": int(data["qty"]), "side": int(data["side"]),
+                "type": int(data["type"]), "productType": data.get("productType", "INTRADAY"),
+                "stopPrice": float(data.get("stopPrice", 0)), "orderTag": data.get("orderTag", ""),
+                "status": STATUS_PENDING, "filledQty": 0, "tradedPrice": 0.0, "orderDateTime": time.time(),
+            }
+            if order["type"] == ORDER_MARKET:
+                order.update(status=STATUS_FILLED, filledQty=order["qty"], tradedPrice=price)
+            self.orders[order_id] = order
+
+        if self.timeout_every and n_calls % self.timeout_every == 0:
+            # The order went through but the caller never hears about it
+            raise TimeoutError("read timed out")
+        return {"s": "ok", "code": 1101, "message": "Order submitted successfully", "id": order_id}
+
+    def orderbook(self, data=None):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            book = [dict(o) for o in self.orders.values()]
+        if data and data.get("id"):
+            book = [o for o in book if o["id"] == data["id"]]
+        return {"s": "ok", "code": 200, "orderBook": book}
+
+    def cancel_order(self, data):
+        with self.lock:
+            order = self.orders.get(data["id"])
+            if order is None or order["status"] != STATUS_PENDING:
+                return {"s": "error", "code": -52, "message": "Order not pending"}
+            order["status"] = STATUS_CANCELLED
+        return {"s": "ok", "code": 1103, "id": data["id"]}
+
+    def set_price(self, symbol, price):
+        """Moves the market: fills resting SL-M sells triggered at or above `price`."""
+        with self.lock:
+            self.prices[symbol] = price
+            for order in self.orders.values():
+                if (order["symbol"] == symbol and order["status"] == STATUS_PENDING and order["type"] == ORDER_SLM
+                        and order["side"] == -1 and price <= order["stopPrice"]):
+                    order.update(status=STATUS_FILLED, filledQty=order["qty"], tradedPrice=order["stopPrice"])
+
+    def history(self, data):
+        with self.lock:
+            self.calls.append(dict(data))
+            n_calls = len(self.calls)
+        if self.fail_every and n_calls % self.fail_every == 0:
+            return {"s": "error", "code": 429, "message": "request limit reached"}
+
+        bars = synthetic_bars(data["symbol"], data["range_from"], data["range_to"],
+                              data.get("resolution", "D"), seed=self.seed, start_price=self.start_price)
+        if bars.empty:
+            return {"s": "no_data", "candles": []}
+        stamps = bars["date"]
+        if data.get("resolution", "D") != "D":
+            # Like the real API: intraday candles carry the epoch of the IST session time
+            stamps = stamps.dt.tz_localize("Asia/Kolkata").dt.tz_convert("UTC").dt.tz_localize(None)
+        epoch = stamps.values.astype("datetime64[s]").astype("int64")
+        prices = bars[["open", "high", "low", "close"]].to_numpy()
+        volume = bars["volume"].to_numpy()
+        return {"s": "ok", "candles": [[int(ts), *map(float, p), int(v)] for ts, p, v in zip(epoch, prices, volume)]}
+
+
+def _validate_order(data):
+    if int(data.get("qty", 0)) <= 0:
+        return "Invalid quantity"
+    if int(data.get("side", 0)) not in (1, -1):
+        return "Invalid side"
+    if int(data.get("type", 0)) == ORDER_SLM and float(data.get("stopPrice", 0)) <= 0:
+        return "Stop price required for SL-M order"
+    return None
+
+
+def synthetic_bars(symbol, range_from, range_to, resolution="D", seed=7, start_price=250.0):
+    """
+    Deterministic OHLCV for one symbol. A bar's values depend only on the symbol and its
+    timestamp, so overlapping or split requests always agree with each other.
+    """
+    days = pd.bdate_range(range_from, range_to)
+    if resolution == "D":
+        stamps = days
+    else:
+        step = RESOLUTION_MINUTES[str(resolution)]
+        # NSE session 09:15 - 15:30 (375 minutes)
+        offsets = pd.to_timedelta(np.arange(0, 375, step) + 9 * 60 + 15, unit="min")
+        stamps = pd.DatetimeIndex((days.values[:, None] + offsets.values[None, :]).ravel())
+    if len(stamps) == 0:
+        return pd.DataFrame(columns=["date", "open", "high", "low", "close", "volume"])
+
+    # Per-bar noise keyed on (symbol, timestamp) so every request agrees on every bar
+    keys = stamps.values.astype("datetime64[m]").astype("int64")
+    sym_key = sum(ord(c) for c in symbol) * 1_000_003 + seed
+    noise = _hashed_normals(keys, sym_key, 4)
+
+    # Smooth price level plus noise, both functions of the timestamp only
+    t = keys.astype(float) / (60 * 24 * 365)
+    close = start_price * np.exp(0.15 * np.sin(t * 6.1 + sym_key % 17) + 0.01 * noise[:, 0])
+    open_ = close * (1 + 0.004 * noise[:, 1])
+    high = np.maximum(open_, close) * (1 + 0.006 * np.abs(noise[:, 2]))
+    low = np.minimum(open_, close) * (1 - 0.006 * np.abs(noise[:, 3]))
+    volume = (200_000 * (1 + np.abs(noise[:, 0]))).astype("int64")
+
+    return pd.DataFrame({
+        "date": stamps, "open": open_.round(2), "high": high.round(2), "low": low.round(2),
+        "close": close.round(2), "volume": volume,
+    })
+
+
+def _hashed_normals(keys, salt, n_cols):
+    """Standard normals from a splitmix64 hash of (key, salt, column) - vectorized and stateless."""
+    def mix(x):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+    base = keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15) + np.uint64(salt)
+    cols = []
+    with np.errstate(over="ignore"):
+        for j in range(n_cols):
+            h1 = mix(base + np.uint64(2 * j + 1))
+            h2 = mix(base + np.uint64(2 * j + 2))
+            u1 = ((h1 >> np.uint64(11)).astype(float) + 0.5) / 2.0**53
+            u2 = (h2 >> np.uint64(11)).astype(float) / 2.0**53
+            cols.append(np.sqrt(-2 * np.log(u1)) * np.cos(2 * np.pi * u2))
+    return np.column_stack(cols)
@@ -0,0 +1,228 @@
+# fyers/order_manager.py
+# Asynchronous order management for a multi-symbol book.
+#
+# One authenticated client is shared by every order. Symbols are worked concurrently (bounded
+# by a semaphore and the broker's order rate limit), every BUY is protected by a native SL-M
+# sell as soon as its entry fills, and one polling loop tracks all open orders with a single
+# orderbook call per interval.
+#
+# Every order carries a deterministic orderTag (symbol + trade date + leg). After an ambiguous
+# failure (timeout, dropped connection) the order book is searched for the tag before retrying,
+# and a re-run on the same day skips legs that already exist, so nothing is ever sent twice.
+import asyncio
+import hashlib
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.instrumentation import api_timer
+from utils.rate_limit import AsyncTokenBucket
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+MAX_CONCURRENCY = 8         # requests in flight at once
+ORDER_RATE = 8              # FYERS allows 10 order requests/s per user: keep some headroom
+ORDER_BURST = 8
+POLL_INTERVAL = 0.5         # seconds between orderbook polls while orders are open
+FILL_TIMEOUT = 30.0         # seconds to wait for a market entry to fill
+CANCEL_TIMEOUT = 10.0       # ... and for an entry cancelled after FILL_TIMEOUT to settle
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+TICK_SIZE = 0.05            # NSE equity tick
+
+# FYERS order status codes
+STATUS_NAMES = {1: "CANCELLED", 2: "FILLED", 4: "TRANSIT", 5: "REJECTED", 6: "PENDING", 7: "EXPIRED"}
+TERMINAL = {1, 2, 5, 7}
+FILLED = 2
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class OrderRejected(Exception):
+    pass
+
+
+def order_tag(symbol, trade_date, leg):
+    """Same plan -> same tag, on every retry and every re-run of the day."""
+    digest = hashlib.sha1(f"{symbol}|{trade_date}|{leg}".encode()).hexdigest()[:14]
+    return f"fs{leg[0]}{digest}"
+
+
+def entry_order(symbol, qty, tag):
+    return {
+        "symbol": symbol,
+        "qty": int(qty),
+        "type": 2,           # 2 = Market Order
+        "side": 1,           # 1 = Buy
+        "productType": "INTRADAY",
+        "limitPrice": 0,
+        "stopPrice": 0,
+        "validity": "DAY",
+        "disclosedQty": 0,
+        "offlineOrder": "False",
+        "orderTag": tag,
+    }
+
+
+def stop_order(symbol, qty, stop_price, tag):
+    """SL-M sell: becomes a market sell when the price trades at or below stop_price."""
+    return {
+        "symbol": symbol,
+        "qty": int(qty),
+        "type": 3,           # 3 = SL-M
+        "side": -1,          # -1 = Sell
+        "productType": "INTRADAY",
+        "limitPrice": 0,
+        "stopPrice": round(round(stop_price / TICK_SIZE) * TICK_SIZE, 2),
+        "validity": "DAY",
+        "disclosedQty": 0,
+        "offlineOrder": "False",
+        "orderTag": tag,
+    }
+
+
+class OrderManager:
+    def __init__(self, client, max_concurrency=MAX_CONCURRENCY, rate=ORDER_RATE, burst=ORDER_BURST,
+                 poll_interval=POLL_INTERVAL):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.bucket = AsyncTokenBucket(rate, burst)
+        self.poll_interval = poll_interval
+        self.orders = {}        # order id -> latest orderbook row
+        self.waiters = {}       # order id -> future resolved with the row once it is terminal
+        self.poll_task = None
+
+    async def _call(self, method, **kwargs):
+        """One broker call: rate-limited, bounded, run off the event loop (the SDK is blocking)."""
+        await self.bucket.acquire()
+        async with self.semaphore:
+            with api_timer(method) as call:
+                response = await asyncio.to_thread(getattr(self.client, method), **kwargs)
+                call["ok"] = response.get("s") == "ok"
+            return response
+
+    async def order_book(self):
+        response = await self._call("orderbook")
+        if response.get("s") != "ok":
+            raise OrderRejected(f"orderbook failed: {response.get('message')}")
+        rows = response.get("orderBook") or []
+        for row in rows:
+            self.orders[row["id"]] = row
+        return rows
+
+    async def find_by_tag(self, tag, book=None):
+        for row in book if book is not None else await self.order_book():
+            if row.get("orderTag") == tag:
+                return row
+        return None
+
+    async def place(self, data):
+        """Submits an order at most once and returns its id (retries are checked against the book)."""
+        last_error = None
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = await self._call("place_order", data=data)
+            except Exception as e:   # lost response: the order may or may not exist
+                response = {"s": "error", "code": None, "message": f"{type(e).__name__}: {e}"}
+
+            if response.get("s") == "ok":
+                return response["id"]
+            if response.get("code") is not None and response.get("code") not in RETRYABLE_CODES:
+                raise OrderRejected(f"{data['symbol']}: {response.get('message')}")
+
+            last_error = response.get("message")
+            existing = await self.find_by_tag(data["orderTag"])
+            if existing is not None:
+                return existing["id"]
+            if attempt < MAX_RETRIES:
+                await asyncio.sleep(BACKOFF_BASE * (2 ** attempt))
+        raise OrderRejected(f"{data['symbol']}: {last_error}")
+
+    async def wait_for(self, order_id, timeout=FILL_TIMEOUT):
+        """Latest row of the order once it reaches a terminal state (filled, rejected, ...)."""
+        row = self.orders.get(order_id)
+        if row is not None and row["status"] in TERMINAL:
+            return row
+        future = self.waiters.get(order_id)
+        if future is None:
+            future = self.waiters[order_id] = asyncio.get_running_loop().create_future()
+        if self.poll_task is None or self.poll_task.done():
+            self.poll_task = asyncio.create_task(self._poll())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.waiters.pop(order_id, None)
+            raise
+
+    async def cancel(self, order_id):
+        """Cancels an open order and returns its final row: it may have (partly) filled in the meantime."""
+        response = await self._call("cancel_order", data={"id": order_id})
+        if response.get("s") != "ok":
+            # Usually "not pending": it reached a terminal state first
+            print(f"⚠️ Cancel of {order_id} refused: {response.get('message')}")
+        await self.order_book()
+        row = self.orders.get(order_id)
+        if row is not None and row["status"] in TERMINAL:
+            return row
+        try:
+            return await self.wait_for(order_id, CANCEL_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise OrderRejected(f"order {order_id} still open after cancel: check it manually") from None
+
+    async def _poll(self):
+        """One orderbook call per interval serves every order being waited on."""
+        while self.waiters:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                rows = await self.order_book()
+            except Exception as e:
+                print(f"⚠️ Order book poll failed: {e}")
+                continue
+            for row in rows:
+                future = self.waiters.get(row["id"])
+                if future is not None and row["status"] in TERMINAL:
+                    del self.waiters[row["id"]]
+                    if not future.done():
+                        future.set_result(row)
+
+    async def execute(self, plan, book=()):
+        """Entry (market BUY) then, once filled, an SL-M sell for the filled quantity."""
+        symbol, trade_date = plan["symbol"], plan["date"]
+        entry_tag, stop_tag = order_tag(symbol, trade_date, "entry"), order_tag(symbol, trade_date, "stop")
+        result = {"symbol": symbol, "qty": plan["qty"], "stop_loss": plan["stop_loss"]}
+
+        existing = await self.find_by_tag(entry_tag, book)
+        entry_id = existing["id"] if existing else await self.place(entry_order(symbol, plan["qty"], entry_tag))
+        try:
+            entry = await self.wait_for(entry_id)
+        except asyncio.TimeoutError:
+            # Still live at the broker: cancel it, so it cannot fill later with no stop behind it
+            entry = await self.cancel(entry_id)
+        filled_qty = entry.get("filledQty") or (plan["qty"] if entry["status"] == FILLED else 0)
+        result.update(entry_id=entry_id, entry_status=STATUS_NAMES.get(entry["status"], entry["status"]),
+                      fill_price=entry.get("tradedPrice"))
+        if not filled_qty:
+            return result
+
+        # Protect whatever filled (all of it, or part of a cancelled entry)
+        result["qty"] = filled_qty
+        existing = await self.find_by_tag(stop_tag, book)
+        stop_id = existing["id"] if existing else await self.place(
+            stop_order(symbol, filled_qty, plan["stop_loss"], stop_tag))
+        result.update(stop_id=stop_id, stop_status="PLACED")
+        return result
+
+    async def execute_book(self, plans):
+        """Works every plan concurrently. One failing symbol does not stop the others."""
+        # One book snapshot up front: legs placed by an earlier run today are not sent again
+        book = await self.order_book()
+        results = await asyncio.gather(*(self.execute(p, book) for p in plans), return_exceptions=True)
+        out = []
+        for plan, res in zip(plans, results):
+            if isinstance(res, Exception):
+                res = {"symbol": plan["symbol"], "qty": plan["qty"], "stop_loss": plan["stop_loss"],
+                       "error": f"{type(res).__name__}: {res}"}
+            out.append(res)
+        if self.poll_task is not None:
+            self.poll_task.cancel()
+        return out
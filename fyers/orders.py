@@ -1,17 +1,32 @@
 # orders.py
-
-import pandas as pd
+# Runs at the open, so it stays light: today's plan comes from the order book's JSON copy
+# (utils/order_plan.py) and nothing here imports pandas, pyarrow or sklearn.
+#
+# Risk: every fill goes into the live StreamingMetrics (backtest/metrics.py, saved between runs), and
+# its KillSwitch is checked before any new entry. Run `--close-day` after the market close to record
+# the day's stop / square-off fills and close the day in the metrics.
+
+import asyncio
 import os
+import sys
 import datetime
-from fyers_apiv3 import fyersModel
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import symbol_slug
+from utils.instrumentation import instrument_stage
+from utils.order_plan import has_plan, read_plan
+from fyers.order_manager import FILLED, OrderManager
+from backtest.metrics import LIVE_STATE_PATH, KillSwitch, StreamingMetrics
 
 # =========================
 # 🔹 CONFIGURATION
 # =========================
 CLIENT_ID = "6N3D2EQCU5-100"  # Your App ID
 BASE_DIR = os.getcwd()
-ORDER_BOOK_PATH = os.path.join(BASE_DIR, "data", "processed", "final_order_book.csv")
 TOKEN_PATH = os.path.join(BASE_DIR, "access_token.txt")
+LIVE_CAPITAL = 100000       # ₹1 Lakh, as CAPITAL in strategy/main.py
+BROKERAGE_PCT = 0.0005      # as in backtest/engine.py
+MOCK_STATE_PATH = os.path.join("artifacts", "live_metrics_mock.json")   # --mock runs keep their own account
 
 # 🛑 FOR TESTING: You can hardcode a date here to force a test trade
 # Example: FORCE_DATE = "2026-01-02"
@@ -24,87 +39,171 @@ def get_access_token():
     with open(TOKEN_PATH, "r") as f:
         return f.read().strip()
 
-def place_order():
+def create_client(token=None):
+    """One authenticated client for the whole run (validated once, reused for every order)."""
+    from fyers_apiv3 import fyersModel
+
+    token = token or get_access_token()
+    if not token:
+        return None
+    fyers = fyersModel.FyersModel(client_id=CLIENT_ID, token=token, log_path=BASE_DIR)
+
+    # Validate Token
+    if fyers.get_profile().get('s') != 'ok':
+        print("❌ API Error: Token Expired. Run fetch script.")
+        return None
+    return fyers
+
+def _read_todays_row(symbol, today_str):
+    """Today's row of the symbol's order book: from its plan.json, else (older stores) the Parquet table."""
+    if has_plan(symbol):
+        return read_plan(symbol, today_str), True
+    from utils.store import has_table, read_table
+
+    if not has_table("order_book", symbol):
+        return None, False
+    # The date filter is pushed down into the read: only today's row is loaded
+    todays_plan = read_table("order_book", symbol, start=today_str, end=today_str)
+    return (todays_plan.iloc[0].to_dict() if not todays_plan.empty else None), True
+
+def load_todays_plans(symbols, today_str):
+    """Today's BUY rows of every symbol's order book (only today's row is read per symbol)."""
+    plans = []
+    for symbol in symbols:
+        row, found = _read_todays_row(symbol, today_str)
+        if not found:
+            print(f"❌ {symbol}: Order book not found. Run main.py first.")
+            continue
+        if row is None:
+            print(f"⏸️ {symbol}: No plan found for today in the Order Book.")
+            continue
+
+        signal = row["signal"]
+        qty = int(row["qty"])
+        stop_loss = float(row["stop_loss"])
+        # Older plans have no expected entry: the stop (below the entry) is the closest known price
+        approx_entry = float(row.get("approx_entry") or stop_loss)
+        print(f"📋 {symbol}: {signal} | Qty: {qty} | SL: {stop_loss}")
+        if signal == "BUY" and qty > 0:
+            plans.append({"symbol": symbol, "date": today_str, "qty": qty, "stop_loss": stop_loss,
+                          "approx_entry": approx_entry})
+    return plans
+
+def record_fills(metrics, book):
+    """Every filled order of the broker's book into the metrics, once each. Returns how many were new."""
+    new = 0
+    for row in book:
+        if row.get("status") == FILLED and row.get("filledQty"):
+            qty, price = row["filledQty"], row["tradedPrice"]
+            # The tag keeps ids unique across days for brokers (and the mock) that reuse them
+            new += metrics.on_fill(row["symbol"], row["side"], qty, price, qty * price * BROKERAGE_PCT,
+                                   fill_id=f"{row['id']}:{row.get('orderTag', '')}")
+    return new
+
+def print_metrics(metrics):
+    m = metrics.snapshot()
+    print(f"📈 Equity ₹{m['equity']:,.2f} | DD {m['drawdown']:.2%} (max {m['max_drawdown']:.2%}) | "
+          f"Sharpe {m['sharpe']:.2f} (rolling {m['rolling_sharpe']:.2f}) | Hit {m['hit_rate']:.0%} | "
+          f"Exposure ₹{m['gross_exposure']:,.0f}")
+
+def close_day(client=None, date=None, state_path=LIVE_STATE_PATH):
+    """After the close: records the day's remaining fills (stops, square-offs) and closes the day."""
+    client = client or create_client()
+    if client is None:
+        return None
+    metrics = StreamingMetrics.load(LIVE_CAPITAL, state_path)
+    new = record_fills(metrics, asyncio.run(OrderManager(client).order_book()))
+    day = date or FORCE_DATE or datetime.datetime.now().strftime("%Y-%m-%d")
+    if not metrics.close_period(day):
+        print(f"⚠️ {day} was already closed; only new fills were recorded.")
+    metrics.save(state_path)
+    print(f"🧾 {new} new fill(s) recorded for {day}")
+    print_metrics(metrics)
+    return metrics.snapshot()
+
+@instrument_stage("orders")
+def place_orders(symbols, client=None, date=None, state_path=LIVE_STATE_PATH):
     print("\n🚀 FINSTREET ORDER EXECUTION SYSTEM")
     print("="*40)
 
     # 1. DETERMINE "TODAY"
-    if FORCE_DATE:
-        today_str = FORCE_DATE
+    if date or FORCE_DATE:
+        today_str = date or FORCE_DATE
         print(f"⚠️ TEST MODE: Forcing execution for date: {today_str}")
     else:
         today_str = datetime.datetime.now().strftime("%Y-%m-%d")
         print(f"📅 System Date: {today_str}")
 
-    # 2. LOAD ORDER BOOK
-    if not os.path.exists(ORDER_BOOK_PATH):
-        print("❌ Error: Order book not found. Run main.py first.")
-        return
-
-    df = pd.read_csv(ORDER_BOOK_PATH)
-    
-    # 3. FIND TODAY'S SIGNAL
-    # Filter where 'date' column matches today
-    todays_plan = df[df["date"] == today_str]
-
-    if todays_plan.empty:
-        print("⏸️ No plan found for today in the Order Book.")
-        return
-
-    signal = todays_plan.iloc[0]["signal"]
-    qty = int(todays_plan.iloc[0]["qty"])
-    stop_loss = float(todays_plan.iloc[0]["stop_loss"])
-
-    print(f"📋 Plan for Today: {signal} | Qty: {qty} | SL: {stop_loss}")
-
-    # 4. EXECUTE IF BUY
-    if signal == "BUY" and qty > 0:
-        token = get_access_token()
-        if not token: return
-
-        fyers = fyersModel.FyersModel(client_id=CLIENT_ID, token=token, log_path=BASE_DIR)
-        
-        # Validate Token
-        if fyers.get_profile().get('s') != 'ok':
-            print("❌ API Error: Token Expired. Run fetch script.")
-            return
-
-        print(f"⚡ Placing BUY Order for {qty} shares of RITES...")
-
-        data = {
-            "symbol": "NSE:RITES-EQ",
-            "qty": qty,
-            "type": 2,           # 2 = Market Order
-            "side": 1,           # 1 = Buy
-            "productType": "INTRADAY",
-            "limitPrice": 0,
-            "stopPrice": 0,
-            "validity": "DAY",
-            "disclosedQty": 0,
-            "offlineOrder": "False"
-        }
-
-        try:
-            response = fyers.place_order(data=data)
-            
-            if response.get("s") == "ok":
-                order_id = response.get("id")
-                print(f"✅ SUCCESS! Order Placed. ID: {order_id}")
-                
-                # Optional: Place Stop Loss Order (Cover Order logic or separate SL-M)
-                # Note: Fyers API requires separate calls for SL usually, or use BO/CO productType
-                print(f"🛡️ REMINDER: Manually verify Stop Loss is set at ₹{stop_loss}")
-                
-            else:
-                print(f"❌ Order Failed: {response.get('message')}")
-        
-        except Exception as e:
-            print(f"❌ API Exception: {e}")
-
-    else:
+    # 2. LOAD TODAY'S SIGNALS
+    plans = load_todays_plans(symbols, today_str)
+    if not plans:
         print("😴 No Action Required. Staying Cash.")
+        print("="*40)
+        return []
+
+    # 3. RISK CHECK: each entry against the kill switch, counting the entries accepted before it
+    metrics = StreamingMetrics.load(LIVE_CAPITAL, state_path)
+    print_metrics(metrics)
+    kill_switch, accepted, pending = KillSwitch(), [], 0.0
+    for plan in plans:
+        value = plan["qty"] * plan["approx_entry"]
+        reason = kill_switch.check(metrics, pending + value)
+        if reason:
+            print(f"🛑 {symbol_slug(plan['symbol']).upper()}: kill switch ({reason}), entry dropped")
+            continue
+        accepted.append(plan)
+        pending += value
+    if not accepted:
+        print("🛑 Kill switch: no new entries today.")
+        print("="*40)
+        return []
+    plans = accepted
+
+    # 4. EXECUTE: entries for every symbol concurrently, each protected by an SL-M sell once filled
+    client = client or create_client()
+    if client is None:
+        return None
+
+    print(f"⚡ Placing {len(plans)} BUY order(s) with SL-M protection...")
+    manager = OrderManager(client)
+    results = asyncio.run(manager.execute_book(plans))
+    record_fills(metrics, manager.orders.values())
+    metrics.save(state_path)
+
+    for res in results:
+        name = symbol_slug(res["symbol"]).upper()
+        if "error" in res:
+            print(f"❌ {name}: Order Failed: {res['error']}")
+        elif res.get("stop_id"):
+            print(f"✅ {name}: {res['qty']} filled @ {res['fill_price']} (ID: {res['entry_id']}) | "
+                  f"🛡️ SL-M @ ₹{res['stop_loss']} (ID: {res['stop_id']})")
+        else:
+            print(f"⚠️ {name}: entry {res['entry_status']} (ID: {res['entry_id']}), no stop placed")
 
     print("="*40)
+    return results
 
 if __name__ == "__main__":
-    place_order()
+    import argparse
+    from pipeline.universe import load_universe, table_dir
+
+    parser = argparse.ArgumentParser(description="Place today's orders for every symbol in the book")
+    parser.add_argument("--symbols", nargs="+", help="Default: every universe symbol with an order book")
+    parser.add_argument("--date", help="Force the trade date (YYYY-MM-DD)")
+    parser.add_argument("--mock", action="store_true", help="Send orders to the offline MockFyersModel")
+    parser.add_argument("--close-day", action="store_true", help="After the close: record fills, close the day")
+    args = parser.parse_args()
+
+    if args.date:
+        FORCE_DATE = args.date
+    client = None
+    if args.mock:
+        from fyers.mock_client import MockFyersModel
+        client = MockFyersModel()
+    state_path = MOCK_STATE_PATH if args.mock else LIVE_STATE_PATH
+    if args.close_day:
+        close_day(client, state_path=state_path)
+        sys.exit(0)
+    symbols = args.symbols or [row["symbol"] for row in load_universe()
+                             if os.path.isdir(table_dir("order_book", row["symbol"]))]
+    place_orders(symbols, client, state_path=state_path)
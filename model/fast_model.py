@@ -0,0 +1,198 @@
+# model/fast_model.py
+# Flat export of the trained Pipeline([StandardScaler, RandomForestClassifier]) and a NumPy
+# evaluator for it.
+#
+# train.py writes artifacts/<slug>_model.npz next to the pickle: scaler mean / scale plus every
+# tree as flat arrays (split feature, threshold and leaf class probabilities; shallow trees are
+# padded to complete trees so the next node is 2i+1 / 2i+2). FastModel walks ALL trees for ALL
+# rows at once, one array step per tree level, and adds the trees up in the same order as
+# sklearn, so its probabilities are identical.
+# Loading it is one np.load (no sklearn import, no unpickling of 100 estimator objects).
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import symbol_paths
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+MAX_DENSE_DEPTH = 12        # deeper forests keep sklearn's node layout (a padded tree would be huge)
+BLOCK_ROWS = 1024           # rows scored per pass (keeps the (rows x trees) index arrays in cache)
+
+
+def fast_model_path(symbol):
+    return symbol_paths(symbol)["fast_model"]
+
+
+def _dense_tree(tree, depth):
+    """
+    One tree padded to a complete binary tree of `depth` levels, in heap order (children of
+    node i are 2i+1 / 2i+2): the next node is computed, not looked up. A leaf above the last
+    level is copied to every padded leaf below it, so whichever way a row goes it ends there.
+    """
+    n_internal = 2 ** depth - 1
+    feature = np.zeros(n_internal, dtype=np.int32)
+    threshold = np.zeros(n_internal)
+    value = np.zeros((2 ** depth, tree.value.shape[2]))
+    stack = [(0, 0, 0)]             # (sklearn node, heap position, level)
+    while stack:
+        node, pos, level = stack.pop()
+        if tree.children_left[node] == -1:
+            first = (pos - (2 ** level - 1)) << (depth - level)
+            value[first:first + (1 << (depth - level))] = tree.value[node, 0]
+            continue
+        feature[pos], threshold[pos] = tree.feature[node], tree.threshold[node]
+        stack.append((tree.children_left[node], 2 * pos + 1, level + 1))
+        stack.append((tree.children_right[node], 2 * pos + 2, level + 1))
+    return feature, threshold, value
+
+
+def _sparse_tree(tree, offset):
+    """One tree as it is stored by sklearn, with child pointers shifted by `offset`."""
+    nodes = np.arange(tree.node_count)
+    leaf = tree.children_left == -1
+    # Leaves point at themselves, so every row can take the same number of steps
+    children = np.stack([np.where(leaf, nodes, tree.children_right),
+                         np.where(leaf, nodes, tree.children_left)], axis=1) + offset
+    return np.where(leaf, 0, tree.feature), np.where(leaf, 0.0, tree.threshold), children, tree.value[:, 0]
+
+
+def export_pipeline(pipeline, max_dense_depth=MAX_DENSE_DEPTH):
+    """Fitted scaler + forest -> dict of flat arrays (see FastModel)."""
+    scaler, forest = pipeline.named_steps["scaler"], pipeline.named_steps["model"]
+    n_features = forest.n_features_in_
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+    trees = [e.tree_ for e in forest.estimators_]
+    depth = max(t.max_depth for t in trees)
+
+    out = {"mean": np.asarray(mean, dtype=np.float64), "scale": np.asarray(scale, dtype=np.float64),
+           "depth": np.int32(depth), "classes": np.asarray(forest.classes_),
+           "feature_names": np.asarray(getattr(pipeline, "feature_names_in_", []), dtype=str)}
+    if depth <= max_dense_depth:
+        parts = [_dense_tree(t, depth) for t in trees]
+        out.update(layout="dense", feature=np.stack([p[0] for p in parts]),
+                   threshold=np.stack([p[1] for p in parts]), value=np.stack([p[2] for p in parts]))
+    else:
+        offsets = np.cumsum([0] + [t.node_count for t in trees])[:-1]
+        parts = [_sparse_tree(t, o) for t, o in zip(trees, offsets)]
+        out.update(layout="sparse", feature=np.concatenate([p[0] for p in parts]).astype(np.int32),
+                   threshold=np.concatenate([p[1] for p in parts]),
+                   children=np.concatenate([p[2] for p in parts]).astype(np.int32),
+                   value=np.concatenate([p[3] for p in parts]), roots=offsets.astype(np.int32))
+
+    value = out["value"][..., :forest.n_classes_].astype(np.float64)
+    if value.max() > 1.0:
+        # Older sklearn stores class counts and normalizes them in predict_proba
+        normalizer = value.sum(axis=-1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        value = value / normalizer
+    out["value"] = value
+    return out
+
+
+def exportable(pipeline):
+    """Only tree forests (random forest, extra trees) have a flat export."""
+    model = pipeline.named_steps.get("model")
+    return all(hasattr(e, "tree_") for e in getattr(model, "estimators_", [None]))
+
+
+def export_model(pipeline, path):
+    """Writes the flat model next to the pickle (temp file + rename, like the pickle)."""
+    tmp_path = path + ".tmp.npz"
+    np.savez(tmp_path, **export_pipeline(pipeline))
+    os.replace(tmp_path, path)
+    return path
+
+
+def update_fast_model(pipeline, symbol):
+    """Exports the symbol's new model, or removes a stale export when it can't be exported."""
+    path = fast_model_path(symbol)
+    if exportable(pipeline):
+        return export_model(pipeline, path)
+    if os.path.exists(path):
+        os.remove(path)
+    return None
+
+
+class FastModel:
+    """predict_proba / predict / classes_ like the sklearn Pipeline it was exported from."""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.layout = str(arrays["layout"])
+        self.depth = int(arrays["depth"])
+        self.classes_ = arrays["classes"]
+        self.feature_names = list(arrays["feature_names"])
+        self.n_trees = len(arrays["feature"]) if self.layout == "dense" else len(arrays["roots"])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls({name: arrays[name] for name in arrays.files})
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        return cls(export_pipeline(pipeline))
+
+    def _matrix(self, X):
+        if hasattr(X, "columns") and self.feature_names:
+            X = X[self.feature_names]
+        # Same steps as StandardScaler.transform, then the float32 cast the trees compare in
+        X = np.array(X, dtype=np.float64, ndmin=2)
+        X -= self.arrays["mean"]
+        X /= self.arrays["scale"]
+        return X.astype(np.float32)
+
+    def _leaves(self, X):
+        """Leaf reached in every tree by every row: (rows, trees) indices into the value table."""
+        a = self.arrays
+        base = np.arange(len(X))[:, None] * X.shape[1]
+        X = X.ravel()
+        if self.layout == "dense":
+            width = 2 ** self.depth - 1
+            tree_base = np.arange(self.n_trees) * width
+            feature, threshold = a["feature"].ravel(), a["threshold"].ravel()
+            nodes = np.zeros((len(base), self.n_trees), dtype=np.intp)
+            for _ in range(self.depth):
+                at = tree_base + nodes
+                nodes = 2 * nodes + 1 + ~(X[base + feature[at]] <= threshold[at])
+            return (np.arange(self.n_trees) * (width + 1)) + nodes - width
+        nodes = np.broadcast_to(a["roots"], (len(base), self.n_trees))
+        for _ in range(self.depth):
+            go_left = X[base + a["feature"][nodes]] <= a["threshold"][nodes]
+            nodes = a["children"][nodes, go_left.view(np.int8)]
+        return nodes
+
+    def predict_proba(self, X):
+        X = self._matrix(X)
+        value = self.arrays["value"].reshape(-1, self.arrays["value"].shape[-1])
+        out = np.empty((len(X), value.shape[1]))
+        for start in range(0, len(X), BLOCK_ROWS):
+            leaves = self._leaves(X[start:start + BLOCK_ROWS])
+            for k in range(value.shape[1]):
+                # Sequential sum over the trees (cumsum, not pairwise np.sum): same rounding as sklearn
+                out[start:start + BLOCK_ROWS, k] = np.cumsum(value[:, k][leaves], axis=1)[:, -1]
+        return out / self.n_trees
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
+
+
+def load_model(symbol):
+    """The symbol's FastModel if its export is up to date, else the pickled sklearn Pipeline."""
+    pickle_path, flat_path = symbol_paths(symbol)["model"], fast_model_path(symbol)
+    if os.path.exists(flat_path) and (not os.path.exists(pickle_path)
+                                      or os.path.getmtime(flat_path) >= os.path.getmtime(pickle_path)):
+        return FastModel.load(flat_path)
+    import joblib
+    return joblib.load(pickle_path)
+
+
+def model_mtime(symbol):
+    """Latest change to either artifact (what the model server watches for hot reloads)."""
+    paths = [symbol_paths(symbol)["model"], fast_model_path(symbol)]
+    return max(os.path.getmtime(p) for p in paths if os.path.exists(p))
@@ -1,76 +1,64 @@
 import pandas as pd
-import numpy as np
-import joblib
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features.feature_engine import FEATURE_COLS, point_in_time_features
+from model.fast_model import load_model
+from pipeline.universe import DEFAULT_SYMBOL
+from utils.instrumentation import get_logger, instrument_stage
+from utils.store import has_table, read_table, write_table
+
+log = get_logger("predict")
 
 # =========================
 # 🔹 CONFIGURATION
 # =========================
-BASE_DIR = os.getcwd()
-RAW_DATA_PATH = os.path.join(BASE_DIR, "data", "raw", "rites_daily.csv")
-MODEL_PATH = os.path.join(BASE_DIR, "artifacts", "trading_model.pkl")
-OUTPUT_CSV = os.path.join(BASE_DIR, "data", "processed", "jan_predictions.csv")
-
-# Must match train.py columns exactly
-FEATURE_COLS = ["return_1d", "return_3d", "return_5d", "clv", "up_streak", "down_streak", "accel"]
-
-def compute_features(df):
-    """Calculates technical indicators for the entire dataset."""
-    df = df.copy()
-    df["return_1d"] = df["close"].pct_change(1)
-    df["return_3d"] = df["close"].pct_change(3)
-    df["return_5d"] = df["close"].pct_change(5)
-    
-    denom = (df["high"] - df["low"]).replace(0, np.nan)
-    df["clv"] = (((df["close"] - df["low"]) - (df["high"] - df["close"])) / denom).fillna(0)
-    
-    df["up_streak"] = (df["close"].diff() > 0).astype(int).cumsum()
-    df["down_streak"] = (df["close"].diff() < 0).astype(int).cumsum()
-    df["accel"] = df["return_1d"] - df["return_1d"].shift(1)
-    
-    return df
+# Predict every day after this date (the model never saw them)
+PREDICT_AFTER_DATE = "2025-12-31"
 
-def run_predictions():
-    print("⏳ Loading Data & Model...")
-    if not os.path.exists(RAW_DATA_PATH):
-        print("❌ Error: Raw data not found.")
+@instrument_stage("predict")
+def run_predictions(symbol=DEFAULT_SYMBOL):
+    log.info("⏳ Loading Data & Model...")
+    if not has_table("ohlcv", symbol):
+        log.error("❌ Error: Raw data not found.")
         return
 
-    # Load Full Data (Nov 1 - Jan 8)
-    full_df = pd.read_csv(RAW_DATA_PATH)
-    full_df["date"] = pd.to_datetime(full_df["date"])
-    full_df = full_df.sort_values("date").reset_index(drop=True)
+    # Load Full Data (Nov 1 - Jan 8), only the columns the features need
+    full_df = read_table("ohlcv", symbol, columns=["high", "low", "close"])
     
-    # Load Model (Trained on Nov-Dec only)
-    model = joblib.load(MODEL_PATH)
+    # Load Model (Trained on Nov-Dec only): the flat NumPy export when present, else the pickle
+    model = load_model(symbol)
 
     # Identify the specific days we want to PREDICT (Jan 1 - Jan 8)
     # Note: We filter for dates > Dec 31
-    target_dates = full_df[full_df["date"] > "2025-12-31"]["date"].tolist()
+    target_dates = full_df[full_df["date"] > PREDICT_AFTER_DATE]["date"].tolist()
     
     predictions_list = []
 
-    print(f"🔮 Generating Sequential Predictions for {len(target_dates)} days...")
+    log.info(f"🔮 Generating Sequential Predictions for {len(target_dates)} days...")
     print("="*60)
     print(f"{'TARGET DATE':<12} | {'INPUT DATE':<12} | {'PREDICTION':<10}")
     print("="*60)
 
-    for target_date in target_dates:
+    # Every day's point-in-time input vector in one pass (features up to the day before)
+    inputs_df = point_in_time_features(full_df, target_dates)
+    if inputs_df.empty:
+        log.warning(f"⚠️ No trading days after {PREDICT_AFTER_DATE} to predict.")
+        return pd.DataFrame(columns=["date", "prediction", "confidence"])
+
+    # Score every day at once. One predict_proba call gives both the signal (argmax, exactly
+    # what model.predict returns) and its confidence, so the forest only runs once.
+    proba = model.predict_proba(inputs_df[FEATURE_COLS])
+    preds = model.classes_[proba.argmax(axis=1)]
+    probs = proba.max(axis=1)
+
+    for i, row in inputs_df.iterrows():
         # To predict 'target_date', we use data UP TO the day before it.
         # This mimics standing at 9:00 AM on 'target_date' with yesterday's charts.
-        historical_context = full_df[full_df["date"] < target_date].copy()
-        
-        # Calculate features on this history
-        feats_df = compute_features(historical_context)
-        
-        # Get the very last row (Yesterday's closed candle)
-        # This is our input vector
-        input_vector = feats_df.tail(1)[FEATURE_COLS].fillna(0)
-        input_date = historical_context.iloc[-1]["date"]
-
-        # Predict
-        pred = model.predict(input_vector)[0]
-        prob = model.predict_proba(input_vector)[0].max()
+        target_date = row["date"]
+        input_date = row["input_date"]
+        pred, prob = preds[i], probs[i]
         
         signal = "BUY" if pred == 1 else "WAIT"
         
@@ -82,11 +70,12 @@ def run_predictions():
             "confidence": prob
         })
 
-    # Save to CSV
-    os.makedirs(os.path.dirname(OUTPUT_CSV), exist_ok=True)
-    pd.DataFrame(predictions_list).to_csv(OUTPUT_CSV, index=False)
+    # Save to the store
+    predictions_df = pd.DataFrame(predictions_list)
+    write_table("predictions", symbol, predictions_df)
     print("="*60)
-    print(f"✅ Predictions saved to: {OUTPUT_CSV}")
+    log.info(f"✅ Predictions saved to the store for {symbol}")
+    return predictions_df
 
 if __name__ == "__main__":
     run_predictions()
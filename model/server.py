@@ -0,0 +1,239 @@
+# model/server.py
+# Long-running local inference service for the pre-open window.
+#
+# Models and each symbol's incremental feature state stay in memory, so a request costs one
+# predict_proba call instead of Python startup + imports + joblib.load + a data parse.
+# A new artifact written by train.py is picked up by a background watcher and swapped in
+# atomically (requests in flight keep using the model they started with).
+#
+# Protocol: newline-delimited JSON over a persistent localhost TCP (or Unix) socket.
+#   {"op": "predict", "symbol": "NSE:RITES-EQ"}                      -> from the live feature state
+#   {"op": "predict", "symbol": "...", "features": [7 numbers]}      -> explicit input vector
+#   {"op": "predict_batch", "requests": [{"symbol": ...}, ...]}      -> one predict_proba per model
+#   {"op": "update", "symbol": "...", "bar": {"high": h, "low": l, "close": c}}
+#   {"op": "reload"} / {"op": "ping"}
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+import time
+import warnings
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features.feature_engine import FEATURE_COLS, IncrementalFeatureEngine
+from model.fast_model import load_model, model_mtime
+from utils.instrumentation import get_logger
+from utils.store import has_table, read_table
+
+log = get_logger("server")
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+HOST = "127.0.0.1"
+PORT = 8765
+RELOAD_INTERVAL = 2.0   # seconds between artifact mtime checks
+
+# Models are fitted on DataFrames; scoring plain arrays is deliberate (no per-call DataFrame cost)
+warnings.filterwarnings("ignore", message="X does not have valid feature names")
+
+
+class ModelRegistry:
+    """Per-symbol models + feature engines, loaded on first use and hot-reloaded on change."""
+
+    def __init__(self):
+        self.models = {}      # symbol -> (model, mtime); replaced as a whole, never mutated
+        self.engines = {}     # symbol -> IncrementalFeatureEngine
+        self.lock = threading.Lock()
+
+    def model(self, symbol):
+        entry = self.models.get(symbol)
+        if entry is None:
+            entry = self._load(symbol)
+        return entry[0]
+
+    def _load(self, symbol):
+        mtime = model_mtime(symbol)
+        model = load_model(symbol)         # load fully BEFORE swapping it in
+        entry = (model, mtime)
+        with self.lock:
+            self.models[symbol] = entry
+        return entry
+
+    def reload_changed(self):
+        """Reloads every model whose artifact changed on disk. Returns the reloaded symbols."""
+        reloaded = []
+        for symbol, (_, mtime) in list(self.models.items()):
+            try:
+                if model_mtime(symbol) != mtime:
+                    self._load(symbol)
+                    reloaded.append(symbol)
+            except (OSError, EOFError, ValueError) as e:
+                # Artifact mid-write or removed: keep serving the current model
+                log.warning(f"⚠️ Reload of {symbol} skipped: {e}")
+        return reloaded
+
+    def engine(self, symbol):
+        engine = self.engines.get(symbol)
+        if engine is None:
+            engine = IncrementalFeatureEngine()
+            if has_table("ohlcv", symbol):
+                engine.warm_up(read_table("ohlcv", symbol, columns=["high", "low", "close"]))
+            with self.lock:
+                engine = self.engines.setdefault(symbol, engine)
+        return engine
+
+    def watch(self, interval=RELOAD_INTERVAL):
+        def loop():
+            while True:
+                time.sleep(interval)
+                for symbol in self.reload_changed():
+                    log.info(f"🔄 Hot-reloaded model for {symbol}")
+        threading.Thread(target=loop, daemon=True).start()
+
+
+def score(model, rows):
+    """One predict_proba call for a batch of rows: signal (argmax) + confidence."""
+    proba = model.predict_proba(np.asarray(rows, dtype=float))
+    preds = model.classes_[proba.argmax(axis=1)]
+    return [
+        {"prediction": int(p), "signal": "BUY" if p == 1 else "WAIT", "confidence": float(c)}
+        for p, c in zip(preds, proba.max(axis=1))
+    ]
+
+
+def handle_request(registry, request):
+    op = request.get("op", "predict")
+
+    if op == "ping":
+        return {"ok": True}
+    if op == "reload":
+        return {"ok": True, "reloaded": registry.reload_changed()}
+    if op == "update":
+        bar = request["bar"]
+        engine = registry.engine(request["symbol"])
+        with registry.lock:
+            features = engine.update(float(bar["high"]), float(bar["low"]), float(bar["close"]))
+        return {"ok": True, "features": features}
+    if op == "predict":
+        return handle_batch(registry, [request])[0]
+    if op == "predict_batch":
+        return {"ok": True, "results": handle_batch(registry, request["requests"])}
+    return {"ok": False, "error": f"unknown op '{op}'"}
+
+
+def handle_batch(registry, requests):
+    """Groups requests by symbol so each model runs once per batch."""
+    results = [None] * len(requests)
+    by_symbol = {}
+    for i, req in enumerate(requests):
+        by_symbol.setdefault(req["symbol"], []).append(i)
+
+    for symbol, idx in by_symbol.items():
+        try:
+            model = registry.model(symbol)
+            rows = []
+            for i in idx:
+                features = requests[i].get("features")
+                if features is None:
+                    features = registry.engine(symbol).vector()
+                    if features is None:
+                        raise ValueError("no feature state (no bars in the store and none pushed)")
+                elif isinstance(features, dict):
+                    features = [features[col] for col in FEATURE_COLS]
+                rows.append(features)
+            for i, res in zip(idx, score(model, rows)):
+                results[i] = {"ok": True, "symbol": symbol, **res}
+        except Exception as e:
+            for i in idx:
+                results[i] = {"ok": False, "symbol": symbol, "error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # One persistent connection, many requests
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = handle_request(self.server.registry, json.loads(line))
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(response) + "\n").encode())
+            self.wfile.flush()
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(host=HOST, port=PORT, unix_path=None, symbols=()):
+    registry = ModelRegistry()
+    for symbol in symbols:
+        # Pay the load + warm-up cost before the market opens, not on the first request
+        registry.model(symbol)
+        registry.engine(symbol)
+    registry.watch()
+
+    if unix_path:
+        if os.path.exists(unix_path):
+            os.remove(unix_path)
+        server_cls = type("_UnixServer", (socketserver.ThreadingUnixStreamServer,), {"daemon_threads": True})
+        server = server_cls(unix_path, _Handler)
+        where = unix_path
+    else:
+        server = _TCPServer((host, port), _Handler)
+        where = f"{host}:{port}"
+    server.registry = registry
+    log.info(f"🚀 Model server listening on {where} ({len(symbols)} symbols preloaded)")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+class ModelClient:
+    """Keeps one connection open to the model server."""
+
+    def __init__(self, host=HOST, port=PORT, unix_path=None):
+        if unix_path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(unix_path)
+        else:
+            self.sock = socket.create_connection((host, port))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+
+    def request(self, payload):
+        self.sock.sendall((json.dumps(payload) + "\n").encode())
+        return json.loads(self.reader.readline())
+
+    def predict(self, symbol, features=None):
+        req = {"op": "predict", "symbol": symbol}
+        if features is not None:
+            req["features"] = list(features)
+        return self.request(req)
+
+    def predict_batch(self, requests):
+        return self.request({"op": "predict_batch", "requests": requests})["results"]
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persistent local inference server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", help="Serve on this Unix socket path instead of TCP")
+    parser.add_argument("--symbols", nargs="*", default=[], help="Preload these symbols at startup")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.unix, args.symbols)
@@ -1,67 +1,131 @@
 #train.py 
 
+import json
 import os
+import shutil
+import sys
 import joblib
-import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
+import sklearn
+from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, classification_report
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features.feature_lib import FEATURE_COLS
+from model.fast_model import update_fast_model
+from pipeline.universe import DEFAULT_SYMBOL, symbol_paths
+from utils.cache import ArtifactCache, hash_frame, hash_source, make_key
+from utils.instrumentation import count, get_logger, instrument_stage
+from utils.store import has_table, read_table
+
+log = get_logger("train")
+
 # =========================
 # 🔹 CONFIGURATION
 # =========================
-FEATURE_COLS = [
-    "return_1d", "return_3d", "return_5d", 
-    "clv", "up_streak", "down_streak", "accel"
-]
-
 # 🛑 STRICT RULE: Training must end here.
 TRAINING_CUTOFF_DATE = "2025-12-31"
 
-def train_model():
+MODEL_PARAMS = {"n_estimators": 100, "max_depth": 5, "random_state": 42}
+
+# Model families model/tune.py can search; random_forest with MODEL_PARAMS is the default model
+MODEL_FAMILIES = {
+    "random_forest": RandomForestClassifier,
+    "extra_trees": ExtraTreesClassifier,
+    "hist_gb": HistGradientBoostingClassifier,
+    "logistic": LogisticRegression,
+}
+
+def make_estimator(family="random_forest", **params):
+    if family == "random_forest":
+        params = {**MODEL_PARAMS, **params}
+    elif family != "logistic":
+        params = {"random_state": MODEL_PARAMS["random_state"], **params}
+    return MODEL_FAMILIES[family](**params)
+
+def make_pipeline(family="random_forest", **params):
+    """The model every stage trains: StandardScaler -> RandomForestClassifier(MODEL_PARAMS + overrides),
+    or another of MODEL_FAMILIES."""
+    return Pipeline([
+        ("scaler", StandardScaler()),
+        ("model", make_estimator(family, **params))
+    ])
+
+def tuned_params(symbol):
+    """(family, params) of the best candidate found by model/tune.py, else the default model."""
+    path = symbol_paths(symbol)["tuning"]
+    if not os.path.exists(path):
+        return "random_forest", {}
+    with open(path) as f:
+        best = json.load(f)["best"]
+    return best["family"], best["params"]
+
+def save_model(pipeline, symbol):
+    """Pickle (write then rename, so the model server never loads a half-written file) + flat export."""
+    model_save_path = symbol_paths(symbol)["model"]
+    os.makedirs(os.path.dirname(model_save_path), exist_ok=True)
+    joblib.dump(pipeline, model_save_path + ".tmp")
+    os.replace(model_save_path + ".tmp", model_save_path)
+    # Flat arrays for model/fast_model.py: scored with NumPy only, same probabilities
+    return model_save_path, update_fast_model(pipeline, symbol)
+
+@instrument_stage("train")
+def train_model(symbol=DEFAULT_SYMBOL, use_cache=True):
     # 1. SETUP PATHS
-    base_dir = os.getcwd()
-    input_path = os.path.join(base_dir, "data", "processed", "rites_features.csv")
-    artifacts_dir = os.path.join(base_dir, "artifacts")
-    model_save_path = os.path.join(artifacts_dir, "trading_model.pkl")
+    model_save_path = symbol_paths(symbol)["model"]
+    artifacts_dir = os.path.dirname(model_save_path)
 
-    if not os.path.exists(input_path):
-        print(f"❌ Error: {input_path} not found.")
+    if not has_table("features", symbol):
+        log.error(f"❌ Error: no features for {symbol} in the store. Run build_features.py first.")
         return
 
-    print(f"📖 Loading data from: {input_path}")
-    df = pd.read_csv(input_path)
-    
     # 2. 🛡️ COMPLIANCE FILTER (The Critical Fix)
-    # We explicitly convert to datetime and throw away any January data
-    df["date"] = pd.to_datetime(df["date"])
+    # The cutoff is pushed down into the read: January rows are never even loaded.
+    log.info(f"📖 Loading features for {symbol} up to {TRAINING_CUTOFF_DATE}")
+    train_df = read_table("features", symbol, end=TRAINING_CUTOFF_DATE)
     
-    # Filter: Keep ONLY rows on or before Dec 31, 2025
-    train_df = df[df["date"] <= pd.Timestamp(TRAINING_CUTOFF_DATE)].copy()
-    
-    print(f"📉 Filtering Data: {len(df)} total rows -> {len(train_df)} rows (Max Date: {train_df['date'].max().date()})")
+    log.info(f"📉 Filtered Data: {len(train_df)} rows (Max Date: {train_df['date'].max().date()})")
     
     # 3. PREPARE FEATURES
     try:
         X = train_df[FEATURE_COLS] 
         y = train_df["target"]
     except KeyError as e:
-        print(f"❌ DATA ERROR: Missing columns: {e}")
+        log.error(f"❌ DATA ERROR: Missing columns: {e}")
         return
 
+    # The best model found by model/tune.py, if the symbol was tuned
+    family, params = tuned_params(symbol)
+    if params:
+        log.info(f"🔧 Using tuned {family} {params}")
+
+    # CACHE: same training rows + same model definition -> same model, skip the fit
+    cache = ArtifactCache() if use_cache else None
+    key = make_key("train", data=hash_frame(train_df[["date"] + FEATURE_COLS + ["target"]]),
+                   feature_cols=FEATURE_COLS, params=MODEL_PARAMS, tuned=[family, params], cutoff=TRAINING_CUTOFF_DATE,
+                   code=hash_source(make_pipeline, train_model), sklearn=sklearn.__version__)
+    cached_path = cache.get(key) if cache else None
+    if cached_path:
+        count("cache_hits", stage="train")
+        os.makedirs(artifacts_dir, exist_ok=True)
+        shutil.copyfile(cached_path, model_save_path + ".tmp")
+        os.replace(model_save_path + ".tmp", model_save_path)
+        log.info(f"♻️ Training inputs unchanged: reused cached model -> {model_save_path}")
+        pipeline = joblib.load(model_save_path)
+        update_fast_model(pipeline, symbol)
+        return pipeline
+
     # 4. SPLIT (Chronological Split on the valid Nov-Dec data)
     split = int(len(X) * 0.8)
     X_train, X_test = X.iloc[:split], X.iloc[split:]
     y_train, y_test = y.iloc[:split], y.iloc[split:]
 
-    print(f"🧠 Training on {len(X_train)} days, Validating on {len(X_test)} days...")
+    log.info(f"🧠 Training on {len(X_train)} days, Validating on {len(X_test)} days...")
 
     # 5. TRAIN PIPELINE
-    pipeline = Pipeline([
-        ("scaler", StandardScaler()),
-        ("model", RandomForestClassifier(n_estimators=100, max_depth=5, random_state=42))
-    ])
+    pipeline = make_pipeline(family, **params)
     
     pipeline.fit(X_train, y_train)
 
@@ -69,17 +133,71 @@ def train_model():
     y_pred = pipeline.predict(X_test)
     acc = accuracy_score(y_test, y_pred)
     
-    print("\n" + "="*30)
-    print(f"🎯 VALIDATION ACCURACY: {acc:.2%} (Nov-Dec Only)")
-    print("="*30)
+    log.info("\n" + "="*30)
+    log.info(f"🎯 VALIDATION ACCURACY: {acc:.2%} (Nov-Dec Only)")
+    log.info("="*30)
     
     # Optional: Retrain on FULL Nov-Dec data for the final model
     pipeline.fit(X, y)
-    print("✅ Final Model retrained on all Nov-Dec data.")
+    log.info("✅ Final Model retrained on all Nov-Dec data.")
+
+    model_save_path, fast_path = save_model(pipeline, symbol)
+    log.info(f"💾 Model saved to: {model_save_path}")
+    if fast_path:
+        log.info(f"⚡ Fast model exported to: {fast_path}")
 
-    os.makedirs(artifacts_dir, exist_ok=True)
-    joblib.dump(pipeline, model_save_path)
-    print(f"💾 Model saved to: {model_save_path}")
+    if cache:
+        # The manifest records exactly which data this model was trained on
+        cache.put(key, model_save_path, "train", symbol, {
+            "rows": len(train_df), "first_date": train_df["date"].min(), "last_date": train_df["date"].max(),
+            "cutoff": TRAINING_CUTOFF_DATE, "params": MODEL_PARAMS, "tuned": [family, params], "validation_accuracy": round(acc, 4),
+        })
+    return pipeline
+
+def horizon_model_path(symbol, label):
+    return os.path.splitext(symbol_paths(symbol)["model"])[0] + f"_{label}.pkl"
+
+def train_horizons(symbol=DEFAULT_SYMBOL, labels=("up_1d", "up_3d", "up_5d", "barrier"), save=True):
+    """
+    One model per label of features/labels.py, all fitted on the same float32 feature matrix.
+    Only bars up to TRAINING_CUTOFF_DATE are read, so a label that needs later bars is not used.
+    """
+    from features.labels import build_training_set
+
+    training_set = build_training_set(symbol, cutoff=TRAINING_CUTOFF_DATE)
+    family, params = tuned_params(symbol)
+    models = {}
+    for label in labels:
+        X, y = training_set.matrix(label)
+        if len(set(y.tolist())) < 2:
+            log.warning(f"⚠️ {label}: {len(y)} known rows with a single class, skipped")
+            continue
+        pipeline = make_pipeline(family, **params).fit(X, y)
+        models[label] = pipeline
+        log.info(f"🧠 {label}: trained on {len(y)} rows | classes {sorted(set(y.tolist()))}")
+        if save:
+            path = horizon_model_path(symbol, label)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            joblib.dump(pipeline, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            log.info(f"   💾 {path}")
+    return models
 
 if __name__ == "__main__":
-    train_model()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train one symbol's model (or tune it: see model/tune.py)")
+    parser.add_argument("--symbol", default=DEFAULT_SYMBOL)
+    parser.add_argument("--tune", action="store_true", help="Search the model space with purged time-series CV")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--horizons", nargs="+", metavar="LABEL",
+                        help="Also train one model per label of features/labels.py (e.g. up_3d up_5d barrier)")
+    args = parser.parse_args()
+
+    if args.horizons:
+        train_horizons(args.symbol, args.horizons)
+    elif args.tune:
+        from model.tune import tune_models
+        tune_models([args.symbol])
+    else:
+        train_model(args.symbol, use_cache=not args.no_cache)
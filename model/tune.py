@@ -0,0 +1,251 @@
+# model/tune.py
+# Hyperparameter search with purged, embargoed time-series cross-validation.
+#
+# Every symbol's training rows (up to TRAINING_CUTOFF_DATE) are cut into N_SPLITS contiguous test
+# blocks. Each block is scored by a model trained on the other rows, minus the rows around the
+# block that share information with it: PURGE_BARS before it (their next-bar label is a test
+# close) and EMBARGO_BARS after it (their features look back into the test block).
+#
+# The scaled train / test matrices of every fold are built ONCE and handed to each worker process
+# a single time (pool initializer); a task is then just one estimator fit on one fold. Candidates
+# of all symbols are raced together by successive halving: everyone is scored on the first folds,
+# only the best 1/ETA of each symbol's candidates get the next folds, and so on.
+#
+#   python model/tune.py --symbols NSE:RITES-EQ NSE:IRCON-EQ     (or: python model/train.py --tune)
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import log_loss
+from sklearn.preprocessing import StandardScaler
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features.feature_lib import FEATURE_COLS, MAX_LOOKBACK
+from model.train import TRAINING_CUTOFF_DATE, make_estimator, make_pipeline, save_model
+from pipeline.universe import DEFAULT_SYMBOL, load_universe, symbol_paths
+from utils.instrumentation import get_logger
+from utils.store import has_table, read_table
+
+log = get_logger("tune")
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+SEARCH_SPACE = {
+    "random_forest": {"n_estimators": [100, 300], "max_depth": [3, 5, 8, None],
+                      "min_samples_leaf": [1, 5, 20], "class_weight": [None, "balanced"]},
+    "extra_trees": {"n_estimators": [300], "max_depth": [5, 8, None],
+                    "min_samples_leaf": [1, 5, 20], "class_weight": [None, "balanced"]},
+    "hist_gb": {"max_depth": [3, None], "learning_rate": [0.05, 0.1],
+                "min_samples_leaf": [20, 50], "class_weight": [None, "balanced"]},
+    "logistic": {"C": [0.1, 1.0, 10.0], "class_weight": [None, "balanced"]},
+}
+N_SPLITS = 5
+PURGE_BARS = 1              # label horizon: row r's target uses close[r + 1]
+EMBARGO_BARS = MAX_LOOKBACK # features of row r use the bars r - MAX_LOOKBACK .. r
+ETA = 3                     # successive halving keeps the best 1/ETA candidates per rung
+MIN_FOLDS = 2               # folds every candidate is scored on before the first cut
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# Fold matrices and candidates, set once per worker process by _init_worker
+_SHARED = {}
+
+
+def expand_space(space):
+    """{"family": {"a": [1, 2]}} -> [("family", {"a": 1}), ("family", {"a": 2})]"""
+    candidates = []
+    for family, grid in space.items():
+        names = list(grid)
+        for values in itertools.product(*(grid[n] for n in names)):
+            params = dict(zip(names, values))
+            if family in ("random_forest", "extra_trees"):
+                params["n_jobs"] = 1      # the pool already uses every core
+            candidates.append((family, params))
+    return candidates
+
+
+def purged_folds(n_rows, n_splits=N_SPLITS, purge=PURGE_BARS, embargo=EMBARGO_BARS):
+    """(train_idx, test_idx) per contiguous test block, without the purged / embargoed rows."""
+    rows = np.arange(n_rows)
+    folds = []
+    for test in np.array_split(rows, n_splits):
+        if not len(test):
+            continue
+        train = rows[(rows < test[0] - purge) | (rows >= test[-1] + 1 + embargo)]
+        folds.append((train, test))
+    return folds
+
+
+def prepare_folds(symbol, n_splits=N_SPLITS, purge=PURGE_BARS, embargo=EMBARGO_BARS):
+    """Training rows of one symbol and every fold's scaled matrices (the scaler is fitted per fold)."""
+    train_df = read_table("features", symbol, end=TRAINING_CUTOFF_DATE)
+    X = train_df[FEATURE_COLS].to_numpy(float)
+    y = train_df["target"].to_numpy(int)
+    folds = []
+    for train, test in purged_folds(len(X), n_splits, purge, embargo):
+        # Same as each candidate's Pipeline would do: scaler fitted on the fold's training rows only
+        scaler = StandardScaler().fit(X[train])
+        folds.append({"X_train": scaler.transform(X[train]), "y_train": y[train],
+                      "X_test": scaler.transform(X[test]), "y_test": y[test]})
+    return {"X": X, "y": y, "folds": folds, "first_date": train_df["date"].min(),
+            "last_date": train_df["date"].max()}
+
+
+def rung_budgets(n_folds, eta=ETA, min_folds=MIN_FOLDS):
+    """Folds scored by the survivors of each rung, e.g. 5 folds -> [2, 5]; 10 folds -> [2, 6, 10]."""
+    budgets, budget = [], min(min_folds, n_folds)
+    while budget < n_folds:
+        budgets.append(budget)
+        budget *= eta
+    return budgets + [n_folds]
+
+
+def _init_worker(shared):
+    _SHARED.update(shared)
+
+
+def score_fold(task):
+    """Fits one candidate on one fold. Returns (log loss, accuracy, seconds)."""
+    symbol, candidate, fold = task
+    family, params = _SHARED["candidates"][candidate]
+    data = _SHARED["symbols"][symbol]["folds"][fold]
+    started = time.perf_counter()
+    model = make_estimator(family, **params).fit(data["X_train"], data["y_train"])
+    proba = model.predict_proba(data["X_test"])
+    classes = list(model.classes_)
+    # A fold whose training rows hold a single class predicts it with certainty
+    p_up = proba[:, classes.index(1)] if 1 in classes else np.zeros(len(proba))
+    loss = log_loss(data["y_test"], p_up, labels=[0, 1])
+    accuracy = float(((p_up > 0.5).astype(int) == data["y_test"]).mean())
+    return float(loss), accuracy, time.perf_counter() - started
+
+
+def race(shared, n_folds, eta=ETA, min_folds=MIN_FOLDS, max_workers=MAX_WORKERS):
+    """Successive halving over (symbol, candidate, fold) tasks. Returns {symbol: {(candidate, fold): scores}}."""
+    symbols = list(shared["symbols"])
+    alive = {s: list(range(len(shared["candidates"]))) for s in symbols}
+    scores = {s: {} for s in symbols}
+    done = 0
+
+    pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(shared,)) \
+        if max_workers > 1 else None
+    if pool is None:
+        _init_worker(shared)
+    try:
+        for rung, budget in enumerate(rung_budgets(n_folds, eta, min_folds)):
+            tasks = [(s, c, f) for s in symbols for c in alive[s] for f in range(done, budget)
+                     if f < len(shared["symbols"][s]["folds"])]
+            started = time.perf_counter()
+            if pool is None:
+                results = map(score_fold, tasks)
+            else:
+                results = pool.map(score_fold, tasks, chunksize=max(1, len(tasks) // (max_workers * 8)))
+            for task, result in zip(tasks, results):
+                scores[task[0]][task[1], task[2]] = result
+            log.info(f"   rung {rung}: {len(tasks)} fits on folds {done}..{budget - 1} "
+                     f"in {time.perf_counter() - started:.1f}s")
+            done = budget
+
+            if budget < n_folds:
+                # Cut: only the best 1/ETA of each symbol's candidates (mean loss so far) go on
+                for s in symbols:
+                    ranked = sorted(alive[s], key=lambda c: _mean(scores[s], c)[0])
+                    alive[s] = ranked[:max(1, math.ceil(len(ranked) / eta))]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return scores
+
+
+def _mean(symbol_scores, candidate):
+    folds = sorted(f for c, f in symbol_scores if c == candidate)
+    losses = [symbol_scores[candidate, f][0] for f in folds]
+    accuracies = [symbol_scores[candidate, f][1] for f in folds]
+    return float(np.mean(losses)), float(np.mean(accuracies)), len(folds)
+
+
+def leaderboard(symbol_scores, candidates):
+    rows = []
+    for c in sorted({c for c, _ in symbol_scores}):
+        loss, accuracy, n_folds = _mean(symbol_scores, c)
+        family, params = candidates[c]
+        rows.append({"id": c, "family": family, "params": {k: v for k, v in params.items() if k != "n_jobs"},
+                     "folds": n_folds, "log_loss": loss, "accuracy": accuracy,
+                     "fold_log_loss": [symbol_scores[c, f][0] for f in range(n_folds)]})
+    # Candidates that survived more rungs first, then by loss
+    return sorted(rows, key=lambda r: (-r["folds"], r["log_loss"]))
+
+
+def tune_models(symbols=None, space=None, n_splits=N_SPLITS, purge=PURGE_BARS, embargo=EMBARGO_BARS,
+                eta=ETA, max_workers=MAX_WORKERS, save=True):
+    """Tunes every symbol, refits its best candidate on all its training rows and saves it."""
+    symbols = symbols or [row["symbol"] for row in load_universe()]
+    candidates = expand_space(space or SEARCH_SPACE)
+    started = time.perf_counter()
+
+    data = {}
+    for symbol in symbols:
+        if not has_table("features", symbol):
+            log.warning(f"⚠️ {symbol}: no features in the store, skipped")
+            continue
+        data[symbol] = prepare_folds(symbol, n_splits, purge, embargo)
+    if not data:
+        log.error("❌ Error: nothing to tune. Run build_features.py first.")
+        return None
+
+    n_folds = max(len(d["folds"]) for d in data.values())
+    log.info(f"🔬 Tuning {len(data)} symbol(s): {len(candidates)} candidates x {n_folds} purged folds "
+             f"(purge {purge}, embargo {embargo} bars) on {max_workers} workers")
+    shared = {"candidates": candidates,
+              "symbols": {s: {"folds": d["folds"]} for s, d in data.items()}}
+    scores = race(shared, n_folds, eta, max_workers=max_workers)
+
+    results = {}
+    for symbol, d in data.items():
+        board = leaderboard(scores[symbol], candidates)
+        best = board[0]
+        report = {
+            "symbol": symbol, "best": best, "leaderboard": board,
+            "cv": {"n_splits": n_splits, "purge": purge, "embargo": embargo, "eta": eta, "rows": len(d["X"]),
+                   "first_date": str(d["first_date"].date()), "last_date": str(d["last_date"].date()),
+                   "cutoff": TRAINING_CUTOFF_DATE},
+        }
+        log.info(f"🏅 {symbol}: {best['family']} {best['params']} | log loss {best['log_loss']:.4f} "
+                 f"| accuracy {best['accuracy']:.2%} over {best['folds']} folds")
+
+        if save:
+            pipeline = make_pipeline(best["family"], **best["params"])
+            pipeline.fit(read_table("features", symbol, end=TRAINING_CUTOFF_DATE)[FEATURE_COLS], d["y"])
+            model_path, fast_path = save_model(pipeline, symbol)
+            report_path = symbol_paths(symbol)["tuning"]
+            with open(report_path + ".tmp", "w") as f:
+                json.dump(report, f, indent=2, default=str)
+            os.replace(report_path + ".tmp", report_path)
+            log.info(f"   💾 {model_path}{' + ' + os.path.basename(fast_path) if fast_path else ''} | CV scores -> {report_path}")
+        results[symbol] = report
+
+    log.info(f"✅ Tuned {len(results)} symbol(s) in {time.perf_counter() - started:.1f}s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Purged time-series CV hyperparameter search")
+    parser.add_argument("--symbols", nargs="+", default=[DEFAULT_SYMBOL], help="Or --universe for all of them")
+    parser.add_argument("--universe", action="store_true", help="Tune every symbol in config/universe.csv")
+    parser.add_argument("--families", nargs="+", choices=list(SEARCH_SPACE), help="Only these model families")
+    parser.add_argument("--splits", type=int, default=N_SPLITS)
+    parser.add_argument("--embargo", type=int, default=EMBARGO_BARS)
+    parser.add_argument("--eta", type=int, default=ETA)
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--no-save", action="store_true", help="Only report the CV scores")
+    args = parser.parse_args()
+
+    space = {f: SEARCH_SPACE[f] for f in args.families} if args.families else None
+    tune_models(None if args.universe else args.symbols, space, args.splits, PURGE_BARS, args.embargo,
+                args.eta, args.workers, save=not args.no_save)
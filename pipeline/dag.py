@@ -0,0 +1,291 @@
+# pipeline/dag.py
+# Runs only the stages whose outputs are out of date, in dependency order.
+#
+# Each stage declares what it reads and writes (store tables and artifact files). A stage is
+# stale when an output is missing, or older than one of its inputs or its own code. Running a
+# stage rewrites its outputs, so everything downstream of it goes stale as well: one command
+# does the minimum rebuild.
+#
+# Symbols run in parallel worker processes. Within one symbol, independent stages (e.g.
+# report and backtest) run concurrently in threads. Universe stages (orders) run once, in this
+# process, for every symbol whose stages up to them succeeded. All of a symbol's stages share
+# one process and an in-memory table cache (utils/store.memory_cache), so each table is decoded
+# from Parquet at most once and a stage's output is handed to the next one in memory.
+#
+#   python pipeline/dag.py                              # everything up to the backtest, if stale
+#   python pipeline/dag.py --targets orders --refresh   # fetch new bars first, then up to orders
+#   python pipeline/dag.py --targets report             # + equity chart (reports are only made on request)
+#   python pipeline/dag.py --dry-run                    # what would run, and why
+import argparse
+import glob
+import importlib
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+from pipeline.universe import load_universe, symbol_paths, table_dir
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+# name -> function (+ kwargs), dependencies, inputs / outputs ("table:<name>" in the store, "file:<symbol_paths key>")
+# and the source files that define it (an edit there makes the stage stale).
+# "optional_outputs": written only in some cases (need not exist, but an old one makes the stage stale).
+# "universe": called once with the list of symbols instead of once per symbol
+STAGES = {
+    "fetch": {"func": "fyers.fyers_fetch_rites:fetch_data", "deps": [],
+              "inputs": [], "outputs": ["table:ohlcv"],
+              "code": ["fyers/fyers_fetch_rites.py", "fyers/downloader.py"]},
+    "features": {"func": "features.build_features:build_features", "deps": ["fetch"],
+                 "inputs": ["table:ohlcv"], "outputs": ["table:features"],
+                 "code": ["features/build_features.py", "features/feature_lib.py"]},
+    # The .npz export exists only for models fast_model.py can flatten
+    "train": {"func": "model.train:train_model", "deps": ["features"],
+              "inputs": ["table:features", "file:tuning"], "outputs": ["file:model"],
+              "optional_outputs": ["file:fast_model"],
+              "code": ["model/train.py", "model/fast_model.py", "utils/cache.py"]},
+    "predict": {"func": "model.predict:run_predictions", "deps": ["fetch", "train"],
+                "inputs": ["table:ohlcv", "file:model", "file:fast_model"], "outputs": ["table:predictions"],
+                "code": ["model/predict.py", "features/feature_engine.py", "model/fast_model.py"]},
+    "strategy": {"func": "strategy.main:execute_strategy", "deps": ["fetch", "predict"],
+                 "inputs": ["table:ohlcv", "table:predictions"], "outputs": ["table:order_book"],
+                 "code": ["strategy/main.py"]},
+    # Headless: the result is saved for the report stage, nothing is printed or plotted
+    "backtest": {"func": "backtest.walk_forward:run_backtest", "kwargs": {"verbose": False},
+                 "deps": ["fetch", "strategy"], "inputs": ["table:ohlcv", "table:order_book"],
+                 "outputs": ["file:backtest"], "code": ["backtest/walk_forward.py", "backtest/engine.py", "backtest/metrics.py"]},
+    "report": {"func": "backtest.report:report_symbol", "deps": ["backtest"],
+               "inputs": ["file:backtest"], "outputs": ["file:chart"], "code": ["backtest/report.py"]},
+    # No outputs: runs whenever it is a target. Once for the whole book: the live risk state and
+    # its kill switch (backtest/metrics.py) cover every symbol's positions together
+    "orders": {"func": "fyers.orders:place_orders", "deps": ["strategy"], "universe": True,
+               "inputs": ["table:order_book"], "outputs": [], "code": []},
+}
+DEFAULT_TARGETS = ["backtest"]
+# fetch needs the network and a token: it only runs when asked (--refresh) or when there are no bars
+ON_DEMAND = {"fetch"}
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+STAGE_THREADS = 2
+
+
+def resource_mtime(resource, symbol):
+    """Last change to a store table / artifact of one symbol, or None if it does not exist."""
+    kind, name = resource.split(":", 1)
+    if kind == "table":
+        files = glob.glob(os.path.join(table_dir(name, symbol), "year=*", "*.parquet"))
+        return max((os.path.getmtime(f) for f in files), default=None)
+    path = symbol_paths(symbol)[name]
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def plan_stages(targets):
+    """Every stage the targets need, in dependency order."""
+    order = []
+
+    def visit(name):
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage: {name} (known: {', '.join(STAGES)})")
+        if name in order:
+            return
+        for dep in STAGES[name]["deps"]:
+            visit(dep)
+        order.append(name)
+
+    for target in targets:
+        visit(target)
+    return order
+
+
+def stale_reason(name, symbol, forced=(), ran=()):
+    """Why the stage has to run for the symbol, or None when its outputs are up to date."""
+    stage = STAGES[name]
+    if name in forced:
+        return "forced"
+    if not stage["outputs"]:
+        return "no outputs (always runs)"
+    output_times = [resource_mtime(r, symbol) for r in stage["outputs"]]
+    if None in output_times:
+        return "output missing"
+    if name in ON_DEMAND:
+        return None
+    upstream = [dep for dep in stage["deps"] if dep in ran]
+    if upstream:
+        return f"{upstream[0]} ran"
+    optional_times = [resource_mtime(r, symbol) for r in stage.get("optional_outputs", [])]
+    oldest = min(output_times + [t for t in optional_times if t is not None])
+    for resource in stage["inputs"]:
+        mtime = resource_mtime(resource, symbol)
+        if mtime is not None and mtime > oldest:
+            return f"{resource} changed"
+    for path in stage["code"]:
+        if os.path.getmtime(os.path.join(ROOT, path)) > oldest:
+            return f"{path} changed"
+    return None
+
+
+def _stage_func(name):
+    module, func = STAGES[name]["func"].split(":")
+    return getattr(importlib.import_module(module), func)
+
+
+def run_symbol(symbol, stages, forced=(), dry_run=False, threads=STAGE_THREADS):
+    """Runs one symbol's stale stages, independent ones concurrently. Never raises."""
+    from utils.store import memory_cache
+
+    result = {"symbol": symbol, "status": "ok", "ran": [], "skipped": [], "reasons": {}, "timings": {},
+              "failed_stage": None, "error": None}
+    started = time.perf_counter()
+    done, ran, failed = set(), set(), set()
+    pending = list(stages)
+
+    def ready(name):
+        return all(dep in done or dep in failed or dep not in stages for dep in STAGES[name]["deps"])
+
+    def run(name):
+        t0 = time.perf_counter()
+        try:
+            if _stage_func(name)(symbol, **STAGES[name].get("kwargs", {})) is None:
+                raise RuntimeError(f"{name} produced no output")
+        finally:
+            result["timings"][name] = time.perf_counter() - t0
+
+    with memory_cache(), ThreadPoolExecutor(max_workers=threads) as pool:
+        running = {}
+        while pending or running:
+            for name in [n for n in pending if ready(n)]:
+                pending.remove(name)
+                if any(dep in failed for dep in STAGES[name]["deps"]):
+                    failed.add(name)
+                    continue
+                reason = stale_reason(name, symbol, forced, ran)
+                if reason is None:
+                    result["skipped"].append(name)
+                    done.add(name)
+                    continue
+                result["reasons"][name] = reason
+                if dry_run:
+                    # Pretend it ran, so its dependents show as stale too
+                    ran.add(name)
+                    done.add(name)
+                    continue
+                running[pool.submit(run, name)] = name
+            if not running:
+                if pending and not any(ready(n) for n in pending):
+                    break
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    future.result()
+                    ran.add(name)
+                    done.add(name)
+                    result["ran"].append(name)
+                except Exception as e:
+                    failed.add(name)
+                    if result["failed_stage"] is None:
+                        result.update(status="failed", failed_stage=name, error=f"{type(e).__name__}: {e}",
+                                      traceback=traceback.format_exc())
+    result["wall_time"] = time.perf_counter() - started
+    if dry_run:
+        result["ran"] = [n for n in stages if n in ran]
+    return result
+
+
+def run_universe_stage(name, symbols, results, dry_run=False):
+    """Runs a universe stage once, for the symbols whose stages up to it succeeded. Never raises."""
+    upstream = set(plan_stages([name])) - {name}
+    # A symbol is ready unless it failed at (or before) one of the stage's dependencies
+    ready = [r["symbol"] for r in results
+             if r["status"] == "ok" or (r["failed_stage"] is not None and r["failed_stage"] not in upstream)]
+    result = {"symbol": f"[{name}]", "status": "ok", "ran": [], "skipped": [], "reasons": {}, "timings": {},
+              "failed_stage": None, "error": None}
+    started = time.perf_counter()
+    if not ready:
+        result.update(status="failed", failed_stage=name, error="no symbol is ready for it")
+    else:
+        result["reasons"][name] = f"{len(ready)} symbol(s)"
+        result["ran"].append(name)
+        if not dry_run:
+            try:
+                if _stage_func(name)(ready, **STAGES[name].get("kwargs", {})) is None:
+                    raise RuntimeError(f"{name} produced no output")
+            except Exception as e:
+                result.update(status="failed", failed_stage=name, error=f"{type(e).__name__}: {e}",
+                              traceback=traceback.format_exc())
+            result["timings"][name] = time.perf_counter() - started
+    result["wall_time"] = time.perf_counter() - started
+    return result
+
+
+def run_dag(symbols, targets=DEFAULT_TARGETS, refresh=False, force=(), dry_run=False, max_workers=MAX_WORKERS):
+    stages = plan_stages(targets)
+    forced = set(force) | ({"fetch"} if refresh else set())
+    if "fetch" in stages and "fetch" not in forced and "fetch" not in targets:
+        # Bars already in the store are used as they are (see ON_DEMAND)
+        stages = [s for s in stages if s != "fetch" or any(resource_mtime("table:ohlcv", sym) is None
+                                                          for sym in symbols)]
+    print(f"🧭 {len(symbols)} symbol(s), stages: {' -> '.join(stages)}{' (dry run)' if dry_run else ''}")
+
+    if "fetch" in stages and not dry_run:
+        # Authenticate once up front so no worker ever blocks on the interactive login
+        from fyers.fyers_fetch_rites import get_access_token
+        get_access_token()
+
+    universe = [s for s in stages if STAGES[s].get("universe")]
+    stages = [s for s in stages if s not in universe]
+
+    results = []
+    if max_workers > 1 and len(symbols) > 1 and not dry_run:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = {pool.submit(run_symbol, s, stages, forced): s for s in symbols}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append({"symbol": futures[future], "status": "failed", "ran": [], "skipped": [],
+                                    "reasons": {}, "timings": {}, "failed_stage": None,
+                                    "error": f"{type(e).__name__}: {e}", "wall_time": 0.0})
+    else:
+        results = [run_symbol(s, stages, forced, dry_run) for s in symbols]
+    results += [run_universe_stage(name, symbols, results, dry_run) for name in universe]
+
+    print_summary(results, dry_run)
+    return results
+
+
+def print_summary(results, dry_run=False):
+    print("\n📊 PIPELINE SUMMARY" + (" (dry run: nothing was executed)" if dry_run else ""))
+    print("=" * 70)
+    for res in sorted(results, key=lambda r: r["symbol"]):
+        mark = "✅" if res["status"] == "ok" else "❌"
+        print(f"{mark} {res['symbol']:<20} {res['wall_time']:6.2f}s")
+        for name in res["ran"]:
+            timing = f"{res['timings'][name]:6.2f}s" if name in res["timings"] else "      "
+            print(f"   ▶ {name:<10} {timing}  ({res['reasons'][name]})")
+        if res["skipped"]:
+            print(f"   ⏭️ up to date: {', '.join(res['skipped'])}")
+        if res["error"]:
+            print(f"   ❌ {res['failed_stage']}: {res['error']}")
+    failed = [r for r in results if r["status"] != "ok"]
+    print(f"\n✅ {len(results) - len(failed)} succeeded | ❌ {len(failed)} failed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the stale pipeline stages (a dependency DAG)")
+    parser.add_argument("--symbols", nargs="+", help="Default: every symbol in config/universe.csv")
+    parser.add_argument("--targets", nargs="+", choices=list(STAGES), default=DEFAULT_TARGETS)
+    parser.add_argument("--refresh", action="store_true", help="Fetch new bars first (and rebuild what they change)")
+    parser.add_argument("--force", nargs="+", choices=list(STAGES), default=[], help="Run these even if up to date")
+    parser.add_argument("--dry-run", action="store_true", help="Only show what would run, and why")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    symbols = args.symbols or [row["symbol"] for row in load_universe()]
+    results = run_dag(symbols, args.targets, args.refresh, args.force, args.dry_run, args.workers)
+    sys.exit(0 if all(r["status"] == "ok" for r in results) else 1)
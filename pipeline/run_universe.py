@@ -0,0 +1,117 @@
+# pipeline/run_universe.py
+# Runs fetch -> features -> train -> predict -> strategy for every symbol in the universe,
+# one symbol per worker process.
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import UNIVERSE_PATH, load_universe
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+# Bounded worker count: leave one core for the OS / broker session
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+STAGES = ["fetch", "features", "train", "predict", "strategy"]
+
+
+def _stage_func(stage):
+    # Imported inside the worker, and only for the stages that run, so the parent stays light
+    if stage == "fetch":
+        from fyers.fyers_fetch_rites import fetch_data
+        return fetch_data
+    if stage == "features":
+        from features.build_features import build_features
+        return build_features
+    if stage == "train":
+        from model.train import train_model
+        return train_model
+    if stage == "predict":
+        from model.predict import run_predictions
+        return run_predictions
+    if stage == "strategy":
+        from strategy.main import execute_strategy
+        return execute_strategy
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def run_symbol(symbol, stages=STAGES):
+    """Runs the pipeline for one symbol. Never raises: failures are reported in the result."""
+    result = {"symbol": symbol, "status": "ok", "failed_stage": None, "error": None, "timings": {}}
+    start = time.perf_counter()
+
+    for stage in stages:
+        t0 = time.perf_counter()
+        try:
+            output = _stage_func(stage)(symbol)
+            if output is None:
+                raise RuntimeError(f"{stage} produced no output")
+        except Exception as e:
+            result.update(status="failed", failed_stage=stage, error=f"{type(e).__name__}: {e}")
+            result["traceback"] = traceback.format_exc()
+            break
+        finally:
+            result["timings"][stage] = time.perf_counter() - t0
+
+    result["wall_time"] = time.perf_counter() - start
+    return result
+
+
+def run_universe(symbols, stages=STAGES, max_workers=MAX_WORKERS):
+    print(f"🌐 Running {len(symbols)} symbols on {max_workers} workers: {' -> '.join(stages)}")
+
+    if "fetch" in stages:
+        # Authenticate once up front so no worker ever blocks on the interactive login
+        from fyers.fyers_fetch_rites import get_access_token
+        get_access_token()
+
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run_symbol, symbol, stages): symbol for symbol in symbols}
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                res = future.result()
+            except Exception as e:
+                # Worker process died (e.g. killed) - still isolate it to this symbol
+                res = {"symbol": symbol, "status": "failed", "failed_stage": None,
+                       "error": f"{type(e).__name__}: {e}", "timings": {}, "wall_time": 0.0}
+            results.append(res)
+            mark = "✅" if res["status"] == "ok" else "❌"
+            print(f"{mark} {symbol:<20} {res['wall_time']:7.2f}s  {res['error'] or ''}")
+
+    print_summary(results, stages)
+    return results
+
+
+def print_summary(results, stages):
+    print("\n📊 UNIVERSE RUN SUMMARY")
+    print("=" * (24 + 11 * (len(stages) + 1)))
+    print(f"{'SYMBOL':<22}" + "".join(f"{s:>11}" for s in stages) + f"{'TOTAL':>11}")
+    print("=" * (24 + 11 * (len(stages) + 1)))
+    for res in sorted(results, key=lambda r: r["symbol"]):
+        cells = "".join(
+            f"{res['timings'][s]:>10.2f}s" if s in res["timings"] else f"{'-':>11}" for s in stages
+        )
+        print(f"{res['symbol']:<22}{cells}{res['wall_time']:>10.2f}s")
+
+    failed = [r for r in results if r["status"] != "ok"]
+    print(f"\n✅ {len(results) - len(failed)} succeeded | ❌ {len(failed)} failed")
+    for res in failed:
+        print(f"   {res['symbol']}: {res['failed_stage']} -> {res['error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the full pipeline for every symbol in the universe")
+    parser.add_argument("--universe", default=UNIVERSE_PATH, help="CSV with a 'symbol' column")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--symbols", nargs="+", help="Run only these symbols")
+    args = parser.parse_args()
+
+    symbols = args.symbols or [row["symbol"] for row in load_universe(args.universe)]
+    run_universe(symbols, stages=args.stages, max_workers=args.workers)
@@ -0,0 +1,55 @@
+# pipeline/universe.py
+import csv
+import os
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+DEFAULT_SYMBOL = "NSE:RITES-EQ"
+UNIVERSE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "universe.csv")
+
+
+def load_universe(path=UNIVERSE_PATH):
+    """Returns the universe as a list of {"symbol", "sector"} rows."""
+    with open(path, newline="") as f:
+        return [row for row in csv.DictReader(f) if row["symbol"].strip()]
+
+
+def symbol_slug(symbol):
+    """'NSE:RITES-EQ' -> 'rites' (used in file names)."""
+    name = symbol.split(":")[-1]
+    if name.endswith("-EQ"):
+        name = name[:-3]
+    return name.lower().replace("-", "_").replace("&", "and")
+
+
+def store_dir():
+    """Root of the Parquet store (data/store under the project root, or $FINSTREET_STORE_DIR)."""
+    return os.environ.get("FINSTREET_STORE_DIR") or os.path.join(os.getcwd(), "data", "store")
+
+
+def table_dir(table, symbol=None):
+    """data/store/<table>[/symbol=<slug>] (kept here, stdlib only, so light entry points can locate files)."""
+    path = os.path.join(store_dir(), table)
+    return os.path.join(path, f"symbol={symbol_slug(symbol)}") if symbol else path
+
+
+def symbol_paths(symbol=DEFAULT_SYMBOL, base_dir=None):
+    """
+    All per-symbol file locations, relative to the project root (cwd by default).
+    Tabular data lives in the Parquet store (utils/store.py); the CSV paths are only the
+    legacy locations that `python utils/store.py --import-csv` migrates from.
+    """
+    base_dir = base_dir or os.getcwd()
+    slug = symbol_slug(symbol)
+    return {
+        "raw": os.path.join(base_dir, "data", "raw", f"{slug}_daily.csv"),
+        "features": os.path.join(base_dir, "data", "processed", f"{slug}_features.csv"),
+        "predictions": os.path.join(base_dir, "data", "processed", f"{slug}_predictions.csv"),
+        "order_book": os.path.join(base_dir, "data", "processed", f"{slug}_order_book.csv"),
+        "model": os.path.join(base_dir, "artifacts", f"{slug}_model.pkl"),
+        "fast_model": os.path.join(base_dir, "artifacts", f"{slug}_model.npz"),
+        "tuning": os.path.join(base_dir, "artifacts", f"{slug}_tuning.json"),
+        "chart": os.path.join(base_dir, "artifacts", f"{slug}_performance_chart.png"),
+        "backtest": os.path.join(base_dir, "artifacts", f"{slug}_backtest.pkl"),
+    }
@@ -0,0 +1,195 @@
+# strategy/live.py
+# Live mode: ticks -> bars -> incremental features -> model -> ATR sizing, on every closed bar.
+#
+# One asyncio task consumes a tick source (fyers/live_feed.py). Each symbol keeps its bar
+# builder, IncrementalFeatureEngine and IncrementalATR warmed up from the store, so a closed
+# bar costs a few O(1) updates plus one predict_proba call. The time from the tick that
+# closed a bar to the finished decision is recorded per decision (tick-to-decision latency).
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from features.bars import BarAggregator, bucket_starts
+from features.feature_engine import IncrementalFeatureEngine
+from model.fast_model import load_model
+from model.server import score
+from pipeline.universe import DEFAULT_SYMBOL
+from strategy.main import (ATR_METHOD, ATR_MULTIPLIER, ATR_PERIOD, CAPITAL, RISK_PER_TRADE, IncrementalATR,
+                           size_position)
+from utils.instrumentation import get_logger
+from utils.store import has_table, read_table, resolution_table
+
+log = get_logger("live")
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+RESOLUTION = "D"            # bar the model was trained on (daily: decide at the close for the next session)
+CLOCK_INTERVAL = 1.0        # seconds between bar-close checks on a live feed (bars with no later tick)
+
+
+class LiveSymbol:
+    """Everything one symbol needs to turn a closed bar into a decision."""
+
+    def __init__(self, symbol, model, resolution=RESOLUTION, capital=CAPITAL, risk_per_trade=RISK_PER_TRADE,
+                 atr_multiplier=ATR_MULTIPLIER, atr_period=ATR_PERIOD, atr_method=ATR_METHOD):
+        self.symbol = symbol
+        self.model = model
+        self.bars = BarAggregator(resolution, from_ticks=True)
+        self.features = IncrementalFeatureEngine()
+        self.atr = IncrementalATR(atr_period, atr_method)
+        self.sizing = (capital, risk_per_trade, atr_multiplier)
+
+    def warm_up(self, bars_df):
+        """Replays stored bars (of the live resolution) through the feature and ATR state."""
+        for high, low, close in zip(bars_df["high"].to_numpy(float), bars_df["low"].to_numpy(float),
+                                    bars_df["close"].to_numpy(float)):
+            self.features.update(high, low, close)
+            self.atr.update(high, low, close)
+
+    def on_bar(self, bar):
+        """Closed bar -> features -> signal -> ATR stop and quantity (same rules as execute_strategy)."""
+        self.features.update(bar["high"], bar["low"], bar["close"])
+        current_atr = self.atr.update(bar["high"], bar["low"], bar["close"])
+        result = score(self.model, [self.features.vector()])[0]
+
+        decision = {"symbol": self.symbol, "bar": bar["date"], "signal": result["signal"],
+                    "confidence": result["confidence"], "qty": 0, "stop_loss": 0.0, "approx_entry": 0.0}
+        if result["prediction"] == 1:
+            # Assumption for planning: Last Close ~ Next Open
+            stop_loss, qty = size_position(bar["close"], current_atr, *self.sizing)
+            decision.update(qty=qty, stop_loss=round(stop_loss, 2), approx_entry=bar["close"])
+        return decision
+
+
+class LatencyStats:
+    def __init__(self):
+        self.samples_ns = []
+
+    def add(self, ns):
+        self.samples_ns.append(ns)
+
+    def summary(self):
+        if not self.samples_ns:
+            return {"count": 0}
+        ms = np.array(self.samples_ns) / 1e6
+        return {"count": len(ms), "p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+                "p99_ms": float(np.percentile(ms, 99)), "max_ms": float(ms.max())}
+
+
+def load_live_symbols(symbols, resolution=RESOLUTION, warm_until=None, **sizing):
+    """
+    Loads each symbol's model and warms its state on the stored bars before the one `warm_until`
+    falls in (that bar is built again from the ticks, e.g. today's daily bar from 09:15 on).
+    """
+    if warm_until is not None:
+        warm_until = bucket_starts(np.array([warm_until], dtype="datetime64[ns]"), resolution)[0]
+    live = {}
+    for symbol in symbols:
+        state = LiveSymbol(symbol, load_model(symbol), resolution, **sizing)
+        table = resolution_table("ohlcv", resolution)
+        if has_table(table, symbol):
+            bars = read_table(table, symbol, columns=["high", "low", "close"], end=warm_until)
+            if warm_until is not None:
+                bars = bars[bars["date"] < warm_until]
+            state.warm_up(bars)
+        live[symbol] = state
+    return live
+
+
+async def run_live(source, live, on_decision=None, stats=None):
+    """
+    Consumes `source` until it ends (replay) or the task is cancelled (live feed).
+    on_decision(decision) is called for every closed bar (e.g. to route orders); it may be async.
+    Returns (decisions, LatencyStats).
+    """
+    stats = stats or LatencyStats()
+    decisions = []
+
+    async def decide(bar, symbol, started_ns):
+        decision = live[symbol].on_bar(bar)
+        decision["latency_ms"] = (time.perf_counter_ns() - started_ns) / 1e6
+        stats.add(time.perf_counter_ns() - started_ns)
+        decisions.append(decision)
+        if on_decision is not None:
+            result = on_decision(decision)
+            if asyncio.iscoroutine(result):
+                await result
+
+    async def close_due_bars(now, started_ns):
+        # Bars whose end has passed even though their symbol has not traded since
+        for symbol, state in live.items():
+            bar = state.bars.close_due(now)
+            if bar is not None:
+                await decide(bar, symbol, started_ns)
+
+    async def clock():
+        while True:
+            await asyncio.sleep(CLOCK_INTERVAL)
+            await close_due_bars(source.now(), time.perf_counter_ns())
+
+    clock_task = asyncio.create_task(clock()) if source.realtime else None
+    try:
+        async for tick in source:
+            state = live.get(tick["symbol"])
+            if state is None:
+                continue
+            await close_due_bars(tick["ts"], tick["recv_ns"])
+            bar = state.bars.update(tick["ts"], tick["ltp"], tick["ltp"], tick["ltp"], tick["ltp"], tick["qty"])
+            if bar is not None:
+                await decide(bar, tick["symbol"], tick["recv_ns"])
+        # End of a replay: the session's last bars close with the tape
+        for symbol, state in live.items():
+            if state.bars.partial is not None:
+                bar = state.bars.flush().iloc[0].to_dict()
+                await decide(bar, symbol, time.perf_counter_ns())
+    finally:
+        if clock_task:
+            clock_task.cancel()
+    return decisions, stats
+
+
+def log_decision(decision):
+    log.info(f"{decision['bar']} | {decision['symbol']:<14} | {decision['signal']:<4} ({decision['confidence']:.2f}) "
+             f"| qty {decision['qty']:<5} | SL {decision['stop_loss']:<8.2f} | {decision['latency_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    from fyers.live_feed import FyersTickSource, ReplaySource, ticks_from_bars
+
+    parser = argparse.ArgumentParser(description="Live (or replayed) tick-to-decision loop")
+    parser.add_argument("--symbols", nargs="+", default=[DEFAULT_SYMBOL])
+    parser.add_argument("--resolution", default=RESOLUTION, help="Bar size the decisions are made on: D, 5, 15, 60")
+    parser.add_argument("--replay", help="Recorded tick file (.parquet / .csv with ts, symbol, ltp, qty)")
+    parser.add_argument("--replay-from", help="Replay ticks rebuilt from the stored 1-minute bars since YYYY-MM-DD")
+    parser.add_argument("--speed", type=float, default=0.0, help="Replay speed (0 = as fast as possible)")
+    parser.add_argument("--record", help="Live mode: save the tick tape here for later replay")
+    args = parser.parse_args()
+
+    if args.replay:
+        source = ReplaySource.from_file(args.replay, args.speed)
+    elif args.replay_from:
+        import pandas as pd
+        tapes = [ticks_from_bars(read_table("ohlcv_1m", s, start=args.replay_from), s) for s in args.symbols]
+        source = ReplaySource(pd.concat(tapes, ignore_index=True), args.speed)
+    else:
+        from fyers.fyers_fetch_rites import get_access_token
+        source = FyersTickSource(get_access_token(), args.symbols, args.record)
+
+    warm_until = source.ticks["ts"].min() if isinstance(source, ReplaySource) else None
+    live = load_live_symbols(args.symbols, args.resolution, warm_until)
+    log.info(f"⚡ Live mode: {len(live)} symbols on {args.resolution} bars")
+    try:
+        decisions, stats = asyncio.run(run_live(source, live, on_decision=log_decision))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+    s = stats.summary()
+    if s["count"]:
+        log.info(f"⏱️ Tick-to-decision over {s['count']} bars: p50 {s['p50_ms']:.2f} ms | p95 {s['p95_ms']:.2f} ms "
+                 f"| p99 {s['p99_ms']:.2f} ms | max {s['max_ms']:.2f} ms")
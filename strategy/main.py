@@ -1,8 +1,17 @@
-# main.py (Updated to Save CSV)
+# main.py
 
 import pandas as pd
 import numpy as np
 import os
+from collections import deque
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import DEFAULT_SYMBOL
+from utils.instrumentation import get_logger, instrument_stage
+from utils.store import has_table, read_table, write_table
+
+log = get_logger("strategy")
 
 # =========================
 # 🔹 CONFIGURATION
@@ -10,80 +19,152 @@ import os
 CAPITAL = 100000            
 RISK_PER_TRADE = 0.02       
 ATR_MULTIPLIER = 1.5        
+ATR_PERIOD = 14
+ATR_METHOD = "sma"          # sma, wilder or ema (see atr_values)
+
+def true_range(high, low, close):
+    """max(high - low, |high - prev close|, |low - prev close|); just high - low on the first bar."""
+    high, low, close = (np.asarray(x, dtype=float) for x in (high, low, close))
+    prev_close = np.r_[np.nan, close[:-1]]
+    return np.fmax(np.abs(high - low), np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def atr_values(high, low, close, period=ATR_PERIOD, method=ATR_METHOD):
+    """
+    ATR as an array (0 until `period` bars exist).
+      sma    - simple moving average of the true range
+      wilder - Wilder's smoothing (alpha = 1 / period), seeded with the first SMA
+      ema    - exponential moving average (alpha = 2 / (period + 1)), seeded with the first SMA
+    """
+    tr = pd.Series(true_range(high, low, close))
+    sma = tr.rolling(window=period).mean()
+    if method == "sma":
+        atr = sma
+    elif method in ("wilder", "ema"):
+        alpha = 1 / period if method == "wilder" else 2 / (period + 1)
+        seeded = tr.copy()
+        seeded.iloc[:period - 1] = np.nan
+        if len(seeded) >= period:
+            seeded.iloc[period - 1] = sma.iloc[period - 1]
+        atr = seeded.ewm(alpha=alpha, adjust=False, ignore_na=True).mean()
+    else:
+        raise ValueError(f"Unknown ATR method '{method}' (use sma, wilder or ema)")
+    return atr.fillna(0).to_numpy()
+
+def calculate_atr(df, period=ATR_PERIOD, method=ATR_METHOD):
+    """Returns a copy of df with an 'atr' column (the input frame is left untouched)."""
+    return df.assign(atr=atr_values(df["high"], df["low"], df["close"], period, method))
+
+class IncrementalATR:
+    """
+    Same ATR as calculate_atr, one bar at a time (live bars of any resolution).
+    The period is in bars of that resolution: 14 on 5-minute bars is a 70-minute ATR.
+    """
+
+    def __init__(self, period=ATR_PERIOD, method=ATR_METHOD):
+        self.period = period
+        self.method = method
+        self.alpha = 1 / period if method == "wilder" else 2 / (period + 1)
+        self.true_ranges = deque(maxlen=period)
+        self.prev_close = None
+        self.n_bars = 0
+        self.value = 0.0
+
+    def update(self, high, low, close):
+        tr = abs(high - low)
+        if self.prev_close is not None:
+            tr = max(tr, abs(high - self.prev_close), abs(low - self.prev_close))
+        self.prev_close = close
+        self.true_ranges.append(tr)
+        self.n_bars += 1
+        if self.n_bars < self.period:
+            # 0 until a full window exists, like the fillna(0) above
+            self.value = 0.0
+        elif self.method == "sma" or self.n_bars == self.period:
+            self.value = sum(self.true_ranges) / self.period
+        else:
+            self.value = (1 - self.alpha) * self.value + self.alpha * tr
+        return self.value
+
+def size_position(entry_price, current_atr, capital=CAPITAL, risk_per_trade=RISK_PER_TRADE, atr_multiplier=ATR_MULTIPLIER):
+    """ATR stop and risk-based quantity for one BUY. Returns (stop_loss, quantity)."""
+    stop_loss = entry_price - (current_atr * atr_multiplier)
+    risk_per_share = entry_price - stop_loss
+    
+    quantity = 0
+    if risk_per_share > 0:
+        total_risk_amount = capital * risk_per_trade
+        quantity = int(total_risk_amount / risk_per_share)
+        
+        # Cap quantity at Max Cash
+        quantity = min(quantity, int(capital / entry_price))
+    return stop_loss, quantity
+
+def size_positions(entry_price, current_atr, capital=CAPITAL, risk_per_trade=RISK_PER_TRADE, atr_multiplier=ATR_MULTIPLIER):
+    """size_position for arrays of entries and ATRs. Returns (stop_loss, quantity) arrays."""
+    entry_price = np.asarray(entry_price, dtype=float)
+    stop_loss = entry_price - (np.asarray(current_atr, dtype=float) * atr_multiplier)
+    risk_per_share = entry_price - stop_loss
+
+    valid = risk_per_share > 0
+    total_risk_amount = capital * risk_per_trade
+    with np.errstate(divide="ignore", invalid="ignore"):
+        quantity = np.trunc(total_risk_amount / risk_per_share)
+        # Cap quantity at Max Cash
+        quantity = np.minimum(quantity, np.trunc(capital / entry_price))
+    return stop_loss, np.where(valid, quantity, 0).astype("int64")
+
+def build_order_book(preds_df, raw_df, capital=CAPITAL, risk_per_trade=RISK_PER_TRADE,
+                     atr_multiplier=ATR_MULTIPLIER, min_confidence=0.0):
+    """
+    Turns predictions into an order book. raw_df must already have an 'atr' column
+    (see calculate_atr). A prediction of 1 only becomes a BUY if its confidence >= min_confidence.
+
+    The ATR and close of the last bar strictly BEFORE each trade date are found for all dates
+    at once with searchsorted; dates with no earlier bar get no order.
+    """
+    bar_dates = raw_df["date"].to_numpy()
+    trade_dates = preds_df["date"].to_numpy()
+    pos = np.searchsorted(bar_dates, trade_dates, side="left") - 1
+    has_past = pos >= 0
+    pos = pos[has_past]
+
+    signal = preds_df["prediction"].to_numpy()[has_past] == 1
+    if "confidence" in preds_df.columns:
+        signal &= ~(preds_df["confidence"].to_numpy()[has_past] < min_confidence)
 
-BASE_DIR = os.getcwd()
-PREDICTIONS_PATH = os.path.join(BASE_DIR, "data", "processed", "jan_predictions.csv")
-RAW_DATA_PATH = os.path.join(BASE_DIR, "data", "raw", "rites_daily.csv")
-ORDER_BOOK_PATH = os.path.join(BASE_DIR, "data", "processed", "final_order_book.csv")
-
-def calculate_atr(df, period=14):
-    df['tr0'] = abs(df["high"] - df["low"])
-    df['tr1'] = abs(df["high"] - df["close"].shift())
-    df['tr2'] = abs(df["low"] - df["close"].shift())
-    df['tr'] = df[['tr0', 'tr1', 'tr2']].max(axis=1)
-    df['atr'] = df['tr'].rolling(window=period).mean().fillna(0)
-    return df
-
-def execute_strategy():
-    print("⚙️  Calculating Strategy Rules...")
+    current_atr = raw_df["atr"].to_numpy(float)[pos]
+    entry_price = raw_df["close"].to_numpy(float)[pos]   # Assumption for planning: Last Close ~ Next Open
+    stop_loss, quantity = size_positions(entry_price, current_atr, capital, risk_per_trade, atr_multiplier)
+
+    return pd.DataFrame({
+        "date": pd.to_datetime(trade_dates[has_past]).normalize(),
+        "signal": np.where(signal, "BUY", "WAIT"),
+        "qty": np.where(signal, quantity, 0),
+        "stop_loss": np.where(signal, np.round(stop_loss, 2), 0.0),
+        "approx_entry": np.where(signal, entry_price, 0.0),
+    })
+
+@instrument_stage("strategy")
+def execute_strategy(symbol=DEFAULT_SYMBOL):
+    log.info("⚙️  Calculating Strategy Rules...")
     
-    if not os.path.exists(PREDICTIONS_PATH):
-        print("❌ Error: Run predict.py first.")
+    if not has_table("predictions", symbol):
+        log.error("❌ Error: Run predict.py first.")
         return
 
-    preds_df = pd.read_csv(PREDICTIONS_PATH)
-    preds_df["date"] = pd.to_datetime(preds_df["date"])
+    preds_df = read_table("predictions", symbol)
 
-    raw_df = pd.read_csv(RAW_DATA_PATH)
-    raw_df["date"] = pd.to_datetime(raw_df["date"])
-    raw_df = calculate_atr(raw_df)
+    # Nothing after the last trade date is ever needed
+    raw_df = read_table("ohlcv", symbol, columns=["high", "low", "close"], end=preds_df["date"].max())
+    raw_df = calculate_atr(raw_df, ATR_PERIOD, ATR_METHOD)
 
-    order_book = []
+    order_df = build_order_book(preds_df, raw_df)
 
-    for i, row in preds_df.iterrows():
-        trade_date = row["date"]
-        signal = row["prediction"]
-        
-        # Get data strictly BEFORE trade date to calculate ATR
-        past_data = raw_df[raw_df["date"] < trade_date]
-        if past_data.empty: continue
-            
-        current_atr = past_data.iloc[-1]["atr"]
-        entry_price = past_data.iloc[-1]["close"] # Assumption for planning: Last Close ~ Next Open
-        
-        if signal == 1: # BUY
-            stop_loss = entry_price - (current_atr * ATR_MULTIPLIER)
-            risk_per_share = entry_price - stop_loss
-            
-            quantity = 0
-            if risk_per_share > 0:
-                total_risk_amount = CAPITAL * RISK_PER_TRADE
-                quantity = int(total_risk_amount / risk_per_share)
-                
-                # Cap quantity at Max Cash
-                quantity = min(quantity, int(CAPITAL / entry_price))
-
-            order_book.append({
-                "date": trade_date.date(),
-                "signal": "BUY",
-                "qty": quantity,
-                "stop_loss": round(stop_loss, 2),
-                "approx_entry": entry_price
-            })
-        else:
-            order_book.append({
-                "date": trade_date.date(),
-                "signal": "WAIT",
-                "qty": 0,
-                "stop_loss": 0,
-                "approx_entry": 0
-            })
-
-    # SAVE TO CSV
-    order_df = pd.DataFrame(order_book)
-    order_df.to_csv(ORDER_BOOK_PATH, index=False)
-    print(f"✅ Final Order Book saved to: {ORDER_BOOK_PATH}")
+    # SAVE TO STORE
+    write_table("order_book", symbol, order_df)
+    log.info(f"✅ Final Order Book saved to the store for {symbol}")
     print(order_df.head(8))
+    return order_df
 
 if __name__ == "__main__":
     execute_strategy()
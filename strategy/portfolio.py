@@ -0,0 +1,171 @@
+# strategy/portfolio.py
+# Portfolio-level allocation: one pool of capital shared by every symbol's signal on a day.
+#
+# main.py sizes each symbol as if it owned the whole CAPITAL. Here all BUY candidates of all
+# days are allocated together: weights come from the model's confidence (or inverse volatility),
+# then a few vectorized water-filling passes enforce the per-name, per-sector and gross caps and
+# hand the room freed by capped names to the ones still below their caps. Every pass is a
+# handful of array operations over ALL (day, symbol) rows at once, so a few hundred candidates
+# per day over years of days allocate in milliseconds.
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import load_universe
+from strategy.main import (ATR_METHOD, ATR_MULTIPLIER, ATR_PERIOD, CAPITAL, RISK_PER_TRADE, calculate_atr,
+                           size_positions)
+from utils.instrumentation import get_logger, instrument_stage
+from utils.store import has_table, read_table, write_table
+
+log = get_logger("portfolio")
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+MAX_WEIGHT = 0.25           # max share of capital in one name
+MAX_SECTOR_WEIGHT = 0.50    # max share of capital in one sector
+MAX_GROSS = 1.0             # total exposure (1.0 = fully invested, no leverage)
+METHODS = ("confidence", "vol_parity")
+MAX_ITERATIONS = 20
+
+BOOK_COLS = ["date", "signal", "qty", "stop_loss", "approx_entry"]
+
+
+def candidate_scores(candidates, method):
+    """Raw allocation score per row: edge over a coin flip, or inverse ATR % (volatility parity)."""
+    if method == "confidence":
+        return np.clip(candidates["confidence"].to_numpy(float) - 0.5, 0.0, None)
+    if method == "vol_parity":
+        atr_pct = candidates["atr"].to_numpy(float) / candidates["entry_price"].to_numpy(float)
+        with np.errstate(divide="ignore"):
+            return np.where(atr_pct > 0, 1.0 / atr_pct, 0.0)
+    raise ValueError(f"Unknown method '{method}' (use {' or '.join(METHODS)})")
+
+
+def allocate(candidates, capital=CAPITAL, method="confidence", max_weight=MAX_WEIGHT,
+             max_sector_weight=MAX_SECTOR_WEIGHT, max_gross=MAX_GROSS, risk_per_trade=RISK_PER_TRADE,
+             atr_multiplier=ATR_MULTIPLIER, min_confidence=0.0, iterations=MAX_ITERATIONS):
+    """
+    candidates: one row per (date, symbol) with sector, prediction, confidence, entry_price, atr.
+    Returns a copy with weight, qty, stop_loss, approx_entry and signal (BUY only if qty > 0).
+
+    Besides the weight caps, no name may risk more than risk_per_trade of capital at its ATR stop
+    (the same rule as size_position), so its weight is also capped at that quantity's notional.
+    """
+    df = candidates.reset_index(drop=True)
+    price = df["entry_price"].to_numpy(float)
+    atr = df["atr"].to_numpy(float)
+
+    is_buy = (df["prediction"].to_numpy() == 1) & (atr > 0)
+    if "confidence" in df.columns:
+        is_buy &= ~(df["confidence"].to_numpy(float) < min_confidence)
+    score = np.where(is_buy, candidate_scores(df, method), 0.0)
+
+    stop_loss, risk_qty = size_positions(price, atr, capital, risk_per_trade, atr_multiplier)
+    cap = np.minimum(max_weight, risk_qty * price / capital)
+    active = score > 0
+
+    day = pd.factorize(df["date"])[0]
+    group = pd.factorize(pd.MultiIndex.from_arrays([day, df["sector"].to_numpy()]))[0]
+    n_days, n_groups = day.max() + 1 if len(df) else 0, group.max() + 1 if len(df) else 0
+
+    w = np.zeros(len(df))
+    sector_full = np.zeros(n_groups, dtype=bool)
+    for _ in range(iterations):
+        # Room left under the gross cap, shared by names not yet at a cap, in proportion to their score
+        free = active & (w < cap - 1e-12) & ~sector_full[group]
+        room = np.maximum(max_gross - np.bincount(day, w, n_days), 0.0)
+        free_score = np.bincount(day, np.where(free, score, 0.0), n_days)
+        if not np.any(free & (room[day] > 1e-9)):
+            break
+        with np.errstate(divide="ignore", invalid="ignore"):
+            add = np.where(free, room[day] * score / free_score[day], 0.0)
+        w = np.minimum(w + np.nan_to_num(add), cap)
+
+        # Sector cap: scale the whole sector back, and stop feeding it
+        sector_total = np.bincount(group, w, n_groups)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = np.where(sector_total > max_sector_weight, max_sector_weight / sector_total, 1.0)
+        w *= scale[group]
+        sector_full = sector_total * scale >= max_sector_weight - 1e-12
+
+    qty = np.floor(w * capital / price + 1e-9).astype("int64")
+    qty = np.where(active, qty, 0)
+    buy = qty > 0
+    return df.assign(
+        weight=np.where(buy, qty * price / capital, 0.0),
+        signal=np.where(buy, "BUY", "WAIT"),
+        qty=qty,
+        stop_loss=np.where(buy, np.round(stop_loss, 2), 0.0),
+        approx_entry=np.where(buy, price, 0.0),
+    )
+
+
+def load_candidates(symbols, atr_period=ATR_PERIOD, atr_method=ATR_METHOD):
+    """Every symbol's predictions joined with the ATR and close of the bar before each trade date."""
+    sectors = {row["symbol"]: row["sector"] for row in load_universe()}
+    frames = []
+    for symbol in symbols:
+        if not has_table("predictions", symbol) or not has_table("ohlcv", symbol):
+            log.warning(f"⚠️ {symbol}: no predictions / bars in the store, skipped")
+            continue
+        preds = read_table("predictions", symbol)
+        raw = calculate_atr(read_table("ohlcv", symbol, columns=["high", "low", "close"], end=preds["date"].max()),
+                            atr_period, atr_method)
+        # Last bar strictly BEFORE each trade date, like build_order_book
+        pos = np.searchsorted(raw["date"].to_numpy(), preds["date"].to_numpy(), side="left") - 1
+        preds, pos = preds[pos >= 0], pos[pos >= 0]
+        frames.append(pd.DataFrame({
+            "date": preds["date"].to_numpy(), "symbol": symbol, "sector": sectors.get(symbol, "Unknown"),
+            "prediction": preds["prediction"].to_numpy(),
+            "confidence": preds["confidence"].to_numpy() if "confidence" in preds.columns else 1.0,
+            "entry_price": raw["close"].to_numpy(float)[pos], "atr": raw["atr"].to_numpy(float)[pos],
+        }))
+    if not frames:
+        return pd.DataFrame(columns=["date", "symbol", "sector", "prediction", "confidence", "entry_price", "atr"])
+    return pd.concat(frames, ignore_index=True).sort_values(["date", "symbol"], kind="stable").reset_index(drop=True)
+
+
+@instrument_stage("portfolio")
+def build_portfolio_book(symbols=None, method="confidence", capital=CAPITAL, save=True, **caps):
+    """Allocates shared capital across the universe and writes each symbol's order book."""
+    symbols = symbols or [row["symbol"] for row in load_universe()]
+    candidates = load_candidates(symbols)
+    if candidates.empty:
+        log.error("❌ Error: no predictions to allocate. Run predict.py (or the universe driver) first.")
+        return None
+
+    started = time.perf_counter()
+    book = allocate(candidates, capital, method, **caps)
+    elapsed = time.perf_counter() - started
+
+    if save:
+        # Same order_book table as main.py: backtests and orders.py read it unchanged
+        for symbol, rows in book.groupby("symbol", sort=False):
+            write_table("order_book", symbol, rows[BOOK_COLS])
+
+    gross = book.groupby("date")["weight"].sum()
+    log.info(f"✅ Allocated {len(book)} candidates over {book['date'].nunique()} days ({method}) in {elapsed * 1000:.1f} ms")
+    log.info(f"   {int((book['signal'] == 'BUY').sum())} BUY orders | avg gross {gross.mean():.1%} | max gross {gross.max():.1%}")
+    return book
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Allocate shared capital across the universe's signals")
+    parser.add_argument("--symbols", nargs="+", help="Default: every symbol in config/universe.csv")
+    parser.add_argument("--method", choices=METHODS, default="confidence")
+    parser.add_argument("--capital", type=float, default=CAPITAL)
+    parser.add_argument("--max-weight", type=float, default=MAX_WEIGHT)
+    parser.add_argument("--max-sector-weight", type=float, default=MAX_SECTOR_WEIGHT)
+    parser.add_argument("--max-gross", type=float, default=MAX_GROSS)
+    parser.add_argument("--min-confidence", type=float, default=0.0)
+    args = parser.parse_args()
+
+    build_portfolio_book(args.symbols, args.method, args.capital, max_weight=args.max_weight,
+                         max_sector_weight=args.max_sector_weight, max_gross=args.max_gross,
+                         min_confidence=args.min_confidence)
@@ -0,0 +1,142 @@
+# utils/cache.py
+# Content-addressed artifact cache for pipeline stages.
+#
+# A stage's key is the hash of everything that determines its output: the exact input rows,
+# the source of the feature definitions, FEATURE_COLS, hyperparameters, cutoff dates...
+# If nothing changed, the stage loads the stored artifact instead of recomputing it.
+# The manifest records what every artifact was built from (e.g. which rows a model saw),
+# and the cache is size-bounded with least-recently-used eviction.
+import fcntl
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+MAX_CACHE_BYTES = 2 * 1024**3   # 2 GB
+MANIFEST_NAME = "manifest.json"
+
+
+def cache_dir():
+    return os.environ.get("FINSTREET_CACHE_DIR") or os.path.join(os.getcwd(), "artifacts", "cache")
+
+
+def hash_frame(df):
+    """Fingerprint of a DataFrame's values, column names and order (not of how it was loaded)."""
+    h = hashlib.sha256()
+    h.update(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def hash_source(*objects):
+    """Fingerprint of the source code of modules / functions (changes when the code does)."""
+    h = hashlib.sha256()
+    for obj in objects:
+        h.update(inspect.getsource(obj).encode())
+    return h.hexdigest()
+
+
+def make_key(stage, **inputs):
+    payload = json.dumps({"stage": stage, **inputs}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, root=None, max_bytes=MAX_CACHE_BYTES):
+        self.root = root or cache_dir()
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+        self.manifest_path = os.path.join(self.root, MANIFEST_NAME)
+
+    @contextmanager
+    def _locked_manifest(self):
+        """Exclusive access to the manifest across processes (the universe driver runs many)."""
+        with open(self.manifest_path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                manifest = {}
+                if os.path.exists(self.manifest_path):
+                    with open(self.manifest_path) as f:
+                        manifest = json.load(f)
+                yield manifest
+                tmp = self.manifest_path + ".tmp"
+                with open(tmp, "w") as f:
+                    json.dump(manifest, f, indent=1, sort_keys=True, default=str)
+                os.replace(tmp, self.manifest_path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def get(self, key):
+        """Path of the cached artifact, or None on a miss. Marks the entry as recently used."""
+        with self._locked_manifest() as manifest:
+            entry = manifest.get(key)
+            if entry is None:
+                return None
+            path = os.path.join(self.root, entry["file"])
+            if not os.path.exists(path):
+                del manifest[key]
+                return None
+            entry["last_used"] = time.time()
+            entry["hits"] = entry.get("hits", 0) + 1
+            return path
+
+    def put(self, key, src_path, stage, symbol=None, inputs=None):
+        """Copies an artifact into the cache and records its provenance. Returns the cached path."""
+        ext = os.path.splitext(src_path)[1]
+        file_name = f"{key}{ext}"
+        dst = os.path.join(self.root, file_name)
+        shutil.copyfile(src_path, dst + ".tmp")
+        os.replace(dst + ".tmp", dst)
+
+        with self._locked_manifest() as manifest:
+            now = time.time()
+            manifest[key] = {
+                "stage": stage, "symbol": symbol, "file": file_name, "size": os.path.getsize(dst),
+                "created": now, "last_used": now, "hits": 0, "inputs": inputs or {},
+            }
+            self._evict(manifest, keep=key)
+        return dst
+
+    def _evict(self, manifest, keep=None):
+        """Drops least-recently-used entries until the cache fits in max_bytes."""
+        total = sum(e["size"] for e in manifest.values())
+        for key in sorted(manifest, key=lambda k: manifest[k]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            entry = manifest.pop(key)
+            total -= entry["size"]
+            try:
+                os.remove(os.path.join(self.root, entry["file"]))
+            except FileNotFoundError:
+                pass
+
+    def entries(self, stage=None, symbol=None):
+        """Manifest rows (newest first), e.g. to see which data a model was trained on."""
+        with self._locked_manifest() as manifest:
+            rows = [{"key": k, **v} for k, v in manifest.items()
+                    if (stage is None or v["stage"] == stage) and (symbol is None or v["symbol"] == symbol)]
+        return sorted(rows, key=lambda r: r["created"], reverse=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect the artifact cache")
+    parser.add_argument("--stage")
+    parser.add_argument("--symbol")
+    args = parser.parse_args()
+
+    for row in ArtifactCache().entries(args.stage, args.symbol):
+        created = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["created"]))
+        print(f"{created} | {row['stage']:<9} | {row['symbol'] or '-':<14} | {row['size'] / 1024:8.1f} KB "
+              f"| hits {row['hits']:<3} | {row['key'][:12]} | {json.dumps(row['inputs'])}")
@@ -0,0 +1,322 @@
+# utils/instrumentation.py
+# Lightweight, structured instrumentation for the pipeline stages.
+#
+# Every stage function is wrapped with @instrument_stage("name"): wall / CPU time, rows out,
+# status, memory and the broker API calls made during the stage are recorded as ONE JSON line
+# per stage run (artifacts/metrics.jsonl), and optionally as a Prometheus text file for the
+# node-exporter textfile collector. Costs a few microseconds per stage; nothing is sampled.
+#
+#   FINSTREET_METRICS=path.jsonl     JSON-lines output (default artifacts/metrics.jsonl, "" disables)
+#   FINSTREET_PROM=path.prom         also write Prometheus metrics ("{pid}" in the path -> per process)
+#   FINSTREET_PROFILE=predict        cProfile that stage: artifacts/profiles/<stage>_<symbol>_<time>.prof
+#   FINSTREET_TRACE_MEMORY=1         exact Python peak memory per stage via tracemalloc (slower)
+#   FINSTREET_LOG_LEVEL=WARNING      stage diagnostics (get_logger, INFO by default) -> warnings / errors only
+#   FINSTREET_LOG_FORMAT="%(asctime)s %(name)s %(message)s"   timestamps for production logs
+#
+#   python utils/instrumentation.py              # last run of every stage vs its recent median
+import contextlib
+import functools
+import inspect
+import io
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+DEFAULT_METRICS_PATH = os.path.join("artifacts", "metrics.jsonl")
+PROFILE_DIR = os.path.join("artifacts", "profiles")
+PROFILE_TOP = 25            # functions shown in the profile summary
+SLOWDOWN_ALERT = 1.5        # summary flags a stage whose last run is 1.5x its recent median
+HISTORY_RUNS = 20
+LOG_FORMAT = "%(message)s"  # the bare message: interactive runs read as before
+
+
+class _Registry:
+    """Process-wide metrics: stage results and API call latencies (thread-safe)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.api_calls = []         # (endpoint, seconds, ok)
+        self.counters = {}          # (name, labels) -> value
+        self.stages = {}            # (stage, symbol) -> last record
+
+    def add_api_call(self, endpoint, seconds, ok):
+        with self.lock:
+            self.api_calls.append((endpoint, seconds, ok))
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+
+REGISTRY = _Registry()
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """Writes to the CURRENT sys.stdout, so contextlib.redirect_stdout (bench/) still captures it."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+def get_logger(name):
+    """Logger of a stage's diagnostics ("finstreet.<name>"), INFO and up to stdout unless configured."""
+    root = logging.getLogger("finstreet")
+    if not root.handlers:
+        handler = _StdoutHandler()
+        handler.setFormatter(logging.Formatter(os.environ.get("FINSTREET_LOG_FORMAT", LOG_FORMAT)))
+        root.addHandler(handler)
+        root.setLevel(os.environ.get("FINSTREET_LOG_LEVEL", "INFO").upper())
+        root.propagate = False
+    return root.getChild(name)
+
+
+def count(name, value=1, **labels):
+    """Increments a counter, e.g. count("cache_hits", stage="features")."""
+    REGISTRY.count(name, value, **labels)
+
+
+def record_api_call(endpoint, seconds, ok=True):
+    REGISTRY.add_api_call(endpoint, seconds, ok)
+
+
+@contextlib.contextmanager
+def api_timer(endpoint):
+    """Times one broker call. Set `call["ok"] = False` for an error response (exceptions count as errors)."""
+    call = {"ok": True}
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call["ok"] = False
+        raise
+    finally:
+        record_api_call(endpoint, time.perf_counter() - started, call["ok"])
+
+
+def api_summary(calls):
+    """{endpoint: calls, errors, p50 / p95 / max latency in ms}"""
+    out = {}
+    for endpoint in sorted({c[0] for c in calls}):
+        ms = sorted(c[1] * 1000 for c in calls if c[0] == endpoint)
+        out[endpoint] = {
+            "calls": len(ms), "errors": sum(1 for c in calls if c[0] == endpoint and not c[2]),
+            "p50_ms": round(ms[len(ms) // 2], 3), "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+            "max_ms": round(ms[-1], 3),
+        }
+    return out
+
+
+def _rss_mb():
+    """Current resident set size (Linux), else the process high-water mark."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024**2
+    except (OSError, ValueError):
+        return _max_rss_mb()
+
+
+def _max_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+class StageRecord:
+    def __init__(self, stage, symbol=None, **labels):
+        self.data = {"stage": stage, "symbol": symbol, **labels, "status": "ok", "rows": None}
+
+    def output(self, result):
+        """Stages return None on failure and usually a DataFrame of what they produced (or a row count)."""
+        if result is None:
+            self.data["status"] = "failed"
+        elif hasattr(result, "columns") and hasattr(result, "__len__"):
+            # A DataFrame (duck-typed: the order path never imports pandas)
+            self.data["rows"] = len(result)
+        elif isinstance(result, int) and not isinstance(result, bool):
+            self.data["rows"] = result
+
+    def set(self, **values):
+        self.data.update(values)
+
+
+@contextlib.contextmanager
+def stage_timer(stage, symbol=None, **labels):
+    record = StageRecord(stage, symbol, **labels)
+    profiler = None
+    if os.environ.get("FINSTREET_PROFILE") in (stage, "all"):
+        import cProfile
+        profiler = cProfile.Profile()
+    trace = os.environ.get("FINSTREET_TRACE_MEMORY") == "1" and not tracemalloc.is_tracing()
+    if trace:
+        tracemalloc.start()
+    first_call = len(REGISTRY.api_calls)
+    started, cpu_started = time.perf_counter(), time.process_time()
+    if profiler:
+        profiler.enable()
+    try:
+        yield record
+    except Exception as e:
+        record.set(status="error", error=f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        record.set(ts=time.strftime("%Y-%m-%dT%H:%M:%S"), pid=os.getpid(),
+                   seconds=round(time.perf_counter() - started, 6),
+                   cpu_seconds=round(time.process_time() - cpu_started, 6),
+                   rss_mb=round(_rss_mb(), 1), max_rss_mb=round(_max_rss_mb(), 1))
+        if trace:
+            record.set(peak_traced_mb=round(tracemalloc.get_traced_memory()[1] / 1024**2, 2))
+            tracemalloc.stop()
+        calls = REGISTRY.api_calls[first_call:]
+        if calls:
+            record.set(api=api_summary(calls))
+        if profiler:
+            record.set(profile=_save_profile(profiler, stage, symbol))
+        _emit(record.data)
+
+
+def instrument_stage(stage):
+    """Decorator for a stage function; its `symbol` argument (default included) labels the record."""
+    def wrapper(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def inner(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            symbol = bound.arguments.get("symbol")
+            with stage_timer(stage, symbol) as record:
+                result = func(*args, **kwargs)
+                record.output(result)
+            return result
+        return inner
+    return wrapper
+
+
+def _save_profile(profiler, stage, symbol):
+    import pstats
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = f"{stage}_{(symbol or 'all').split(':')[-1].lower()}_{time.strftime('%Y%m%d_%H%M%S')}"
+    path = os.path.join(PROFILE_DIR, f"{name}.prof")
+    profiler.dump_stats(path)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(PROFILE_TOP)
+    with open(os.path.join(PROFILE_DIR, f"{name}.txt"), "w") as f:
+        f.write(text.getvalue())
+    get_logger("profile").info(f"🔬 Profile of {stage} saved to {path} (top {PROFILE_TOP} in {name}.txt)")
+    return path
+
+
+def _emit(data):
+    with REGISTRY.lock:
+        REGISTRY.stages[(data["stage"], data["symbol"])] = data
+    path = os.environ.get("FINSTREET_METRICS", DEFAULT_METRICS_PATH)
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # One short write per line in append mode: safe with several worker processes
+        with open(path, "a") as f:
+            f.write(json.dumps(data, default=str) + "\n")
+    prom_path = os.environ.get("FINSTREET_PROM")
+    if prom_path:
+        write_prometheus(prom_path.replace("{pid}", str(os.getpid())))
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items() if v is not None) + "}"
+
+
+def write_prometheus(path):
+    """Prometheus text exposition of everything recorded in this process (written atomically)."""
+    with REGISTRY.lock:
+        stages = list(REGISTRY.stages.values())
+        calls = list(REGISTRY.api_calls)
+        counters = dict(REGISTRY.counters)
+
+    lines = ["# TYPE finstreet_stage_seconds gauge"]
+    for s in stages:
+        lines.append(f"finstreet_stage_seconds{_labels(stage=s['stage'], symbol=s['symbol'])} {s['seconds']}")
+    lines.append("# TYPE finstreet_stage_rows gauge")
+    for s in stages:
+        if s.get("rows") is not None:
+            lines.append(f"finstreet_stage_rows{_labels(stage=s['stage'], symbol=s['symbol'])} {s['rows']}")
+    lines.append("# TYPE finstreet_stage_ok gauge")
+    for s in stages:
+        lines.append(f"finstreet_stage_ok{_labels(stage=s['stage'], symbol=s['symbol'])} {int(s['status'] == 'ok')}")
+    if calls:
+        lines.append("# TYPE finstreet_api_call_seconds summary")
+    for endpoint, summary in api_summary(calls).items():
+        seconds = [c[1] for c in calls if c[0] == endpoint]
+        for q, key in (("0.5", "p50_ms"), ("0.95", "p95_ms")):
+            lines.append(f"finstreet_api_call_seconds{_labels(endpoint=endpoint, quantile=q)} {summary[key] / 1000}")
+        lines.append(f"finstreet_api_call_seconds_sum{_labels(endpoint=endpoint)} {sum(seconds)}")
+        lines.append(f"finstreet_api_call_seconds_count{_labels(endpoint=endpoint)} {len(seconds)}")
+        lines.append(f"finstreet_api_errors_total{_labels(endpoint=endpoint)} {summary['errors']}")
+    for (name, labels), value in sorted(counters.items()):
+        lines.append(f"finstreet_{name}{_labels(**dict(labels))} {value}")
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def load_metrics(path=None):
+    import pandas as pd
+
+    path = path or os.environ.get("FINSTREET_METRICS") or DEFAULT_METRICS_PATH
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_json(path, lines=True)
+
+
+def slow_stages(metrics, history=HISTORY_RUNS, alert=SLOWDOWN_ALERT):
+    """Last successful run of every (stage, symbol) vs the median of its previous `history` runs."""
+    import pandas as pd
+
+    rows = []
+    ok = metrics[metrics["status"] == "ok"]
+    for (stage, symbol), runs in ok.groupby(["stage", ok["symbol"].fillna("-")], sort=True):
+        last, previous = runs["seconds"].iloc[-1], runs["seconds"].iloc[-history - 1:-1]
+        median = statistics.median(previous) if len(previous) else None
+        rows.append({"stage": stage, "symbol": symbol, "last_s": last, "median_s": median, "runs": len(runs),
+                     "slow": bool(median and last > median * alert)})
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarize recorded stage metrics")
+    parser.add_argument("--path", help="JSON-lines file (default: $FINSTREET_METRICS or artifacts/metrics.jsonl)")
+    parser.add_argument("--stage", help="Only this stage")
+    args = parser.parse_args()
+
+    metrics = load_metrics(args.path)
+    if metrics.empty:
+        print("No metrics recorded yet.")
+        sys.exit(0)
+    if args.stage:
+        metrics = metrics[metrics["stage"] == args.stage]
+    summary = slow_stages(metrics)
+    print(summary.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+    flagged = summary[summary["slow"]]
+    for row in flagged.itertuples():
+        print(f"🚨 {row.stage} ({row.symbol}) took {row.last_s:.3f}s vs a median of {row.median_s:.3f}s")
+    sys.exit(1 if len(flagged) else 0)
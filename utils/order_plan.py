@@ -0,0 +1,54 @@
+# utils/order_plan.py
+# Stdlib-only copy of each symbol's order book, for the pre-open order path.
+#
+# Every write of the order_book table (utils/store.py) also writes
+#   data/store/order_plan/<slug>.json     {"2026-01-02": {"signal": "BUY", "qty": 162, "stop_loss": 230.91,
+#                                                          "approx_entry": 243.25}, ...}
+# so fyers/orders.py can read today's row with the json module alone: no pandas / pyarrow import,
+# which is most of a cron job's start-up time. (It lives outside data/store/order_book, which
+# must only hold Parquet files.)
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import symbol_slug, table_dir
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+PLAN_TABLE = "order_plan"
+PLAN_COLS = ("signal", "qty", "stop_loss")
+PRICE_COL = "approx_entry"  # expected entry price, for the live kill switch's exposure check (optional)
+
+
+def plan_path(symbol):
+    return os.path.join(table_dir(PLAN_TABLE), f"{symbol_slug(symbol)}.json")
+
+
+def has_plan(symbol):
+    return os.path.exists(plan_path(symbol))
+
+
+def write_plan(symbol, order_df):
+    """Writes the plan of one symbol's order book (a DataFrame with date + PLAN_COLS [+ PRICE_COL])."""
+    dates = order_df["date"].dt.strftime("%Y-%m-%d")
+    plan = {
+        date: {"signal": str(signal), "qty": int(qty), "stop_loss": float(stop_loss)}
+        for date, signal, qty, stop_loss in zip(dates, *(order_df[col] for col in PLAN_COLS))
+    }
+    if PRICE_COL in order_df.columns:
+        for date, price in zip(dates, order_df[PRICE_COL]):
+            plan[date][PRICE_COL] = float(price)
+    path = plan_path(symbol)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(plan, f)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+def read_plan(symbol, date):
+    """{"signal", "qty", "stop_loss"(, "approx_entry")} of one day, or None when the book has no row for it."""
+    with open(plan_path(symbol)) as f:
+        return json.load(f).get(date)
@@ -0,0 +1,317 @@
+# utils/store.py
+# Columnar data store: every stage reads and writes typed Parquet tables partitioned by
+# symbol and year, instead of writing a CSV that the next stage has to parse again.
+#
+#   data/store/<table>/symbol=<slug>/year=<YYYY>/part-0.parquet
+#
+# Reads are memory-mapped, only load the requested columns, and skip partitions / row groups
+# outside the requested date range. Dates are stored as timestamps, so nothing is re-parsed.
+import argparse
+import contextlib
+import glob
+import os
+import re
+import shutil
+import sys
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline.universe import store_dir, symbol_paths, symbol_slug, table_dir
+from utils.order_plan import write_plan
+
+# =========================
+# 🔹 CONFIGURATION
+# =========================
+# Column types per table. Unlisted columns (e.g. new features) keep their pandas dtype.
+TABLE_SCHEMAS = {
+    "ohlcv": {"date": "datetime64[ns]", "open": "float64", "high": "float64", "low": "float64",
+              "close": "float64", "volume": "int64"},
+    # Compact where it is exact: run counters and the 0/1 target (float features stay float64,
+    # the model's scaler would see different numbers in float32)
+    "features": {"date": "datetime64[ns]", "up_streak": "int16", "down_streak": "int16", "target": "int8"},
+    "predictions": {"date": "datetime64[ns]", "prediction": "int64", "confidence": "float64"},
+    "order_book": {"date": "datetime64[ns]", "signal": "string", "qty": "int64", "stop_loss": "float64",
+                   "approx_entry": "float64"},
+}
+
+# Legacy CSV locations (per symbol_paths) that --import-csv migrates into the store
+LEGACY_CSV_KEYS = {"ohlcv": "raw", "features": "features", "predictions": "predictions", "order_book": "order_book"}
+
+# Rows per batch when streaming a table with iter_table (~10 weeks of 1-minute bars)
+BATCH_ROWS = 375 * 50
+
+_MMAP_FS = pafs.LocalFileSystem(use_mmap=True)
+
+# {(table, slug): DataFrame} of the tables written in this process, while memory_cache() is active
+_MEMORY = None
+
+
+def has_table(table, symbol):
+    return bool(glob.glob(os.path.join(table_dir(table, symbol), "year=*", "*.parquet")))
+
+
+def resolution_table(table, resolution="D"):
+    """Table holding `table` at a bar resolution: daily bars in 'ohlcv', 5-minute bars in 'ohlcv_5m'."""
+    return table if str(resolution) in ("D", "1D") else f"{table}_{resolution}m"
+
+
+def _typed(table, df):
+    df = df.copy()
+    # 'ohlcv_5m' has the same schema as 'ohlcv'
+    for col, dtype in TABLE_SCHEMAS.get(re.sub(r"_\d+m$", "", table), {}).items():
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col]) if dtype.startswith("datetime") else df[col].astype(dtype)
+    # Partition columns live in the directory names, not in the files
+    return df.drop(columns=[c for c in ("symbol", "year") if c in df.columns])
+
+
+@contextlib.contextmanager
+def memory_cache():
+    """
+    Within the block, each symbol's table is decoded from Parquet at most once: later reads are
+    filtered in memory, and a table written by this process is read back as the written DataFrame.
+    Writes still go to disk. Used by pipeline/dag.py to hand one stage's output to the next.
+    Only for daily-sized tables (stream big intraday ones with iter_table).
+    """
+    global _MEMORY
+    outer = _MEMORY
+    _MEMORY = {} if outer is None else outer
+    try:
+        yield _MEMORY
+    finally:
+        _MEMORY = outer
+
+
+def _remember(table, symbol, df):
+    if _MEMORY is not None and symbol:
+        key = (table, symbol_slug(symbol))
+        if df is None:
+            _MEMORY.pop(key, None)
+        else:
+            _MEMORY[key] = df
+
+
+def _from_memory(table, symbol, columns, start, end):
+    df = _MEMORY[table, symbol_slug(symbol)]
+    if start is not None:
+        df = df[df["date"] >= pd.Timestamp(start)]
+    if end is not None:
+        df = df[df["date"] <= pd.Timestamp(end)]
+    if columns is not None:
+        df = df[["date"] + [c for c in columns if c != "date"]]
+    return df.reset_index(drop=True)
+
+
+def write_table(table, symbol, df, mode="overwrite"):
+    """
+    Writes one symbol's rows, one file per year.
+    mode="overwrite" replaces everything stored for the symbol; mode="append" merges into the
+    existing years (rows with an existing date are replaced) and leaves other years untouched.
+    """
+    df = _typed(table, df).sort_values("date").reset_index(drop=True)
+    base = table_dir(table, symbol)
+    if mode == "overwrite" and os.path.exists(base):
+        shutil.rmtree(base)
+
+    for year, part in df.groupby(df["date"].dt.year, sort=True):
+        year_dir = os.path.join(base, f"year={year}")
+        path = os.path.join(year_dir, "part-0.parquet")
+        if mode == "append" and os.path.exists(path):
+            existing = pq.read_table(path, memory_map=True).to_pandas()
+            part = pd.concat([existing, part], ignore_index=True)
+            part = part.drop_duplicates("date", keep="last").sort_values("date").reset_index(drop=True)
+        os.makedirs(year_dir, exist_ok=True)
+        # Write to a temp file and rename so a reader never sees a half-written partition
+        tmp_path = path + ".tmp"
+        pq.write_table(pa.Table.from_pandas(part, preserve_index=False), tmp_path)
+        os.replace(tmp_path, path)
+    # An appended table is only complete on disk
+    _remember(table, symbol, df if mode == "overwrite" else None)
+
+    if table == "order_book":
+        # JSON copy for the lean order path (fyers/orders.py reads it without pandas)
+        write_plan(symbol, df if mode == "overwrite" else read_table(table, symbol))
+    return len(df)
+
+
+def read_table(table, symbol=None, columns=None, start=None, end=None):
+    """
+    Reads a table as a DataFrame sorted by date.
+
+    symbol=None reads every symbol (with a 'symbol' column holding the slug).
+    columns projects to just those columns ('date' is always included).
+    start / end (inclusive) are pushed down to the year partitions and row-group statistics.
+    """
+    if _MEMORY is not None and symbol:
+        # Inside memory_cache(): decode the symbol's table once, then filter in memory
+        key = (table, symbol_slug(symbol))
+        if key not in _MEMORY:
+            _MEMORY[key] = _read_parquet(table, symbol)
+        return _from_memory(table, symbol, columns, start, end)
+    return _read_parquet(table, symbol, columns, start, end)
+
+
+def _read_parquet(table, symbol=None, columns=None, start=None, end=None):
+    base = table_dir(table, symbol)
+    if not os.path.exists(base):
+        raise FileNotFoundError(f"No '{table}' data in the store at {base}")
+
+    dataset = ds.dataset(base, format="parquet", partitioning="hive", filesystem=_MMAP_FS)
+
+    expr = None
+    if start is not None:
+        start = pd.Timestamp(start)
+        expr = (ds.field("year") >= start.year) & (ds.field("date") >= pa.scalar(start, pa.timestamp("ns")))
+    if end is not None:
+        end = pd.Timestamp(end)
+        end_expr = (ds.field("year") <= end.year) & (ds.field("date") <= pa.scalar(end, pa.timestamp("ns")))
+        expr = end_expr if expr is None else expr & end_expr
+
+    if columns is not None:
+        columns = ["date"] + [c for c in columns if c != "date"]
+        if symbol is None and "symbol" not in columns:
+            columns.append("symbol")
+    elif symbol is not None:
+        columns = [name for name in dataset.schema.names if name not in ("symbol", "year")]
+    else:
+        columns = [name for name in dataset.schema.names if name != "year"]
+
+    arrow_table = dataset.to_table(columns=columns, filter=expr)
+    df = arrow_table.to_pandas(split_blocks=True, self_destruct=True)
+    sort_cols = ["symbol", "date"] if "symbol" in df.columns else ["date"]
+    return df.sort_values(sort_cols).reset_index(drop=True)
+
+
+def iter_table(table, symbol, columns=None, start=None, end=None, batch_rows=BATCH_ROWS):
+    """
+    Streams one symbol's rows in date order as DataFrames of at most `batch_rows` rows.
+    For tables too large to load at once (e.g. years of 1-minute bars): only one batch is in memory.
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    if columns is not None:
+        columns = ["date"] + [c for c in columns if c != "date"]
+
+    year_dirs = glob.glob(os.path.join(table_dir(table, symbol), "year=*"))
+    for year_dir in sorted(year_dirs, key=lambda d: int(d.rsplit("=", 1)[1])):
+        year = int(year_dir.rsplit("=", 1)[1])
+        if (start is not None and year < start.year) or (end is not None and year > end.year):
+            continue
+        for path in sorted(glob.glob(os.path.join(year_dir, "*.parquet"))):
+            # Files are written sorted by date, so batches come out in date order
+            for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=batch_rows, columns=columns):
+                df = batch.to_pandas()
+                if start is not None:
+                    df = df[df["date"] >= start]
+                if end is not None:
+                    df = df[df["date"] <= end]
+                if len(df):
+                    yield df.reset_index(drop=True)
+
+
+class TableWriter:
+    """
+    Writes one symbol's rows batch by batch, in date order, for tables too large to build in memory.
+    Each year is streamed into its own file as row groups; the finished table replaces the stored
+    one on close() (until then readers keep seeing the old table).
+
+        with TableWriter("features_1m", symbol) as writer:
+            for df in batches:
+                writer.write(df)
+    """
+
+    def __init__(self, table, symbol):
+        self.table = table
+        self.symbol = symbol
+        self.base = table_dir(table, symbol)
+        self.staging = self.base + ".tmp"
+        self.rows = 0
+        self.year = None
+        self.schema = None
+        self.writer = None
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def write(self, df):
+        df = _typed(self.table, df)
+        for year, part in df.groupby(df["date"].dt.year, sort=True):
+            if year != self.year:
+                if self.year is not None and year < self.year:
+                    raise ValueError(f"{self.table}: rows for {year} after {self.year} (write in date order)")
+                self._close_file()
+                self.year = year
+                os.makedirs(os.path.join(self.staging, f"year={year}"))
+            batch = pa.Table.from_pandas(part.reset_index(drop=True), schema=self.schema, preserve_index=False)
+            if self.writer is None:
+                self.schema = self.schema or batch.schema
+                path = os.path.join(self.staging, f"year={year}", "part-0.parquet")
+                self.writer = pq.ParquetWriter(path, self.schema)
+            self.writer.write_table(batch)
+            self.rows += len(part)
+        return len(df)
+
+    def _close_file(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def close(self):
+        self._close_file()
+        if os.path.exists(self.base):
+            shutil.rmtree(self.base)
+        if os.path.exists(self.staging):
+            os.replace(self.staging, self.base)
+        _remember(self.table, self.symbol, None)
+        return self.rows
+
+    def abort(self):
+        self._close_file()
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def import_csv(table, symbol, csv_path):
+    """One-off migration of a legacy CSV into the store."""
+    df = pd.read_csv(csv_path)
+    df["date"] = pd.to_datetime(df["date"])
+    return write_table(table, symbol, df)
+
+
+def export_csv(table, symbol, csv_path):
+    """Dumps one table to CSV for inspection (nothing in the pipeline reads it back)."""
+    df = read_table(table, symbol)
+    os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+    df.to_csv(csv_path, index=False)
+    return csv_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the Parquet data store")
+    parser.add_argument("--import-csv", nargs="+", metavar="SYMBOL",
+                        help="Migrate the legacy CSVs of these symbols into the store")
+    parser.add_argument("--export", nargs=3, metavar=("TABLE", "SYMBOL", "CSV_PATH"),
+                        help="Dump a table to CSV")
+    args = parser.parse_args()
+
+    for symbol in args.import_csv or []:
+        paths = symbol_paths(symbol)
+        for table, key in LEGACY_CSV_KEYS.items():
+            if os.path.exists(paths[key]):
+                rows = import_csv(table, symbol, paths[key])
+                print(f"✅ {symbol}: {table} <- {paths[key]} ({rows} rows)")
+
+    if args.export:
+        table, symbol, csv_path = args.export
+        print(f"✅ Exported to {export_csv(table, symbol, csv_path)}")